@@ -12,10 +12,21 @@ Date: December 2025
 # ============================================
 # IMPORTS
 # ============================================
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify, make_response
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify, make_response, Response
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import sqlite3
 import os
+import json
+import math
+import base64
+import contextvars
+import re
+import threading
+import queue
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
@@ -26,6 +37,9 @@ import markdown
 import atexit
 from openai import OpenAI
 from config import Config
+from socketio_queue import WorkerChannel, socketio_queue_options
+from socketio_metrics import SocketMetrics
+from socketio_msgpack import socketio_serializer_options
 from deep_translator import GoogleTranslator
 from langdetect import detect, LangDetectException
 from authlib.integrations.flask_client import OAuth
@@ -51,7 +65,22 @@ if not app.debug:
     )
 
 # WebSocket: Initialize SocketIO for real-time features
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With SOCKETIO_MESSAGE_QUEUE set, emits are relayed through the queue so
+# rooms work across several worker processes (see socketio_queue.py).
+# SOCKETIO_ASYNC_MODE=gevent is set by serve_async.py, which monkey-patches first.
+# SOCKETIO_SERIALIZER=msgpack sends binary MessagePack frames (see socketio_msgpack.py).
+socketio = SocketIO(
+    app,
+    async_mode=Config.SOCKETIO_ASYNC_MODE,
+    cors_allowed_origins="*",
+    **socketio_queue_options(Config.SOCKETIO_MESSAGE_QUEUE, Config.SOCKETIO_CHANNEL),
+    **socketio_serializer_options(Config.SOCKETIO_SERIALIZER)
+)
+# Per-event counts, handler latency and fan-out (payload bytes only with
+# SOCKETIO_METRICS_BYTES); see /api/metrics/socketio
+socket_metrics = SocketMetrics(count_bytes=Config.SOCKETIO_METRICS_BYTES)
+socket_metrics.instrument(socketio)
+workers = WorkerChannel(socketio)
 
 # OAuth Configuration: Initialize OAuth for social login
 oauth = OAuth(app)
@@ -206,6 +235,72 @@ def add_file_context_column():
 
 add_file_context_column()
 
+# OperationalError prefixes a migration statement may fail with and be skipped
+MIGRATION_SKIPPABLE_ERRORS = ('no such table', 'no such column', 'duplicate column name')
+
+def apply_sql_migration(conn, path):
+    """Run a migration script statement by statement (migration helper).
+
+    Statements that fail because an optional table or column is missing, or
+    because an ALTER TABLE column was already added, are skipped and logged so
+    one absent feature table doesn't block the rest. Any other error is raised.
+    """
+    statement = ''
+    with open(path, 'r') as f:
+        for line in f:
+            if not statement and line.lstrip().startswith('--'):
+                continue
+            statement += line
+            if sqlite3.complete_statement(statement):
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    if not str(e).startswith(MIGRATION_SKIPPABLE_ERRORS):
+                        raise
+                    app.logger.info(f"Skipped statement in {os.path.basename(path)} ({e}): {statement.strip()}")
+                statement = ''
+    conn.commit()
+
+# migrations/*.sql applied at startup, in order
+SQL_MIGRATIONS = [
+    'add_hot_path_indexes.sql',
+    'add_reaction_counts.sql',
+    'add_rsvp_capacity.sql',
+    'add_user_search.sql',
+    'add_sessions_search.sql',
+    'add_message_idempotency.sql',
+    'add_whiteboard_ops.sql',
+    'add_whiteboard_keyframes.sql',
+]
+
+def table_has_column(conn, table, column):
+    """Check whether a table has a column (migration helper)"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+def apply_sql_migrations():
+    """Apply every script in SQL_MIGRATIONS; each is idempotent (migration helper)
+
+    One-time backfills run only when their migration actually added the column,
+    not on every startup.
+    """
+    conn = sqlite3.connect(DATABASE)
+    try:
+        had_rsvp_count = table_has_column(conn, 'sessions', 'rsvp_count')
+        for name in SQL_MIGRATIONS:
+            apply_sql_migration(conn, os.path.join(app.root_path, 'migrations', name))
+        if not had_rsvp_count and table_has_column(conn, 'sessions', 'rsvp_count'):
+            # Counters for sessions created before the rsvps triggers existed
+            conn.execute('''
+                UPDATE sessions SET rsvp_count = (
+                    SELECT COUNT(*) FROM rsvps WHERE rsvps.session_id = sessions.id
+                )
+            ''')
+            conn.commit()
+    finally:
+        conn.close()
+
+apply_sql_migrations()
+
 # ============================================
 # DECORATORS & UTILITY FUNCTIONS
 # ============================================
@@ -332,6 +427,19 @@ def sanitize_filename(filename):
     filename = filename.replace('/', '').replace('\\\\', '')
     return filename
 
+def build_prefix_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix.
+    
+    Words are quoted, so user input can't inject FTS5 query syntax.
+    
+    Returns:
+        FTS5 MATCH expression, or None if the text has no searchable words
+    """
+    words = re.findall(r'[^\W_]+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words[:8])
+
 # Rate limiting storage (in production, use Redis for distributed rate limiting)
 rate_limit_storage = {}
 
@@ -518,20 +626,164 @@ def get_file_size_str(size_bytes):
 
 app.jinja_env.globals.update(get_file_size_str=get_file_size_str)
 
+# base.html loads the matching Socket.IO client parser
+app.jinja_env.globals.update(socketio_serializer=Config.SOCKETIO_SERIALIZER)
+
+class PooledConnection:
+    """Proxy around a pooled SQLite connection.
+
+    Behaves like a regular sqlite3 connection, except that close() hands the
+    underlying connection back to the pool instead of closing the file.
+    Any transaction left open by the caller is rolled back on release, which
+    matches what a real close() would have done.
+    """
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool.release(conn)
+
+class ConnectionPool:
+    """Bounded pool of pragma-tuned SQLite connections.
+
+    Connections are created lazily and configured once (WAL journal,
+    synchronous=NORMAL, busy timeout, mmap, page cache, statement cache), then
+    reused across requests so the file handle and page cache stay warm.
+
+    A connection is only ever used by one thread (or greenlet) at a time:
+    whoever checks it out owns it until close(). Idle connections are reused
+    LIFO so the most recently used - and therefore warmest - one goes first.
+
+    Args:
+        database: Path to the SQLite database file
+        max_idle: Maximum number of idle connections kept (0 disables pooling)
+        busy_timeout_ms: How long a writer waits for a lock before failing
+        mmap_size: Bytes of the database file to memory-map
+        cache_size_kb: Page cache size per connection in KiB
+        statement_cache: Number of prepared statements cached per connection
+    """
+
+    def __init__(self, database, max_idle=8, busy_timeout_ms=5000,
+                 mmap_size=256 * 1024 * 1024, cache_size_kb=16384, statement_cache=256):
+        self.database = database
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache = statement_cache
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def connect(self):
+        """Open and configure a new connection that is not tracked by the pool"""
+        conn = sqlite3.connect(
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.statement_cache,
+            check_same_thread=False  # Ownership is handed over between threads by the pool
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        # Enable foreign keys for referential integrity
+        conn.execute('PRAGMA foreign_keys = ON')
+        self.stats['created'] += 1
+        return conn
+
+    def acquire(self):
+        """Check out a connection, reusing an idle one when available.
+
+        Returns:
+            PooledConnection wrapping a configured sqlite3 connection
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: never share file descriptors with the parent
+                self._idle = []
+                self._pid = os.getpid()
+            conn = self._idle.pop() if self._idle else None
+
+        if conn is None:
+            conn = self.connect()
+        else:
+            self.stats['reused'] += 1
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a connection to the idle list, or close it if the pool is full"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self.stats['discarded'] += 1
+            conn.close()
+            return
+
+        with self._lock:
+            if os.getpid() == self._pid and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self.stats['discarded'] += 1
+        conn.close()
+
+    def get_stats(self):
+        """Snapshot of connection counters and current idle connections"""
+        return dict(self.stats, idle=len(self._idle), max_idle=self.max_idle)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and in benchmarks)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+db_pool = ConnectionPool(
+    DATABASE,
+    max_idle=Config.DB_POOL_SIZE,
+    busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+    mmap_size=Config.DB_MMAP_SIZE,
+    cache_size_kb=Config.DB_CACHE_SIZE_KB,
+    statement_cache=Config.DB_STATEMENT_CACHE
+)
+atexit.register(db_pool.close_all)
+
 def get_db():
-    """Get database connection with Row factory for dict-like access.
-    
+    """Get a pooled database connection with Row factory for dict-like access.
+
+    Call close() when done as before; the connection is returned to the pool
+    rather than closed.
+
     Returns:
         SQLite connection object with row_factory enabled
     """
-    conn = sqlite3.connect(
-        DATABASE,
-        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-    )
-    conn.row_factory = sqlite3.Row
-    # Enable foreign keys for referential integrity
-    conn.execute('PRAGMA foreign_keys = ON')
-    return conn
+    return db_pool.acquire()
 
 from contextlib import contextmanager
 
@@ -555,6 +807,543 @@ def get_db_connection():
     finally:
         conn.close()
 
+class BlockingExecutor:
+    """Runs blocking calls (SQLite commits, OpenAI, translation) off the event loop.
+
+    Under the gevent server (serve_async.py) a bounded pool of native
+    threads runs the call while only the calling greenlet waits, so socket
+    fan-out keeps going during a slow AI request or fsync. Under the
+    threading server every request already has its own OS thread and calls
+    run inline.
+
+    The caller's context variables are copied into the worker thread, so
+    Flask's request and session proxies keep working inside fn.
+
+    Args:
+        async_mode: Socket.IO async mode ('threading' or 'gevent')
+        max_workers: Maximum number of concurrent blocking calls under gevent
+    """
+
+    def __init__(self, async_mode, max_workers=16):
+        self.async_mode = async_mode
+        self.max_workers = max_workers
+        self._pool = None
+        self.stats = {'offloaded': 0, 'inline': 0}
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs), on the thread pool when running under gevent"""
+        if self.async_mode != 'gevent':
+            self.stats['inline'] += 1
+            return fn(*args, **kwargs)
+        if self._pool is None:
+            from gevent.threadpool import ThreadPool
+            self._pool = ThreadPool(self.max_workers)
+        self.stats['offloaded'] += 1
+        return self._pool.apply(contextvars.copy_context().run, (fn,) + args, kwargs)
+
+    def get_stats(self):
+        stats = dict(self.stats, async_mode=self.async_mode, max_workers=self.max_workers)
+        if self._pool is not None:
+            stats['busy'] = len(self._pool)
+        return stats
+
+blocking_pool = BlockingExecutor(socketio.server.async_mode, max_workers=Config.BLOCKING_POOL_SIZE)
+
+class WriteQueue:
+    """Single-writer queue that group-commits small write transactions.
+
+    One background thread owns the only write connection. Callers submit
+    write intents (an SQL statement or a callable taking the connection) and
+    get back a Future. The writer drains the queue into batches of up to
+    max_batch intents or max_delay_ms of waiting, runs each intent inside its
+    own SAVEPOINT and commits the whole batch with a single fsync. With
+    max_delay_ms=0 the writer never waits: intents that piled up while the
+    previous commit was running form the next batch. A failing
+    intent only rolls back its own savepoint and raises in its own caller.
+
+    Callables run on the writer thread: they must not touch Flask's request
+    or session objects, and must not commit themselves.
+
+    Args:
+        pool: ConnectionPool used to open the write connection
+        max_batch: Maximum number of intents per commit
+        max_delay_ms: How long to wait for more intents before committing
+        executor: BlockingExecutor that runs each batch's SQL and commit
+            (keeps fsyncs off the event loop under gevent)
+    """
+
+    def __init__(self, pool, max_batch=64, max_delay_ms=0, executor=None):
+        self.pool = pool
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay_ms = max_delay_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._commit_latencies = deque(maxlen=1000)
+        self._counters = {'batches': 0, 'operations': 0, 'failed': 0, 'max_batch_size': 0}
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()  # Forked worker: the parent's intents are not ours
+                    self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, operation, params=()):
+        """Queue a write intent.
+
+        Args:
+            operation: SQL statement, or callable(conn) returning a result
+            params: Parameters for the SQL statement
+
+        Returns:
+            Future resolving to the statement's lastrowid (or the callable's result)
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((operation, params, future))
+        return future
+
+    def execute(self, operation, params=(), timeout=30):
+        """Submit a write intent and wait for its group commit.
+
+        Returns:
+            lastrowid of the statement, or the callable's return value
+        """
+        return self.submit(operation, params).result(timeout)
+
+    def _run(self):
+        conn = self.pool.connect()
+        conn.isolation_level = None  # Transactions are managed explicitly below
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_delay_ms / 1000
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+        conn.close()
+
+    def _apply_batch(self, conn, batch):
+        """Run a batch's intents in one transaction and commit it.
+
+        Returns:
+            List of (future, result or exception, failed) tuples
+        """
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for operation, params, future in batch:
+                conn.execute('SAVEPOINT write_intent')
+                try:
+                    if callable(operation):
+                        result = operation(conn)
+                    else:
+                        result = conn.execute(operation, params).lastrowid
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_intent')
+                    conn.execute('RELEASE write_intent')
+                    outcomes.append((future, e, True))
+                    continue
+                conn.execute('RELEASE write_intent')
+                outcomes.append((future, result, False))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return outcomes
+
+    def _commit_batch(self, conn, batch):
+        start = time.perf_counter()
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        try:
+            if self.executor is not None:
+                outcomes = self.executor.run(self._apply_batch, conn, batch)
+            else:
+                outcomes = self._apply_batch(conn, batch)
+        except Exception as e:
+            # The commit itself failed: nothing in this batch was persisted
+            print(f"Write queue batch of {len(batch)} failed: {e}")
+            for operation, params, future in batch:
+                future.set_exception(e)
+            self._counters['failed'] += len(batch)
+            return
+
+        self._commit_latencies.append((time.perf_counter() - start) * 1000)
+        self._counters['batches'] += 1
+        self._counters['operations'] += len(outcomes)
+        self._counters['max_batch_size'] = max(self._counters['max_batch_size'], len(outcomes))
+        for future, value, failed in outcomes:
+            if failed:
+                self._counters['failed'] += 1
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+    def get_metrics(self):
+        """Snapshot of queue depth, batching and commit latency (ms)"""
+        latencies = sorted(self._commit_latencies)
+        batches = self._counters['batches']
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'operations': self._counters['operations'],
+            'failed': self._counters['failed'],
+            'avg_batch_size': round(self._counters['operations'] / batches, 2) if batches else 0,
+            'max_batch_size': self._counters['max_batch_size'],
+            'commit_latency_ms': {
+                'p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                'p95': round(latencies[int(len(latencies) * 0.95) - 1], 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None
+            }
+        }
+
+    def close(self, timeout=5):
+        """Flush pending intents and stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+write_queue = WriteQueue(
+    db_pool,
+    max_batch=Config.WRITE_QUEUE_MAX_BATCH,
+    max_delay_ms=Config.WRITE_QUEUE_MAX_DELAY_MS,
+    executor=blocking_pool
+)
+atexit.register(write_queue.close)
+
+class ChangeVersions:
+    """In-memory change counters that back conditional GETs on polling endpoints.
+
+    Every write that changes what a polled endpoint would return bumps the
+    counter for that resource (e.g. ('messages', session_id)) after it has
+    committed. Endpoints derive their ETag from the counter before querying,
+    so an If-None-Match hit is answered with 304 straight from memory and
+    never touches SQLite.
+
+    Counters live in process memory and the ETag embeds a per-process
+    epoch, so a restart invalidates every client copy. When several workers
+    share a Socket.IO message queue, every bump is also published to the
+    other workers so none of them keeps answering 304 for changed data.
+
+    Args:
+        workers: WorkerChannel used to propagate bumps between processes
+    """
+
+    def __init__(self, workers):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.epoch = f'{os.getpid():x}.{int(time.time()):x}'
+        self.stats = {'not_modified': 0, 'misses': 0, 'bumps': 0, 'remote_bumps': 0}
+        self.workers = workers
+        workers.on('change_version', self._apply_remote_bump)
+
+    def _increment(self, resource, key):
+        with self._lock:
+            self._versions[(resource, key)] = self._versions.get((resource, key), 0) + 1
+
+    def bump(self, resource, key):
+        """Record that a resource changed; call after the write has committed"""
+        self._increment(resource, key)
+        self.stats['bumps'] += 1
+        self.workers.publish('change_version', {'resource': resource, 'key': key})
+
+    def _apply_remote_bump(self, data):
+        self._increment(data['resource'], data['key'])
+        self.stats['remote_bumps'] += 1
+
+    def etag(self, resource, key, *variant):
+        """Return the current ETag for a resource (and request variant, e.g. last_id)"""
+        version = self._versions.get((resource, key), 0)
+        suffix = '.'.join(str(part) for part in variant)
+        return f'{resource}.{key}.{self.epoch}.{version}.{suffix}'
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, tracked=len(self._versions))
+
+change_versions = ChangeVersions(workers)
+
+def not_modified_response(etag):
+    """Return a 304 response if the client already holds this ETag, else None"""
+    if request.if_none_match.contains(etag):
+        change_versions.stats['not_modified'] += 1
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    change_versions.stats['misses'] += 1
+    return None
+
+def etagged_json(payload, etag):
+    """jsonify() a polling payload and tag it so the browser revalidates with If-None-Match"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+class RoomEventBuffer:
+    """Per-room replay log for Socket.IO broadcasts.
+
+    Every buffered event gets a per-room sequence number (added to its
+    payload as 'seq') and is kept in a bounded ring buffer. A reconnecting
+    client reports the last seq it saw and receives only the events it
+    missed. If the gap has already left the buffer, or the server restarted
+    (the epoch changed), sync() reports that a database resync is needed.
+
+    Sequence numbers are per process. When several workers share a message
+    queue a client also receives events numbered by other workers, so
+    replay is turned off and every reconnect resyncs from the database.
+
+    Args:
+        socketio: SocketIO instance used for broadcasting
+        maxlen: Number of recent events kept per room
+        replay: Replay missed events from the buffer (single process only)
+    """
+
+    def __init__(self, socketio, maxlen=256, replay=True):
+        self.socketio = socketio
+        self.maxlen = maxlen
+        self.replay = replay
+        self.epoch = f'{os.getpid():x}.{int(time.time() * 1000):x}'
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self.stats = {'emitted': 0, 'syncs': 0, 'replayed': 0, 'resyncs': 0}
+
+    def _room(self, room):
+        with self._lock:
+            log = self._rooms.get(room)
+            if log is None:
+                log = {'seq': 0, 'events': deque(maxlen=self.maxlen), 'lock': threading.Lock()}
+                self._rooms[room] = log
+            return log
+
+    def emit(self, event, data, room):
+        """Broadcast an event to a room and record it for replay.
+
+        Returns:
+            The event's sequence number within the room
+        """
+        log = self._room(room)
+        # Emit under the room lock so clients receive events in seq order
+        with log['lock']:
+            log['seq'] += 1
+            payload = dict(data, seq=log['seq'])
+            log['events'].append((log['seq'], event, payload))
+            self.socketio.emit(event, payload, room=room)
+        self.stats['emitted'] += 1
+        return payload['seq']
+
+    def sync(self, room, last_seq=None, epoch=None):
+        """Collect the events a client missed since last_seq.
+
+        Returns:
+            Tuple of (head seq, list of {'seq', 'event', 'data'}), with None
+            instead of the list when the client must resync from the database
+        """
+        log = self._room(room)
+        with log['lock']:
+            head = log['seq']
+            events = list(log['events'])
+        self.stats['syncs'] += 1
+
+        if last_seq is None:
+            return head, []
+        if not self.replay or epoch != self.epoch or last_seq > head:
+            self.stats['resyncs'] += 1
+            return head, None
+
+        oldest = events[0][0] if events else head + 1
+        if last_seq + 1 < oldest:
+            self.stats['resyncs'] += 1
+            return head, None
+
+        missed = [{'seq': seq, 'event': event, 'data': payload}
+                  for seq, event, payload in events if seq > last_seq]
+        self.stats['replayed'] += len(missed)
+        return head, missed
+
+    def discard(self, room):
+        """Drop a room's buffer (e.g. when its session is deleted)"""
+        with self._lock:
+            self._rooms.pop(room, None)
+
+    def get_stats(self):
+        with self._lock:
+            rooms = len(self._rooms)
+        return dict(self.stats, rooms=rooms, buffer_size=self.maxlen)
+
+session_events = RoomEventBuffer(socketio, maxlen=Config.SOCKET_REPLAY_BUFFER, replay=not workers.enabled)
+
+class TypingAggregator:
+    """Per-room typing state, broadcast as one consolidated frame per tick.
+
+    Incoming 'typing' events only update an in-memory table. A background
+    task wakes every interval seconds and emits a single 'typing_state'
+    frame to each room whose set of typists changed, so fan-out is bounded
+    by the number of rooms rather than the keystroke rate. Typists that stop
+    refreshing their state expire after timeout seconds. Each worker only
+    knows its own typists, so frames carry a 'source' id and clients merge
+    the latest frame from every source.
+
+    Args:
+        socketio: SocketIO instance used for broadcasting
+        interval: Seconds between broadcast ticks
+        timeout: Seconds after which a silent typist is dropped
+    """
+
+    def __init__(self, socketio, interval=0.5, timeout=5):
+        self.socketio = socketio
+        self.interval = interval
+        self.timeout = timeout
+        self.source = f'{os.getpid():x}.{int(time.time() * 1000):x}'
+        self._rooms = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._running = False
+        self.stats = {'updates': 0, 'frames': 0, 'expired': 0}
+
+    def update(self, room, user_key, user_name, is_typing=True):
+        """Record that a user started or stopped typing in a room"""
+        with self._lock:
+            typists = self._rooms.setdefault(room, {})
+            if is_typing:
+                if user_key not in typists:
+                    self._dirty.add(room)
+                typists[user_key] = (user_name, time.monotonic() + self.timeout)
+            elif typists.pop(user_key, None) is not None:
+                self._dirty.add(room)
+            self.stats['updates'] += 1
+            start = not self._running
+            self._running = True
+        if start:
+            self.socketio.start_background_task(self._run)
+
+    def _collect(self):
+        """Expire stale typists and build the frames for changed rooms.
+
+        Returns:
+            Tuple of (list of (room, typists) frames, whether to keep ticking)
+        """
+        now = time.monotonic()
+        frames = []
+        with self._lock:
+            for room, typists in list(self._rooms.items()):
+                expired = [key for key, (_, expires_at) in typists.items() if expires_at <= now]
+                for key in expired:
+                    del typists[key]
+                if expired:
+                    self.stats['expired'] += len(expired)
+                    self._dirty.add(room)
+                if room in self._dirty:
+                    frames.append((room, [{'user_id': key, 'user_name': name}
+                                          for key, (name, _) in typists.items()]))
+                if not typists:
+                    del self._rooms[room]
+            self._dirty.clear()
+            # Stop ticking once nobody is typing; the next update() restarts it
+            self._running = bool(self._rooms)
+            return frames, self._running
+
+    def _run(self):
+        running = True
+        while running:
+            self.socketio.sleep(self.interval)
+            frames, running = self._collect()
+            for room, typists in frames:
+                self.socketio.emit('typing_state', {'source': self.source, 'typing': typists}, room=room)
+            self.stats['frames'] += len(frames)
+
+    def get_stats(self):
+        with self._lock:
+            rooms = len(self._rooms)
+            typists = sum(len(t) for t in self._rooms.values())
+        return dict(self.stats, rooms=rooms, typists=typists, interval=self.interval)
+
+typing_state = TypingAggregator(
+    socketio,
+    interval=Config.TYPING_BROADCAST_INTERVAL,
+    timeout=Config.TYPING_TIMEOUT
+)
+
+class ReactionCoalescer:
+    """Merge bursts of reaction changes into one broadcast per message.
+
+    The first change to a message opens a window of window seconds; further
+    changes inside it only mark the message as pending again. When the
+    window closes the latest aggregate state of every pending message is
+    loaded once and broadcast as 'reaction_updated' through the room's
+    replay buffer. Loading at flush time (rather than keeping the payload of
+    the last caller) means concurrent writers can't leave a stale state as
+    the final frame.
+
+    Args:
+        events: RoomEventBuffer the updates are broadcast through
+        load: Callable(message_ids) -> dict of message_id -> reactions
+        window: Coalescing window in seconds
+    """
+
+    def __init__(self, events, load, window=0.1):
+        self.events = events
+        self.load = load
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self.stats = {'submitted': 0, 'coalesced': 0, 'emitted': 0}
+
+    def submit(self, room, message_id):
+        """Schedule a reaction_updated broadcast for a message"""
+        with self._lock:
+            self.stats['submitted'] += 1
+            if message_id in self._pending:
+                self.stats['coalesced'] += 1
+            self._pending[message_id] = room
+            start = not self._scheduled
+            self._scheduled = True
+        if start:
+            self.events.socketio.start_background_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        self.events.socketio.sleep(self.window)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+        try:
+            reactions = self.load(list(pending))
+        except Exception as e:
+            print(f"Error loading coalesced reactions: {e}")
+            return
+        for message_id, room in pending.items():
+            self.events.emit('reaction_updated', {
+                'message_id': message_id,
+                'reactions': reactions[message_id]
+            }, room=room)
+        with self._lock:
+            self.stats['emitted'] += len(pending)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending), window_ms=int(self.window * 1000))
+
 @app.context_processor
 def inject_user_theme():
     """Inject user theme preference into all templates"""
@@ -584,14 +1373,11 @@ def create_notification(user_id, notif_type, title, message, link=None):
     Returns:
         ID of the created notification
     """
-    conn = get_db()
-    cursor = conn.execute(
+    notif_id = write_queue.execute(
         'INSERT INTO notifications (user_id, type, title, message, link) VALUES (?, ?, ?, ?, ?)',
         (user_id, notif_type, title, message, link)
     )
-    notif_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    change_versions.bump('notifications', user_id)
     
     # Emit real-time notification via WebSocket to user's personal room
     socketio.emit('new_notification', {
@@ -621,7 +1407,7 @@ def detect_language(text):
         return None
     
     try:
-        return detect(text)
+        return blocking_pool.run(detect, text)
     except LangDetectException:
         return None
 
@@ -654,7 +1440,7 @@ def translate_text(text, target_lang='en', source_lang='auto'):
         
         # Perform translation
         translator = GoogleTranslator(source=source_lang, target=target_lang)
-        translated = translator.translate(text)
+        translated = blocking_pool.run(translator.translate, text)
         return translated if translated else text
     except Exception as e:
         print(f"Translation error: {e}")
@@ -689,42 +1475,42 @@ def index():
     """Main dashboard showing all study sessions with search and filter options."""
     conn = get_db()
     
-    # Extract search and filter parameters from URL query string
+    # Extract search, filter and paging parameters from URL query string
     search_query = request.args.get('search', '').strip()
     subject_filter = request.args.get('subject', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = Config.DASHBOARD_PAGE_SIZE
+    user_id = session.get('user_id')
     
-    # Build dynamic SQL query based on active filters
+    # Participation is computed in the main query instead of one RSVP lookup per session
     query = '''
-        SELECT s.*, u.full_name as creator_name 
+        SELECT s.*, u.full_name as creator_name,
+               (s.creator_id = ? OR EXISTS (
+                   SELECT 1 FROM rsvps r WHERE r.session_id = s.id AND r.user_id = ?
+               )) as user_is_participant
         FROM sessions s
         LEFT JOIN users u ON s.creator_id = u.id
         WHERE 1=1
     '''
-    params = []
+    params = [user_id, user_id]
     
     if search_query:
-        query += ' AND s.title LIKE ?'
-        params.append(f'%{search_query}%')
+        match = build_prefix_query(search_query)
+        if match:
+            query += ' AND s.id IN (SELECT rowid FROM sessions_fts WHERE sessions_fts MATCH ?)'
+            params.append(f'title : ({match})')
     
     if subject_filter:
         query += ' AND s.subject = ?'
         params.append(subject_filter)
     
-    query += ' ORDER BY s.created_at DESC'
-    
-    sessions_query = conn.execute(query, params).fetchall()
+    # Fetch one extra row to know whether there is a next page
+    query += ' ORDER BY s.created_at DESC LIMIT ? OFFSET ?'
+    params += [per_page + 1, (page - 1) * per_page]
     
-    # Convert to list of dicts and add participant info
-    sessions = []
-    for sess in sessions_query:
-        sess_dict = dict(sess)
-        sess_dict['user_is_participant'] = False
-        if 'user_id' in session:
-            # Check if user is participant
-            rsvp = conn.execute('SELECT * FROM rsvps WHERE session_id = ? AND user_id = ?',
-                              (sess['id'], session['user_id'])).fetchone()
-            sess_dict['user_is_participant'] = (rsvp is not None or sess['creator_id'] == session['user_id'])
-        sessions.append(sess_dict)
+    sessions = [dict(sess) for sess in conn.execute(query, params).fetchall()]
+    has_next = len(sessions) > per_page
+    sessions = sessions[:per_page]
     
     # fetch user invitations if they're logged in
     invitations = []
@@ -756,7 +1542,9 @@ def index():
         ''', (session['user_id'], session['user_id'])).fetchall()
     
     conn.close()
-    return render_template('index.html', sessions=sessions, invitations=invitations, reminders=reminders)
+    return render_template('index.html', sessions=sessions, invitations=invitations, reminders=reminders,
+                         search_query=search_query, subject_filter=subject_filter,
+                         page=page, has_next=has_next)
 
 # ============================================
 # AUTHENTICATION ROUTES
@@ -967,187 +1755,552 @@ def google_callback():
         return redirect(url_for('login'))
 
 # ============================================
-# SESSION MANAGEMENT ROUTES
+# CHAT DATA LOADERS
 # ============================================
 
-@app.route('/create', methods=['GET', 'POST'])
-@login_required
-@handle_errors
-def create():
-    """Create a new study session with validation and proper error handling."""
-    if request.method == 'POST':
-        # Validate all form inputs
-        try:
-            title = validate_string(request.form.get('title', ''), 'Title', min_len=3, max_len=200)
-            session_type = validate_string(request.form.get('session_type', ''), 'Session type', min_len=1, max_len=50)
-            subject = validate_string(request.form.get('subject', 'General'), 'Subject', min_len=1, max_len=100)
-            session_date = validate_string(request.form.get('session_date', ''), 'Session date', min_len=1, max_len=50)
-            max_participants = validate_integer(request.form.get('max_participants', 10), 'Max participants', min_val=1, max_val=1000)
-            meeting_link = request.form.get('meeting_link', '').strip()[:500]  # Optional, limit length
-            location = request.form.get('location', '').strip()[:200]  # Optional, limit length
-            
-        except ValueError as e:
-            flash(str(e), 'danger')
-            return redirect(url_for('create'))
+def load_message_reactions(conn, message_ids):
+    """Batch-load reaction counts for a set of chat messages.
+    
+    Reads the trigger-maintained message_reaction_counts table, so this is a
+    primary-key lookup per message rather than an aggregation over
+    message_reactions.
+    
+    Args:
+        conn: Database connection
+        message_ids: Iterable of message IDs
         
-        # Use context manager for atomic database operations
-        with get_db_connection() as conn:
-            # Create session
-            cursor = conn.execute(
-                '''INSERT INTO sessions (title, session_type, subject, session_date, 
-                   max_participants, meeting_link, location, creator_id) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                (title, session_type, subject, session_date, max_participants, 
-                 meeting_link, location, session['user_id'])
-            )
-            session_id = cursor.lastrowid
-            
-            # Automatically RSVP the creator to their own session
-            conn.execute(
-                'INSERT INTO rsvps (session_id, user_id) VALUES (?, ?)',
-                (session_id, session['user_id'])
-            )
+    Returns:
+        Dict of message_id -> list of {'emoji', 'count', 'user_ids'}
+    """
+    message_ids = list(message_ids)
+    reactions = {message_id: [] for message_id in message_ids}
+    if not message_ids:
+        return reactions
+    
+    rows = conn.execute('''
+        SELECT message_id, emoji, count, user_ids
+        FROM message_reaction_counts
+        WHERE message_id IN (SELECT value FROM json_each(?))
+        ORDER BY message_id, emoji
+    ''', (json.dumps(message_ids),)).fetchall()
+    
+    for r in rows:
+        reactions[r['message_id']].append({
+            'emoji': r['emoji'],
+            'count': r['count'],
+            'user_ids': json.loads(r['user_ids'])
+        })
+    return reactions
+
+def load_reactions_for_broadcast(message_ids):
+    """Load the current reactions of messages on a fresh connection (for ReactionCoalescer)"""
+    conn = get_db()
+    try:
+        return load_message_reactions(conn, message_ids)
+    finally:
+        conn.close()
+
+reaction_broadcasts = ReactionCoalescer(
+    session_events,
+    load=load_reactions_for_broadcast,
+    window=Config.REACTION_COALESCE_MS / 1000
+)
+
+def load_parent_messages(conn, parent_ids):
+    """Batch-load the parent context shown above threaded replies.
+    
+    Args:
+        conn: Database connection
+        parent_ids: Iterable of parent message IDs (None values are ignored)
         
-        flash('Study session created successfully!', 'success')
-        return redirect(url_for('detail', session_id=session_id))
+    Returns:
+        Dict of parent message_id -> {'id', 'text', 'author'}
+    """
+    parent_ids = sorted({pid for pid in parent_ids if pid})
+    if not parent_ids:
+        return {}
     
-    return render_template('create.html')
+    rows = conn.execute('''
+        SELECT m.id, m.message_text, u.full_name
+        FROM messages m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(parent_ids),)).fetchall()
+    
+    return {r['id']: {
+        'id': r['id'],
+        'text': r['message_text'],
+        'author': r['full_name']
+    } for r in rows}
 
-@app.route('/session/<int:session_id>', methods=['GET', 'POST'])
-@handle_errors
-def detail(session_id):
-    """Display session details with chat, files, RSVPs using context manager."""
-    # Use context manager for all database operations in this route
-    with get_db_connection() as conn:
-        # Fetch session details with creator information
-        study_session = conn.execute('''
-            SELECT s.*, u.full_name as creator_name, u.id as creator_user_id
-            FROM sessions s
-            LEFT JOIN users u ON s.creator_id = u.id
-            WHERE s.id = ?
-        ''', (session_id,)).fetchone()
+def enrich_messages(conn, messages_raw, include_parents=True):
+    """Build chat message dicts with reactions and thread context attached.
+    
+    Uses a constant number of queries regardless of how many messages are
+    passed in.
+    
+    Args:
+        conn: Database connection
+        messages_raw: Message rows joined with full_name and username
+        include_parents: Also attach 'parent_info' for threaded replies
         
-        # Verify session exists
-        if not study_session:
-            flash('Session not found!', 'danger')
-            return redirect(url_for('index'))
+    Returns:
+        List of message dicts in the same order as messages_raw
+    """
+    reactions = load_message_reactions(conn, (msg['id'] for msg in messages_raw))
+    parents = {}
+    if include_parents:
+        parents = load_parent_messages(conn, (msg['parent_message_id'] for msg in messages_raw))
+    
+    messages = []
+    for msg in messages_raw:
+        message = {
+            'id': msg['id'],
+            'type': 'message',
+            'full_name': msg['full_name'],
+            'username': msg['username'],
+            'message_text': msg['message_text'],
+            'created_at': msg['created_at'],
+            'user_id': msg['user_id'],
+            'parent_message_id': msg['parent_message_id'],
+            'reactions': reactions[msg['id']]
+        }
+        if include_parents:
+            message['parent_info'] = parents.get(msg['parent_message_id'])
+        messages.append(message)
+    return messages
+
+def load_chat_since(conn, session_id, last_message_id, last_file_id, limit=None):
+    """Load chat messages and chat files newer than the ids a client has seen.
+    
+    Used to resync a reconnecting Socket.IO client whose missed events are
+    no longer in the replay buffer.
+    
+    Args:
+        conn: Database connection
+        session_id: ID of the study session
+        last_message_id: Newest message ID the client has
+        last_file_id: Newest chat file ID the client has
+        limit: Max items of each kind (defaults to Config.CHAT_PAGE_SIZE)
         
-        # Handle RSVP submission (POST request)
-        if request.method == 'POST' and 'rsvp' in request.form and 'user_id' in session:
-            # Fetch current RSVPs to check capacity
-            rsvps_temp = conn.execute('''
-                SELECT r.*, u.full_name, u.username
-                FROM rsvps r
-                JOIN users u ON r.user_id = u.id
-                WHERE r.session_id = ?
-            ''', (session_id,)).fetchall()
-            
-            current_count = len(rsvps_temp)
-            max_participants = study_session['max_participants'] if study_session['max_participants'] else 10
-            
-            # Check if user already has RSVP
-            if check_user_rsvp(session_id, session['user_id']):
-                flash('You have already RSVP\'d to this session!', 'warning')
-            elif current_count >= max_participants:
-                flash('Sorry, this session is full!', 'danger')
-            else:
-                # Create new RSVP
-                conn.execute(
-                    'INSERT INTO rsvps (session_id, user_id) VALUES (?, ?)',
-                    (session_id, session['user_id'])
-                )
-                flash('RSVP submitted successfully!', 'success')
-            
-            return redirect(url_for('detail', session_id=session_id))
+    Returns:
+        Dict with 'messages', 'files' (oldest first, JSON-ready) and
+        'truncated' if more items exist than were returned
+    """
+    limit = limit or Config.CHAT_PAGE_SIZE
+    messages_raw = conn.execute('''
+        SELECT m.*, u.full_name, u.username
+        FROM messages m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.session_id = ? AND m.id > ?
+        ORDER BY m.id
+        LIMIT ?
+    ''', (session_id, last_message_id, limit + 1)).fetchall()
+    files = conn.execute('''
+        SELECT f.*, u.full_name, u.username
+        FROM files f
+        JOIN users u ON f.user_id = u.id
+        WHERE f.session_id = ? AND f.file_context = 'chat' AND f.id > ?
+        ORDER BY f.id
+        LIMIT ?
+    ''', (session_id, last_file_id, limit + 1)).fetchall()
+    truncated = len(messages_raw) > limit or len(files) > limit
+    
+    messages = enrich_messages(conn, messages_raw[:limit])
+    chat_files = [{
+        'id': f['id'],
+        'type': 'file',
+        'full_name': f['full_name'],
+        'username': f['username'],
+        'created_at': f['uploaded_at'],
+        'user_id': f['user_id'],
+        'file_id': f['id'],
+        'original_filename': f['original_filename'],
+        'file_size': f['file_size'],
+        'file_type': f['file_type']
+    } for f in files[:limit]]
+    
+    # Convert datetimes to strings for JSON serialization
+    for item in messages + chat_files:
+        if isinstance(item['created_at'], datetime):
+            item['created_at'] = item['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    
+    return {'messages': messages, 'files': chat_files, 'truncated': truncated}
+
+# Upper bound on client-generated idempotency keys (a UUID is 36 chars)
+MAX_CLIENT_MSG_ID_LENGTH = 64
+
+def insert_chat_message(session_id, user_id, message_text, parent_message_id=None, client_msg_id=None):
+    """Store a chat message through the write queue and return it JSON-ready.
+    
+    The insert uses RETURNING, so the new row is read back by its own id. A
+    retried send with the same client_msg_id resolves to the message that was
+    already stored instead of inserting a duplicate.
+    
+    Args:
+        session_id: ID of the study session
+        user_id: ID of the author
+        message_text: Message body
+        parent_message_id: Message being replied to, if any
+        client_msg_id: Optional client-generated idempotency key
         
-        # Fetch all RSVPs for this session with user details
-        rsvps = conn.execute('''
-            SELECT r.*, u.full_name, u.username
-            FROM rsvps r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.session_id = ?
-        ''', (session_id,)).fetchall()
+    Returns:
+        Tuple of (message dict, created) where created is False for a retry
+    """
+    def store_message(write_conn):
+        row = write_conn.execute('''
+            INSERT INTO messages (session_id, user_id, message_text, parent_message_id, client_msg_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, client_msg_id) WHERE client_msg_id IS NOT NULL DO NOTHING
+            RETURNING id
+        ''', (session_id, user_id, message_text, parent_message_id, client_msg_id)).fetchone()
+        created = row is not None
+        if not created:
+            row = write_conn.execute(
+                'SELECT id FROM messages WHERE user_id = ? AND client_msg_id = ?',
+                (user_id, client_msg_id)
+            ).fetchone()
         
-        # Fetch all chat messages for this session
-        messages_raw = conn.execute('''
+        message_raw = write_conn.execute('''
             SELECT m.*, u.full_name, u.username
             FROM messages m
             JOIN users u ON m.user_id = u.id
-            WHERE m.session_id = ?
-            ORDER BY m.created_at ASC
-        ''', (session_id,)).fetchall()
-        
-        # Enrich messages with reactions and thread context
-        messages = []
-        for msg in messages_raw:
-            # Fetch reactions aggregated by emoji
-            reactions = conn.execute('''
-                SELECT emoji, COUNT(*) as count, GROUP_CONCAT(user_id) as user_ids
-                FROM message_reactions
-                WHERE message_id = ?
-                GROUP BY emoji
-            ''', (msg['id'],)).fetchall()
-            
-            # Get parent message context for threaded replies
-            parent_info = None
-            if msg['parent_message_id']:
-                parent = conn.execute('''
-                    SELECT m.message_text, u.full_name
-                    FROM messages m
-                    JOIN users u ON m.user_id = u.id
-                    WHERE m.id = ?
-                ''', (msg['parent_message_id'],)).fetchone()
-                if parent:
-                    parent_info = {
-                        'id': msg['parent_message_id'],
-                        'text': parent['message_text'],
-                        'author': parent['full_name']
-                    }
-            
-            messages.append({
-                'id': msg['id'],
-                'type': 'message',
-                'full_name': msg['full_name'],
-                'username': msg['username'],
-                'message_text': msg['message_text'],
-                'created_at': msg['created_at'],
-                'user_id': msg['user_id'],
-                'parent_message_id': msg['parent_message_id'],
-                'parent_info': parent_info,
-                'reactions': [{
-                    'emoji': r['emoji'],
-                    'count': r['count'],
-                    'user_ids': [int(uid) for uid in r['user_ids'].split(',')]
-                } for r in reactions]
-            })
+            WHERE m.id = ?
+        ''', (row['id'],)).fetchone()
+        return enrich_messages(write_conn, [message_raw])[0], created
+    
+    message_data, created = write_queue.execute(store_message)
+    if isinstance(message_data['created_at'], datetime):
+        message_data['created_at'] = message_data['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    return message_data, created
+
+# Timeline items are ordered by (created_at, kind, id); messages sort before
+# files uploaded in the same second.
+TIMELINE_MESSAGE = 0
+TIMELINE_FILE = 1
+MAX_ROW_ID = 2 ** 63 - 1
+
+def encode_timeline_cursor(item_key):
+    """Encode a (created_at, kind, id) timeline key as an opaque cursor string"""
+    raw = json.dumps(list(item_key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_timeline_cursor(cursor):
+    """Decode a cursor produced by encode_timeline_cursor().
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, kind, item_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(created_at, str) or kind not in (TIMELINE_MESSAGE, TIMELINE_FILE) or not isinstance(item_id, int):
+        raise ValueError('Invalid cursor')
+    return created_at, kind, item_id
+
+def load_chat_timeline(conn, session_id, before=None, after=None, limit=None):
+    """Load one page of a session's chat timeline (messages and chat files).
+    
+    Messages and chat-context files are merged in SQL with UNION ALL and
+    paginated by keyset on (created_at, kind, id), so the cost of a page
+    depends on its size rather than on the length of the chat.
+    
+    Args:
+        conn: Database connection
+        session_id: ID of the study session
+        before: Cursor; return the page of items just older than it
+        after: Cursor; return the page of items just newer than it
+        limit: Page size (defaults to Config.CHAT_PAGE_SIZE)
         
-        # Fetch files uploaded in chat context and merge into timeline
-        chat_files = conn.execute('''
-            SELECT f.*, u.full_name, u.username
-            FROM files f
-            JOIN users u ON f.user_id = u.id
-            WHERE f.session_id = ? AND f.file_context = 'chat'
-            ORDER BY f.uploaded_at ASC
-        ''', (session_id,)).fetchall()
+    Returns:
+        Dict with 'items' (oldest first), 'before' and 'after' cursors for the
+        neighbouring pages, and 'has_more' for the direction being paged
         
-        # Add chat files to message timeline for chronological display
-        for file in chat_files:
-            messages.append({
-                'id': file['id'],
+    Raises:
+        ValueError: If a cursor is malformed
+    """
+    limit = limit or Config.CHAT_PAGE_SIZE
+    newer = after is not None
+    cursor = decode_timeline_cursor(after if newer else before) if (after or before) else None
+    
+    message_filter = file_filter = ''
+    params = []
+    if cursor:
+        created_at, kind, item_id = cursor
+        op = '>' if newer else '<'
+        # Within the same created_at, every message sorts before every file
+        message_bound = item_id if kind == TIMELINE_MESSAGE else MAX_ROW_ID
+        file_bound = item_id if kind == TIMELINE_FILE else 0
+        message_filter = f'AND (m.created_at, m.id) {op} (?, ?)'
+        file_filter = f'AND (f.uploaded_at, f.id) {op} (?, ?)'
+        params = [session_id, created_at, message_bound, limit + 1,
+                  session_id, created_at, file_bound, limit + 1, limit + 1]
+    else:
+        params = [session_id, limit + 1, session_id, limit + 1, limit + 1]
+    direction = 'ASC' if newer else 'DESC'
+    
+    rows = conn.execute(f'''
+        SELECT kind, id, user_id, full_name, username, message_text, parent_message_id,
+               filename, original_filename, file_size, file_type,
+               CAST(created_at AS TEXT) AS sort_key, created_at AS "created_at [timestamp]"
+        FROM (
+            SELECT * FROM (
+                SELECT {TIMELINE_MESSAGE} AS kind, m.id, m.user_id, u.full_name, u.username,
+                       m.message_text, m.parent_message_id,
+                       NULL AS filename, NULL AS original_filename, NULL AS file_size, NULL AS file_type,
+                       m.created_at
+                FROM messages m
+                JOIN users u ON m.user_id = u.id
+                WHERE m.session_id = ? {message_filter}
+                ORDER BY m.created_at {direction}, m.id {direction}
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT {TIMELINE_FILE} AS kind, f.id, f.user_id, u.full_name, u.username,
+                       NULL, NULL,
+                       f.filename, f.original_filename, f.file_size, f.file_type,
+                       f.uploaded_at
+                FROM files f
+                JOIN users u ON f.user_id = u.id
+                WHERE f.session_id = ? AND f.file_context = 'chat' {file_filter}
+                ORDER BY f.uploaded_at {direction}, f.id {direction}
+                LIMIT ?
+            )
+        )
+        ORDER BY created_at {direction}, kind {direction}, id {direction}
+        LIMIT ?
+    ''', params).fetchall()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not newer:
+        rows.reverse()
+    
+    # Hydrate messages (reactions, thread parents) in batched queries
+    messages = iter(enrich_messages(conn, [r for r in rows if r['kind'] == TIMELINE_MESSAGE]))
+    items = []
+    for r in rows:
+        if r['kind'] == TIMELINE_MESSAGE:
+            items.append(next(messages))
+        else:
+            items.append({
+                'id': r['id'],
                 'type': 'file',
-                'full_name': file['full_name'],
-                'username': file['username'],
-                'created_at': file['uploaded_at'],
-                'user_id': file['user_id'],
-                'file_id': file['id'],
-                'filename': file['filename'],
-                'original_filename': file['original_filename'],
-                'file_size': file['file_size'],
-                'file_type': file['file_type']
+                'full_name': r['full_name'],
+                'username': r['username'],
+                'created_at': r['created_at'],
+                'user_id': r['user_id'],
+                'file_id': r['id'],
+                'filename': r['filename'],
+                'original_filename': r['original_filename'],
+                'file_size': r['file_size'],
+                'file_type': r['file_type']
             })
+    
+    keys = [(r['sort_key'], r['kind'], r['id']) for r in rows]
+    return {
+        'items': items,
+        'before': encode_timeline_cursor(keys[0]) if keys else before,
+        'after': encode_timeline_cursor(keys[-1]) if keys else after,
+        'has_more': has_more
+    }
+
+# ============================================
+# RSVP CAPACITY & WAITLIST
+# ============================================
+
+# Sessions without a max_participants value default to 10 seats
+SESSION_CAPACITY_SQL = 'COALESCE(NULLIF(max_participants, 0), 10)'
+
+def reserve_seat(conn, session_id, user_id, waitlist=True):
+    """RSVP a user to a session if it has room, otherwise waitlist them.
+    
+    The seat is taken with a single conditional INSERT against the
+    trigger-maintained sessions.rsvp_count, so concurrent RSVPs can never
+    oversubscribe a session. Run inside a write transaction (write_queue).
+    
+    Args:
+        conn: Database connection
+        session_id: ID of the study session
+        user_id: ID of the user taking the seat
+        waitlist: Add the user to the waitlist if the session is full
+        
+    Returns:
+        'joined', 'already_joined', 'waitlisted', 'already_waitlisted' or 'full'
+    """
+    existing = conn.execute(
+        'SELECT id FROM rsvps WHERE session_id = ? AND user_id = ?',
+        (session_id, user_id)
+    ).fetchone()
+    if existing:
+        return 'already_joined'
+    
+    cursor = conn.execute(f'''
+        INSERT INTO rsvps (session_id, user_id)
+        SELECT id, ? FROM sessions
+        WHERE id = ? AND rsvp_count < {SESSION_CAPACITY_SQL}
+    ''', (user_id, session_id))
+    if cursor.rowcount:
+        return 'joined'
+    
+    if not waitlist:
+        return 'full'
+    
+    cursor = conn.execute(
+        'INSERT OR IGNORE INTO session_waitlist (session_id, user_id) VALUES (?, ?)',
+        (session_id, user_id)
+    )
+    return 'waitlisted' if cursor.rowcount else 'already_waitlisted'
+
+def release_seat(conn, session_id, user_id):
+    """Cancel a user's RSVP (or waitlist entry) and promote from the waitlist.
+    
+    Waitlisted users are promoted in FIFO order for as long as seats are
+    free. Run inside a write transaction (write_queue).
+    
+    Args:
+        conn: Database connection
+        session_id: ID of the study session
+        user_id: ID of the user cancelling
+        
+    Returns:
+        List of user IDs promoted from the waitlist
+    """
+    cursor = conn.execute(
+        'DELETE FROM rsvps WHERE session_id = ? AND user_id = ?',
+        (session_id, user_id)
+    )
+    conn.execute(
+        'DELETE FROM session_waitlist WHERE session_id = ? AND user_id = ?',
+        (session_id, user_id)
+    )
+    if not cursor.rowcount:
+        return []
+    
+    promoted = []
+    while True:
+        # The rsvps insert trigger removes the promoted user's waitlist entry
+        row = conn.execute(f'''
+            INSERT INTO rsvps (session_id, user_id)
+            SELECT w.session_id, w.user_id
+            FROM session_waitlist w
+            JOIN sessions s ON s.id = w.session_id
+            WHERE w.session_id = ? AND s.rsvp_count < {SESSION_CAPACITY_SQL}
+            ORDER BY w.id
+            LIMIT 1
+            RETURNING user_id
+        ''', (session_id,)).fetchone()
+        if not row:
+            return promoted
+        promoted.append(row['user_id'])
+
+def get_waitlist_position(conn, session_id, user_id):
+    """Return a user's 1-based waitlist position for a session, or None"""
+    row = conn.execute('''
+        SELECT COUNT(*) as position FROM session_waitlist
+        WHERE session_id = ? AND id <= (
+            SELECT id FROM session_waitlist WHERE session_id = ? AND user_id = ?
+        )
+    ''', (session_id, session_id, user_id)).fetchone()
+    return row['position'] or None
+
+# ============================================
+# SESSION MANAGEMENT ROUTES
+# ============================================
+
+@app.route('/create', methods=['GET', 'POST'])
+@login_required
+@handle_errors
+def create():
+    """Create a new study session with validation and proper error handling."""
+    if request.method == 'POST':
+        # Validate all form inputs
+        try:
+            title = validate_string(request.form.get('title', ''), 'Title', min_len=3, max_len=200)
+            session_type = validate_string(request.form.get('session_type', ''), 'Session type', min_len=1, max_len=50)
+            subject = validate_string(request.form.get('subject', 'General'), 'Subject', min_len=1, max_len=100)
+            session_date = validate_string(request.form.get('session_date', ''), 'Session date', min_len=1, max_len=50)
+            max_participants = validate_integer(request.form.get('max_participants', 10), 'Max participants', min_val=1, max_val=1000)
+            meeting_link = request.form.get('meeting_link', '').strip()[:500]  # Optional, limit length
+            location = request.form.get('location', '').strip()[:200]  # Optional, limit length
+            
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('create'))
+        
+        # Use context manager for atomic database operations
+        with get_db_connection() as conn:
+            # Create session
+            cursor = conn.execute(
+                '''INSERT INTO sessions (title, session_type, subject, session_date, 
+                   max_participants, meeting_link, location, creator_id) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (title, session_type, subject, session_date, max_participants, 
+                 meeting_link, location, session['user_id'])
+            )
+            session_id = cursor.lastrowid
+            
+            # Automatically RSVP the creator to their own session
+            conn.execute(
+                'INSERT INTO rsvps (session_id, user_id) VALUES (?, ?)',
+                (session_id, session['user_id'])
+            )
         
-        # Create unified timeline: sort messages and chat files chronologically
-        messages = sorted(messages, key=lambda x: x['created_at'])
+        flash('Study session created successfully!', 'success')
+        return redirect(url_for('detail', session_id=session_id))
+    
+    return render_template('create.html')
+
+@app.route('/session/<int:session_id>', methods=['GET', 'POST'])
+@handle_errors
+def detail(session_id):
+    """Display session details with chat, files, RSVPs using context manager."""
+    # Use context manager for all database operations in this route
+    with get_db_connection() as conn:
+        # Fetch session details with creator information
+        study_session = conn.execute('''
+            SELECT s.*, u.full_name as creator_name, u.id as creator_user_id
+            FROM sessions s
+            LEFT JOIN users u ON s.creator_id = u.id
+            WHERE s.id = ?
+        ''', (session_id,)).fetchone()
+        
+        # Verify session exists
+        if not study_session:
+            flash('Session not found!', 'danger')
+            return redirect(url_for('index'))
+        
+        # Handle RSVP submission (POST request)
+        if request.method == 'POST' and 'rsvp' in request.form and 'user_id' in session:
+            # Conditional insert against rsvp_count: O(1) and safe under concurrent RSVPs
+            user_id = session['user_id']
+            result = write_queue.execute(lambda write_conn: reserve_seat(write_conn, session_id, user_id))
+            
+            if result == 'joined':
+                flash('RSVP submitted successfully!', 'success')
+            elif result == 'already_joined':
+                flash('You have already RSVP\'d to this session!', 'warning')
+            elif result == 'waitlisted':
+                flash('This session is full, so you have been added to the waitlist.', 'info')
+            else:
+                flash('You are already on the waitlist for this session.', 'warning')
+            
+            return redirect(url_for('detail', session_id=session_id))
+        
+        # Fetch all RSVPs for this session with user details
+        rsvps = conn.execute('''
+            SELECT r.*, u.full_name, u.username
+            FROM rsvps r
+            JOIN users u ON r.user_id = u.id
+            WHERE r.session_id = ?
+        ''', (session_id,)).fetchall()
+        
+        # Load only the newest page of the chat timeline; older pages are fetched on scroll
+        timeline = load_chat_timeline(conn, session_id)
+        messages = timeline['items']
         
         # Fetch study material files separately (displayed in dedicated section)
         files = conn.execute('''
@@ -1167,22 +2320,6 @@ def detail(session_id):
             ORDER BY f.name
         ''', (session_id,)).fetchall()
         
-        # get users for invite dropdown (exclude already invited/joined)
-        all_users = []
-        if 'user_id' in session and study_session['creator_user_id'] == session['user_id']:
-            rsvp_user_ids = [r['user_id'] for r in rsvps]
-            invited_user_ids = [i['invitee_id'] for i in conn.execute(
-                'SELECT invitee_id FROM invitations WHERE session_id = ?', (session_id,)
-            ).fetchall()]
-            excluded_ids = rsvp_user_ids + invited_user_ids + [session['user_id']]
-            
-            placeholders = ','.join('?' * len(excluded_ids))
-            all_users = conn.execute(f'''
-                SELECT id, full_name, username FROM users 
-                WHERE id NOT IN ({placeholders})
-                ORDER BY full_name
-            ''', excluded_ids).fetchall()
-        
         # Fetch session recordings
         recordings = conn.execute('''
             SELECT r.*, u.full_name, u.username
@@ -1191,10 +2328,15 @@ def detail(session_id):
             WHERE r.session_id = ?
             ORDER BY r.created_at DESC
         ''', (session_id,)).fetchall()
+        
+        # Waitlist position for the current user (None if not waitlisted)
+        waitlist_position = None
+        if 'user_id' in session:
+            waitlist_position = get_waitlist_position(conn, session_id, session['user_id'])
     # End of 'with get_db_connection()' context manager - connection auto-closed
     
     # calculate spots remaining
-    current_count = len(rsvps)
+    current_count = study_session['rsvp_count']
     max_participants = study_session['max_participants'] if study_session['max_participants'] else 10
     is_full = current_count >= max_participants
     spots_left = max_participants - current_count
@@ -1216,9 +2358,11 @@ def detail(session_id):
         session['auto_translate'] = auto_translate
     
     return render_template('detail.html', study_session=study_session, rsvps=rsvps, messages=messages,
+                         timeline_before=timeline['before'], timeline_has_older=timeline['has_more'],
+                         waitlist_position=waitlist_position,
                          current_count=current_count, max_participants=max_participants,
                          is_full=is_full, spots_left=spots_left, user_has_rsvp=user_has_rsvp,
-                         is_creator=is_creator, all_users=all_users, files=files, folders=folders, recordings=recordings)
+                         is_creator=is_creator, files=files, folders=folders, recordings=recordings)
 
 # ============================================
 # MESSAGING ROUTES
@@ -1229,69 +2373,38 @@ def detail(session_id):
 def post_message(session_id):
     """Post a new message to a session's chat.
     
-    Supports threaded replies via parent_message_id.
+    Supports threaded replies via parent_message_id. Clients that cannot use
+    the 'send_message' socket event fall back to this route, passing the same
+    client_msg_id so a retry never stores the message twice.
     Broadcasts new messages via WebSocket for real-time updates.
     """
     message_text = request.form.get('message_text', '')
-    parent_message_id = request.form.get('parent_message_id', None)
+    parent_message_id = request.form.get('parent_message_id') or None
+    client_msg_id = request.form.get('client_msg_id') or None
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     
+    if client_msg_id and len(client_msg_id) > MAX_CLIENT_MSG_ID_LENGTH:
+        if is_ajax:
+            return jsonify({'success': False, 'error': 'Invalid client_msg_id'}), 400
+        client_msg_id = None
+    
     if message_text.strip():
-        conn = get_db()
-        
-        # Insert message with optional parent for threading
-        conn.execute(
-            'INSERT INTO messages (session_id, user_id, message_text, parent_message_id) VALUES (?, ?, ?, ?)',
-            (session_id, session['user_id'], message_text, parent_message_id)
-        )
-        conn.commit()
-        
-        # Retrieve newly created message with user details for broadcast
-        new_message = conn.execute('''
-            SELECT m.*, u.full_name, u.username
-            FROM messages m
-            JOIN users u ON m.user_id = u.id
-            WHERE m.session_id = ? AND m.user_id = ?
-            ORDER BY m.created_at DESC
-            LIMIT 1
-        ''', (session_id, session['user_id'])).fetchone()
-        
-        # Get parent message info if this is a reply
-        parent_info = None
-        if parent_message_id:
-            parent = conn.execute('''
-                SELECT m.message_text, u.full_name
-                FROM messages m
-                JOIN users u ON m.user_id = u.id
-                WHERE m.id = ?
-            ''', (parent_message_id,)).fetchone()
-            if parent:
-                parent_info = {
-                    'id': parent_message_id,
-                    'text': parent['message_text'],
-                    'author': parent['full_name']
-                }
-        
-        conn.close()
+        # Insert message with optional parent for threading (group-committed)
+        try:
+            message_data, created = insert_chat_message(
+                session_id, session['user_id'], message_text, parent_message_id, client_msg_id
+            )
+        except sqlite3.IntegrityError:
+            # Unknown session or deleted parent message (foreign keys are enforced)
+            if is_ajax:
+                return jsonify({'success': False, 'error': 'Session or parent message not found'}), 400
+            flash('Could not post message: session or parent message not found')
+            return redirect(url_for('detail', session_id=session_id))
         
         # Broadcast message to all users in the session room via WebSocket
-        # Convert datetime to string for JSON serialization
-        created_at_str = new_message['created_at']
-        if isinstance(created_at_str, datetime):
-            created_at_str = created_at_str.strftime('%Y-%m-%d %H:%M:%S')
-        
-        message_data = {
-            'id': new_message['id'],
-            'full_name': new_message['full_name'],
-            'username': new_message['username'],
-            'message_text': new_message['message_text'],
-            'created_at': created_at_str,
-            'user_id': new_message['user_id'],
-            'parent_message_id': new_message['parent_message_id'],
-            'parent_info': parent_info,
-            'reactions': []
-        }
-        socketio.emit('new_message', message_data, room=f'session_{session_id}')
+        if created:
+            change_versions.bump('messages', session_id)
+            session_events.emit('new_message', message_data, room=f'session_{session_id}')
         
         if is_ajax:
             return jsonify({
@@ -1319,6 +2432,12 @@ def get_messages(session_id):
     """
     last_message_id = request.args.get('last_id', 0, type=int)
     
+    # Nothing new since the client's last poll: answer from memory
+    etag = change_versions.etag('messages', session_id, last_message_id)
+    cached = not_modified_response(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     
     # Fetch only messages newer than last_id for efficient polling
@@ -1330,34 +2449,49 @@ def get_messages(session_id):
         ORDER BY m.created_at ASC
     ''', (session_id, last_message_id)).fetchall()
     
-    # Enrich each message with aggregated reactions
-    message_list = []
-    for msg in messages:
-        reactions = conn.execute('''
-            SELECT emoji, COUNT(*) as count, GROUP_CONCAT(user_id) as user_ids
-            FROM message_reactions
-            WHERE message_id = ?
-            GROUP BY emoji
-        ''', (msg['id'],)).fetchall()
-        
-        message_list.append({
-            'id': msg['id'],
-            'full_name': msg['full_name'],
-            'username': msg['username'],
-            'message_text': msg['message_text'],
-            'created_at': msg['created_at'],
-            'user_id': msg['user_id'],
-            'parent_message_id': msg['parent_message_id'],
-            'reactions': [{
-                'emoji': r['emoji'],
-                'count': r['count'],
-                'user_ids': [int(uid) for uid in r['user_ids'].split(',')]
-            } for r in reactions]
-        })
+    # Enrich messages with aggregated reactions in one batched query
+    message_list = enrich_messages(conn, messages, include_parents=False)
+    for message in message_list:
+        del message['type']
     
     conn.close()
     
-    return jsonify({'messages': message_list})
+    return etagged_json({'messages': message_list}, etag)
+
+@app.route('/session/<int:session_id>/timeline')
+def get_timeline(session_id):
+    """API endpoint for cursor-paginated chat history (messages and chat files).
+    
+    Args:
+        session_id: ID of the study session
+        before (query param): Cursor; fetch the page older than it
+        after (query param): Cursor; fetch the page newer than it
+        limit (query param): Page size, capped at 100
+        
+    Returns:
+        JSON with 'items' (oldest first), 'before'/'after' cursors and 'has_more'
+    """
+    before = request.args.get('before')
+    after = request.args.get('after')
+    limit = min(max(request.args.get('limit', Config.CHAT_PAGE_SIZE, type=int), 1), 100)
+    
+    if before and after:
+        return jsonify({'error': 'Use either before or after, not both'}), 400
+    
+    conn = get_db()
+    try:
+        timeline = load_chat_timeline(conn, session_id, before=before, after=after, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    # Convert datetimes to strings for JSON serialization
+    for item in timeline['items']:
+        if isinstance(item['created_at'], datetime):
+            item['created_at'] = item['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    
+    return jsonify(timeline)
 
 @app.route('/message/<int:message_id>/react', methods=['POST'])
 @login_required
@@ -1394,51 +2528,46 @@ def react_to_message(message_id):
         return jsonify({'success': False, 'error': 'Message not found'}), 404
     
     session_id = message['session_id']
+    user_id = session['user_id']
     
-    # Check if user has already reacted with this emoji
-    existing = conn.execute('''
-        SELECT id FROM message_reactions 
-        WHERE message_id = ? AND user_id = ? AND emoji = ?
-    ''', (message_id, session['user_id'], emoji)).fetchone()
-    
-    # Toggle logic: remove if exists, add if doesn't
-    if action == 'toggle':
-        action = 'remove' if existing else 'add'
-    
-    if action == 'add' and not existing:
-        conn.execute('''
-            INSERT INTO message_reactions (message_id, user_id, emoji) 
-            VALUES (?, ?, ?)
-        ''', (message_id, session['user_id'], emoji))
-        conn.commit()
-    elif action == 'remove' and existing:
-        conn.execute('''
-            DELETE FROM message_reactions 
+    def apply_reaction(write_conn):
+        # Check and write in the same transaction so concurrent toggles can't race
+        existing = write_conn.execute('''
+            SELECT id FROM message_reactions 
             WHERE message_id = ? AND user_id = ? AND emoji = ?
-        ''', (message_id, session['user_id'], emoji))
-        conn.commit()
-    
-    # Get updated reaction counts for this message
-    reactions = conn.execute('''
-        SELECT emoji, COUNT(*) as count, GROUP_CONCAT(user_id) as user_ids
-        FROM message_reactions
-        WHERE message_id = ?
-        GROUP BY emoji
-    ''', (message_id,)).fetchall()
+        ''', (message_id, user_id, emoji)).fetchone()
+        
+        # Toggle logic: remove if exists, add if doesn't
+        resolved = action
+        if resolved == 'toggle':
+            resolved = 'remove' if existing else 'add'
+        
+        if resolved == 'add' and not existing:
+            write_conn.execute('''
+                INSERT INTO message_reactions (message_id, user_id, emoji) 
+                VALUES (?, ?, ?)
+            ''', (message_id, user_id, emoji))
+        elif resolved == 'remove' and existing:
+            write_conn.execute('''
+                DELETE FROM message_reactions 
+                WHERE message_id = ? AND user_id = ? AND emoji = ?
+            ''', (message_id, user_id, emoji))
+        
+        # Counts are maintained by triggers; read them back in the same transaction
+        return load_message_reactions(write_conn, [message_id])[message_id]
     
     conn.close()
     
+    reactions = write_queue.execute(apply_reaction)
+    change_versions.bump('messages', session_id)
+    
     reaction_data = {
         'message_id': message_id,
-        'reactions': [{
-            'emoji': r['emoji'],
-            'count': r['count'],
-            'user_ids': [int(uid) for uid in r['user_ids'].split(',')]
-        } for r in reactions]
+        'reactions': reactions
     }
     
-    # Broadcast reaction update to all users in the session
-    socketio.emit('reaction_updated', reaction_data, room=f'session_{session_id}')
+    # Broadcast the message's latest reactions once per coalescing window
+    reaction_broadcasts.submit(f'session_{session_id}', message_id)
     
     return jsonify({'success': True, 'data': reaction_data})
 
@@ -1446,6 +2575,44 @@ def react_to_message(message_id):
 # RSVP & INVITATION ROUTES
 # ============================================
 
+@app.route('/session/<int:session_id>/cancel-rsvp', methods=['POST'])
+@login_required
+def cancel_rsvp(session_id):
+    """Cancel the current user's RSVP or leave the session's waitlist.
+    
+    A freed seat is handed to the next waitlisted user in the same
+    transaction, and promoted users are notified.
+    """
+    conn = get_db()
+    study_session = conn.execute(
+        'SELECT title, creator_id FROM sessions WHERE id = ?',
+        (session_id,)
+    ).fetchone()
+    conn.close()
+    
+    if not study_session:
+        flash('Session not found!', 'danger')
+        return redirect(url_for('index'))
+    
+    user_id = session['user_id']
+    if study_session['creator_id'] == user_id:
+        flash('The session creator cannot cancel their RSVP.', 'warning')
+        return redirect(url_for('detail', session_id=session_id))
+    
+    promoted = write_queue.execute(lambda write_conn: release_seat(write_conn, session_id, user_id))
+    
+    for promoted_user_id in promoted:
+        create_notification(
+            promoted_user_id,
+            'invitation',
+            'You\'re in!',
+            f'A spot opened up in "{study_session["title"]}" and you have been moved off the waitlist.',
+            url_for('detail', session_id=session_id)
+        )
+    
+    flash('Your RSVP has been cancelled.', 'info')
+    return redirect(url_for('detail', session_id=session_id))
+
 @app.route('/session/<int:session_id>/invite', methods=['POST'])
 @login_required
 def invite_user(session_id):
@@ -1531,10 +2698,14 @@ def delete_session(session_id):
         # Clean up all database records associated with this session
         conn.execute('DELETE FROM files WHERE session_id = ?', (session_id,))
         conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+        conn.execute('DELETE FROM session_waitlist WHERE session_id = ?', (session_id,))
         conn.execute('DELETE FROM rsvps WHERE session_id = ?', (session_id,))
         conn.execute('DELETE FROM invitations WHERE session_id = ?', (session_id,))
         conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
         conn.commit()
+        change_versions.bump('messages', session_id)
+        change_versions.bump('files', session_id)
+        session_events.discard(f'session_{session_id}')
         
         flash('Study session deleted successfully!')
         conn.close()
@@ -1566,13 +2737,6 @@ def send_reminder(session_id):
     ).fetchone()
     
     if study_session and study_session['creator_id'] == session['user_id']:
-        # Create reminder record
-        cursor = conn.execute(
-            'INSERT INTO reminders (session_id, reminder_text, sent_by) VALUES (?, ?, ?)',
-            (session_id, reminder_text, session['user_id'])
-        )
-        reminder_id = cursor.lastrowid
-        
         # Get session details and participants
         session_info = conn.execute(
             'SELECT title FROM sessions WHERE id = ?',
@@ -1584,19 +2748,30 @@ def send_reminder(session_id):
             WHERE session_id = ? AND user_id != ?
         ''', (session_id, session['user_id'])).fetchall()
         
-        # Create notifications for all participants
-        for participant in participants:
-            conn.execute('''
+        sender_id = session['user_id']
+        
+        def record_reminder(write_conn):
+            # Create reminder record
+            cursor = write_conn.execute(
+                'INSERT INTO reminders (session_id, reminder_text, sent_by) VALUES (?, ?, ?)',
+                (session_id, reminder_text, sender_id)
+            )
+            
+            # Create notifications for all participants
+            write_conn.executemany('''
                 INSERT INTO notifications (user_id, type, title, message, link)
                 VALUES (?, 'reminder', ?, ?, ?)
-            ''', (
+            ''', [(
                 participant['user_id'],
                 f'Reminder: {session_info["title"]}',
                 reminder_text,
                 f'/session/{session_id}'
-            ))
+            ) for participant in participants])
+            return cursor.lastrowid
         
-        conn.commit()
+        write_queue.execute(record_reminder)
+        for participant in participants:
+            change_versions.bump('notifications', participant['user_id'])
         flash(f'Reminder sent to all participants: "{reminder_text}"')
     else:
         flash('Only the session creator can send reminders!')
@@ -1637,6 +2812,11 @@ def get_notifications():
     Returns:
         JSON with list of up to 50 most recent notifications
     """
+    etag = change_versions.etag('notifications', session['user_id'], 'list')
+    cached = not_modified_response(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     notifications = conn.execute('''
         SELECT * FROM notifications 
@@ -1646,7 +2826,7 @@ def get_notifications():
     ''', (session['user_id'],)).fetchall()
     conn.close()
     
-    return jsonify({
+    return etagged_json({
         'notifications': [{
             'id': n['id'],
             'type': n['type'],
@@ -1656,19 +2836,24 @@ def get_notifications():
             'is_read': n['is_read'],
             'created_at': n['created_at']
         } for n in notifications]
-    })
+    }, etag)
 
 @app.route('/notifications/unread-count')
 @login_required
 def unread_count():
     """Get count of unread notifications"""
+    etag = change_versions.etag('notifications', session['user_id'], 'unread')
+    cached = not_modified_response(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     count = conn.execute(
         'SELECT COUNT(*) as count FROM notifications WHERE user_id = ? AND is_read = 0',
         (session['user_id'],)
     ).fetchone()['count']
     conn.close()
-    return jsonify({'count': count})
+    return etagged_json({'count': count}, etag)
 
 @app.route('/notifications/<int:notif_id>/read', methods=['POST'])
 @login_required
@@ -1681,6 +2866,7 @@ def mark_notification_read(notif_id):
     )
     conn.commit()
     conn.close()
+    change_versions.bump('notifications', session['user_id'])
     return jsonify({'success': True})
 
 @app.route('/notifications/mark-all-read', methods=['POST'])
@@ -1694,6 +2880,7 @@ def mark_all_read():
     )
     conn.commit()
     conn.close()
+    change_versions.bump('notifications', session['user_id'])
     return jsonify({'success': True})
 
 # ============================================
@@ -1768,6 +2955,7 @@ def upload_file(session_id):
                     (session_id, session['user_id'], filename, original_filename, file_size, file_type, file_context))
         file_id = cursor.lastrowid
         conn.commit()
+        change_versions.bump('files', session_id)
         
         # get user info for AJAX response
         user_info = conn.execute('SELECT full_name, username FROM users WHERE id = ?', 
@@ -1792,9 +2980,9 @@ def upload_file(session_id):
         
         # Emit different events based on context
         if file_context == 'chat':
-            socketio.emit('chat_file', file_data, room=f'session_{session_id}')
+            session_events.emit('chat_file', file_data, room=f'session_{session_id}')
         else:
-            socketio.emit('new_file', file_data, room=f'session_{session_id}')
+            session_events.emit('new_file', file_data, room=f'session_{session_id}')
         
         if is_ajax:
             return jsonify({
@@ -1819,6 +3007,11 @@ def get_files(session_id):
     """API endpoint to fetch study material files for real-time updates"""
     last_file_id = request.args.get('last_id', 0, type=int)
     
+    etag = change_versions.etag('files', session_id, last_file_id)
+    cached = not_modified_response(etag)
+    if cached:
+        return cached
+    
     conn = get_db()
     files = conn.execute('''
         SELECT f.*, u.full_name, u.username
@@ -1829,7 +3022,7 @@ def get_files(session_id):
     ''', (session_id, last_file_id)).fetchall()
     conn.close()
     
-    return jsonify({
+    return etagged_json({
         'files': [{
             'id': f['id'],
             'original_filename': f['original_filename'],
@@ -1839,7 +3032,7 @@ def get_files(session_id):
             'username': f['username'],
             'uploaded_at': f['uploaded_at']
         } for f in files]
-    })
+    }, etag)
 
 @app.route('/file/<int:file_id>/download')
 @login_required
@@ -1931,6 +3124,7 @@ def delete_file(file_id):
         # remove from database
         conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
         conn.commit()
+        change_versions.bump('files', session_id)
         flash('File deleted successfully')
     else:
         flash('You can only delete your own files')
@@ -2313,6 +3507,7 @@ def upload_file_version(file_id):
         ''', (file_id, new_version, filename, file_size, session['user_id'], change_description))
         
         conn.commit()
+        change_versions.bump('files', file_record['session_id'])
         conn.close()
         
         return jsonify({
@@ -2371,6 +3566,7 @@ def revert_file_version(file_id, version_number):
           session['user_id'], f'Reverted to version {version_number}'))
     
     conn.commit()
+    change_versions.bump('files', file_record['session_id'])
     conn.close()
     
     return jsonify({
@@ -3275,6 +4471,33 @@ def recommendations_page():
     """Display AI recommendations page"""
     return render_template('recommendations.html')
 
+@app.route('/api/metrics/db')
+@login_required
+def db_metrics():
+    """Connection pool, write queue, conditional-GET, broadcast coalescing, blocking pool and whiteboard metrics for monitoring"""
+    return jsonify({
+        'pool': db_pool.get_stats(),
+        'write_queue': write_queue.get_metrics(),
+        'conditional_get': change_versions.get_stats(),
+        'reaction_broadcasts': reaction_broadcasts.get_stats(),
+        'blocking_pool': blocking_pool.get_stats(),
+        'whiteboard_log': whiteboard_log.get_stats(),
+        'whiteboard_states': whiteboard_states.get_stats(),
+        'whiteboard_history': whiteboard_history.get_stats()
+    })
+
+@app.route('/api/metrics/socketio')
+@login_required
+def socket_event_metrics():
+    """Per-event Socket.IO metrics plus replay, typing, presence and whiteboard frame state (python socketio_metrics.py dumps this)"""
+    return jsonify({
+        'socketio': socket_metrics.get_stats(),
+        'session_events': session_events.get_stats(),
+        'typing': typing_state.get_stats(),
+        'presence': presence.get_stats(),
+        'whiteboard_frames': whiteboard_frames.get_stats()
+    })
+
 @app.route('/offline')
 def offline():
     """Offline fallback page for PWA"""
@@ -3289,8 +4512,7 @@ def offline():
 def analytics():
     """Display study analytics dashboard"""
     user_id = session['user_id']
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get sessions user has attended
@@ -3420,8 +4642,7 @@ def analytics():
 @login_required
 def export_to_calendar(session_id):
     """Export session to .ics calendar file"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get session details
@@ -3499,8 +4720,7 @@ def search():
     if not query or len(query) < 2:
         return jsonify({'results': []})
     
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     results = {
@@ -3560,7 +4780,7 @@ def search():
                 'session_title': row['session_title'],
                 'author_name': row['author_name'],
                 'message_snippet': row['message_snippet'],
-                'created_at': row['created_at'],
+                'created_at': row['created_at'].strftime('%Y-%m-%d %H:%M:%S') if isinstance(row['created_at'], datetime) else row['created_at'],
                 'type': 'message'
             })
     except sqlite3.OperationalError:
@@ -3621,7 +4841,7 @@ def search():
                 'filename_snippet': row['filename_snippet'],
                 'file_type': row['file_type'],
                 'uploader_name': row['uploader_name'],
-                'uploaded_at': row['uploaded_at'],
+                'uploaded_at': row['uploaded_at'].strftime('%Y-%m-%d %H:%M:%S') if isinstance(row['uploaded_at'], datetime) else row['uploaded_at'],
                 'type': 'file'
             })
     except sqlite3.OperationalError:
@@ -3638,6 +4858,49 @@ def search():
         'results': results
     })
 
+@app.route('/api/users/search')
+@login_required
+def search_users():
+    """Typeahead user search backed by the users_fts prefix index.
+    
+    Args:
+        q (query param): Prefix of a username or full name
+        session_id (query param): Optional; exclude users already RSVP'd to
+            or invited to this session
+        limit (query param): Max results, capped at 20
+        
+    Returns:
+        JSON with the top matching users
+    """
+    match = build_prefix_query(request.args.get('q', ''))
+    session_id = request.args.get('session_id', type=int)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
+    
+    if not match:
+        return jsonify({'success': True, 'users': []})
+    
+    conn = get_db()
+    users = conn.execute('''
+        SELECT u.id, u.username, u.full_name
+        FROM users_fts
+        JOIN users u ON u.id = users_fts.rowid
+        WHERE users_fts MATCH ? AND u.id != ?
+        AND NOT EXISTS (SELECT 1 FROM rsvps r WHERE r.session_id = ? AND r.user_id = u.id)
+        AND NOT EXISTS (SELECT 1 FROM invitations i WHERE i.session_id = ? AND i.invitee_id = u.id)
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, session['user_id'], session_id, session_id, limit)).fetchall()
+    conn.close()
+    
+    return jsonify({
+        'success': True,
+        'users': [{
+            'id': u['id'],
+            'username': u['username'],
+            'full_name': u['full_name']
+        } for u in users]
+    })
+
 # ============================================
 # FLASHCARD SYSTEM
 # ============================================
@@ -3646,8 +4909,7 @@ def search():
 @login_required
 def flashcards():
     """View all flashcard decks"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get user's decks and public decks
@@ -3673,8 +4935,7 @@ def flashcards():
 @login_required
 def view_deck(deck_id):
     """View cards in a deck"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get deck info
@@ -3687,6 +4948,7 @@ def view_deck(deck_id):
     ''', (deck_id, session['user_id'])).fetchone()
     
     if not deck:
+        conn.close()
         flash('Deck not found or access denied')
         return redirect(url_for('flashcards'))
     
@@ -3785,8 +5047,7 @@ def add_card(deck_id):
 @login_required
 def study_deck(deck_id):
     """Study mode - spaced repetition"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get deck info
@@ -3798,6 +5059,7 @@ def study_deck(deck_id):
     ''', (deck_id, session['user_id'])).fetchone()
     
     if not deck_row:
+        conn.close()
         flash('Deck not found or access denied')
         return redirect(url_for('flashcards'))
     
@@ -3911,14 +5173,14 @@ def profile(user_id):
     Shows public information and statistics for any user.
     Shows additional private information when viewing own profile.
     """
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     c = conn.cursor()
     
     # Get user info
     user = c.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
     
     if not user:
+        conn.close()
         flash('User not found')
         return redirect(url_for('index'))
     
@@ -4419,22 +5681,20 @@ def respond_invitation(invitation_id):
     
     if invitation:
         if response == 'accept':
-            # verify session isn't full before accepting
-            current_count = conn.execute('SELECT COUNT(*) as count FROM rsvps WHERE session_id = ?',
-                                        (invitation['session_id'],)).fetchone()['count']
+            # Take a seat atomically; invitations don't fall back to the waitlist
+            user_id = session['user_id']
+            result = write_queue.execute(
+                lambda write_conn: reserve_seat(write_conn, invitation['session_id'], user_id, waitlist=False)
+            )
             
-            if current_count >= invitation['max_participants']:
+            if result == 'full':
                 flash('Sorry, this session is now full!')
                 conn.execute('UPDATE invitations SET status = ? WHERE id = ?', ('declined', invitation_id))
+            elif result == 'already_joined':
+                flash('You have already RSVP\'d to this session!')
             else:
-                # add RSVP and mark invitation accepted
-                try:
-                    conn.execute('INSERT INTO rsvps (session_id, user_id) VALUES (?, ?)',
-                               (invitation['session_id'], session['user_id']))
-                    conn.execute('UPDATE invitations SET status = ? WHERE id = ?', ('accepted', invitation_id))
-                    flash('Invitation accepted! You have been added to the session.')
-                except sqlite3.IntegrityError:
-                    flash('You have already RSVP\'d to this session!')
+                conn.execute('UPDATE invitations SET status = ? WHERE id = ?', ('accepted', invitation_id))
+                flash('Invitation accepted! You have been added to the session.')
         else:
             conn.execute('UPDATE invitations SET status = ? WHERE id = ?', ('declined', invitation_id))
             flash('Invitation declined.')
@@ -4701,17 +5961,17 @@ def autosave_note(note_id):
         conn.close()
         return jsonify({'error': 'Unauthorized'}), 403
     
+    conn.close()
+    
     data = request.json
     content = data.get('content', '')
     title = data.get('title', '')
     
-    conn.execute('''
+    write_queue.execute('''
         UPDATE notes 
         SET content = ?, title = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (content, title, note_id))
-    conn.commit()
-    conn.close()
     
     return jsonify({'success': True, 'timestamp': datetime.now().isoformat()})
 
@@ -4927,7 +6187,8 @@ def ai_assist():
             user_message = content
         
         # Call OpenAI API
-        response = openai_client.chat.completions.create(
+        response = blocking_pool.run(
+            openai_client.chat.completions.create,
             model=Config.AI_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -4986,7 +6247,8 @@ def ai_chat():
         api_messages.extend(messages)
         
         # Call OpenAI API
-        response = openai_client.chat.completions.create(
+        response = blocking_pool.run(
+            openai_client.chat.completions.create,
             model=Config.AI_MODEL,
             messages=api_messages,
             max_tokens=Config.AI_MAX_TOKENS,
@@ -5023,7 +6285,13 @@ atexit.register(lambda: scheduler.shutdown())
 
 @socketio.on('join_session')
 def handle_join_session(data):
-    """Handle user joining a session room for real-time chat and updates."""
+    """Handle user joining a session room for real-time chat and updates.
+    
+    Reconnecting clients send the last event seq and epoch they saw and get
+    the missed events replayed from the room's buffer in a 'session_sync'
+    event. If the gap has left the buffer, missed chat items are reloaded
+    from the database instead (using last_message_id / last_file_id).
+    """
     session_id = data.get('session_id')
     user_id = data.get('user_id')
     user_name = data.get('user_name')
@@ -5033,6 +6301,21 @@ def handle_join_session(data):
         join_room(room)
         print(f"User {user_name} (ID: {user_id}) joined room: {room}")
         
+        # Join first, then snapshot: anything emitted after the snapshot arrives live
+        head, missed = session_events.sync(room, data.get('last_seq'), data.get('epoch'))
+        sync = {'epoch': session_events.epoch, 'seq': head, 'events': missed or []}
+        if missed is None:
+            conn = get_db()
+            try:
+                sync['resync'] = load_chat_since(
+                    conn, session_id,
+                    data.get('last_message_id') or 0,
+                    data.get('last_file_id') or 0
+                )
+            finally:
+                conn.close()
+        emit('session_sync', sync)
+        
         # Broadcast user presence to others in the room
         if user_id and user_name:
             socketio.emit('user_joined', {
@@ -5040,6 +6323,49 @@ def handle_join_session(data):
                 'user_name': user_name
             }, room=room, include_self=False)
 
+@socketio.on('send_message')
+def handle_send_message(data):
+    """Store a chat message sent over the socket and ack the sender.
+    
+    Saves the HTTP round trip of post_message. The client sends a
+    client_msg_id with every message and reuses it when retrying after a
+    timeout or reconnect; a retry is acked with the stored message and not
+    broadcast again.
+    
+    Returns:
+        Ack dict with 'success' and either 'message' and 'duplicate' or 'error'
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return {'success': False, 'error': 'Login required'}
+    
+    data = data or {}
+    try:
+        session_id = int(data.get('session_id'))
+    except (TypeError, ValueError):
+        return {'success': False, 'error': 'Invalid session_id'}
+    message_text = data.get('message_text') or ''
+    parent_message_id = data.get('parent_message_id') or None
+    client_msg_id = data.get('client_msg_id') or None
+    
+    if not isinstance(message_text, str) or not message_text.strip():
+        return {'success': False, 'error': 'Empty message'}
+    if client_msg_id is not None and (not isinstance(client_msg_id, str) or len(client_msg_id) > MAX_CLIENT_MSG_ID_LENGTH):
+        return {'success': False, 'error': 'Invalid client_msg_id'}
+    
+    try:
+        message_data, created = insert_chat_message(
+            session_id, user_id, message_text, parent_message_id, client_msg_id
+        )
+    except sqlite3.IntegrityError:
+        # Unknown session or deleted parent message; not worth retrying
+        return {'success': False, 'error': 'Session or parent message not found'}
+    if created:
+        change_versions.bump('messages', session_id)
+        session_events.emit('new_message', message_data, room=f'session_{session_id}')
+    
+    return {'success': True, 'message': message_data, 'duplicate': not created}
+
 @socketio.on('leave_session')
 def handle_leave_session(data):
     """User leaves a session room"""
@@ -5051,6 +6377,8 @@ def handle_leave_session(data):
         room = f'session_{session_id}'
         leave_room(room)
         print(f"User {user_name} (ID: {user_id}) left room: {room}")
+        if user_name:
+            typing_state.update(room, session.get('user_id') or user_name, user_name, False)
         
         # Broadcast user departure to others in the room
         if user_id:
@@ -5069,121 +6397,1014 @@ def handle_file_upload(data):
 
 @socketio.on('typing')
 def handle_typing(data):
-    """Broadcast typing indicator to all users in session except sender"""
+    """Record a typing indicator update for the session room.
+    
+    The room is not notified here: typing_state broadcasts the consolidated
+    list of typists once per tick (see TypingAggregator).
+    """
     session_id = data.get('session_id')
     user_name = data.get('user_name')
     is_typing = data.get('is_typing', True)
     
     if session_id and user_name:
         room = f'session_{session_id}'
-        # Broadcast to room, sender will be excluded by client-side logic
-        socketio.emit('user_typing', {
-            'user_name': user_name,
-            'is_typing': is_typing
-        }, room=room, include_self=False)
+        typing_state.update(room, session.get('user_id') or user_name, user_name, is_typing)
+
+@socketio.on('join_user_room')
+def handle_join_user_room(data):
+    """User joins their personal notification room"""
+    user_id = data.get('user_id')
+    if user_id:
+        room = f'user_{user_id}'
+        join_room(room)
+        print(f"User {user_id} joined personal notification room")
+
+@socketio.on('leave_user_room')
+def handle_leave_user_room(data):
+    """User leaves their personal notification room"""
+    user_id = data.get('user_id')
+    if user_id:
+        room = f'user_{user_id}'
+        leave_room(room)
+        print(f"User {user_id} left personal notification room")
+
+@socketio.on('join_note_room')
+def handle_join_note_room(data):
+    """User joins a note room to view it"""
+    note_id = data.get('note_id')
+    user_id = data.get('user_id')
+    username = data.get('username', 'Anonymous')
+    
+    if note_id:
+        room = f'note_{note_id}'
+        join_room(room)
+        presence.join(request.sid, room, user_id, username)
+        broadcast_note_viewers(room)
+        
+        print(f"User {username} joined note {note_id} room. Total viewers: {presence.count(room)}")
+
+@socketio.on('leave_note_room')
+def handle_leave_note_room(data):
+    """User leaves a note room"""
+    note_id = data.get('note_id')
+    user_id = data.get('user_id')
+    
+    if note_id:
+        room = f'note_{note_id}'
+        leave_room(room)
+        if presence.leave(request.sid, room) is not None:
+            broadcast_note_viewers(room)
+        
+        print(f"User {user_id} left note {note_id} room")
+
+# ============================================
+# WHITEBOARD ROUTES
+# ============================================
+
+class WhiteboardLog:
+    """Whiteboard persistence as an append-only op log plus snapshots.
+
+    Every object added/modified/removed (and clear) coming in over Socket.IO
+    is appended to whiteboard_ops as one small row, so a write costs the
+    size of the edit rather than the size of the board. A board is its
+    latest whiteboard_data snapshot (version = id of the last op folded in)
+    replayed with the ops after it. Once snapshot_every ops have piled up,
+    a background compaction writes a new zlib-compressed snapshot, keeping
+    the replayed tail short. Folded ops are kept as the board's history
+    for WhiteboardHistory unless keep_history is off, in which case they
+    are deleted.
+
+    Boards saved before the log existed start from whiteboards.canvas_data.
+
+    Args:
+        writer: WriteQueue used for appends and snapshot swaps
+        socketio: SocketIO instance used to run compactions in the background
+        executor: BlockingExecutor for snapshot encoding (keeps gevent's loop free)
+        snapshot_every: Ops after the latest snapshot that trigger a compaction
+        keep_snapshots: Snapshots kept per board; older ones are deleted
+        keep_history: Keep ops after folding them into a snapshot
+    """
+
+    OP_TYPES = ('add', 'modify', 'remove', 'clear')
+
+    def __init__(self, writer, socketio, executor=None, snapshot_every=200, keep_snapshots=3, keep_history=True):
+        self.writer = writer
+        self.socketio = socketio
+        self.executor = executor
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = max(keep_snapshots, 1)
+        self.keep_history = keep_history
+        self._tail = {}          # whiteboard_id -> ops appended since the latest snapshot
+        self._compacting = set()
+        self._lock = threading.Lock()
+        self.stats = {'ops': 0, 'failed': 0, 'loads': 0, 'ops_replayed': 0,
+                      'snapshots': 0, 'ops_folded': 0, 'snapshot_bytes': 0}
+
+    def append(self, whiteboard_id, op_type, object_id=None, obj=None, user_id=None):
+        """Queue one op for the next group commit (does not wait for it).
+
+        Returns:
+            Future resolving to the op id
+        """
+        if op_type not in self.OP_TYPES:
+            raise ValueError(f'Unknown whiteboard op: {op_type}')
+        payload = json.dumps(obj, separators=(',', ':')) if obj is not None else None
+        future = self.writer.submit('''
+            INSERT INTO whiteboard_ops (whiteboard_id, op_type, object_id, payload, user_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (whiteboard_id, op_type, None if object_id is None else str(object_id), payload, user_id))
+        future.add_done_callback(self._check_append)
+        with self._lock:
+            self.stats['ops'] += 1
+            tail = self._tail[whiteboard_id] = self._tail.get(whiteboard_id, 0) + 1
+            start = tail >= self.snapshot_every and whiteboard_id not in self._compacting
+            if start:
+                self._compacting.add(whiteboard_id)
+        if start:
+            self.socketio.start_background_task(self._compact_in_background, whiteboard_id, user_id)
+        return future
+
+    def _check_append(self, future):
+        if future.exception() is not None:
+            with self._lock:
+                self.stats['failed'] += 1
+            print(f"Error logging whiteboard op: {future.exception()}")
+
+    @staticmethod
+    def apply(objects, op_type, object_id, obj):
+        """Apply one op to an OrderedDict of object_id -> Fabric.js object (z-order preserved)"""
+        if op_type == 'clear':
+            objects.clear()
+        elif op_type == 'remove':
+            objects.pop(object_id, None)
+        elif op_type == 'modify' and object_id in objects:
+            objects[object_id] = dict(objects[object_id], **obj)
+        elif obj is not None:
+            objects[object_id] = obj
+
+    @staticmethod
+    def decode(data, encoding):
+        """Canvas JSON dict from a stored snapshot"""
+        return json.loads(zlib.decompress(data) if encoding == 'zlib' else data)
+
+    @staticmethod
+    def split_objects(canvas):
+        """Pop a canvas's objects into an OrderedDict of object_id -> object"""
+        # Objects saved by older pages have no id; give them stable ones so later ops can refer to them
+        objects = OrderedDict()
+        for index, obj in enumerate(canvas.pop('objects', None) or []):
+            if obj.get('id') is None:
+                obj['id'] = f'legacy-{index}'
+            objects[str(obj['id'])] = obj
+        return objects
+
+    def _read(self, whiteboard_id):
+        """Latest snapshot replayed with its op tail.
+
+        Returns:
+            Tuple of (canvas dict without objects, objects OrderedDict, snapshot version, current version)
+        """
+        conn = get_db()
+        try:
+            snapshot = conn.execute('''
+                SELECT data_json, version, encoding FROM whiteboard_data
+                WHERE whiteboard_id = ? ORDER BY version DESC LIMIT 1
+            ''', (whiteboard_id,)).fetchone()
+            if snapshot:
+                canvas = self.decode(snapshot['data_json'], snapshot['encoding'])
+                snapshot_version = snapshot['version']
+            else:
+                board = conn.execute('SELECT canvas_data FROM whiteboards WHERE id = ?', (whiteboard_id,)).fetchone()
+                canvas = json.loads(board['canvas_data'] or '{}') if board else {}
+                snapshot_version = 0
+            ops = conn.execute('''
+                SELECT id, op_type, object_id, payload FROM whiteboard_ops
+                WHERE whiteboard_id = ? AND id > ? ORDER BY id
+            ''', (whiteboard_id, snapshot_version)).fetchall()
+        finally:
+            conn.close()
+
+        objects = self.split_objects(canvas)
+        for op in ops:
+            self.apply(objects, op['op_type'], op['object_id'], json.loads(op['payload']) if op['payload'] else None)
+
+        version = ops[-1]['id'] if ops else snapshot_version
+        with self._lock:
+            self._tail[whiteboard_id] = len(ops)
+            self.stats['loads'] += 1
+            self.stats['ops_replayed'] += len(ops)
+        return canvas, objects, snapshot_version, version
+
+    def load(self, whiteboard_id):
+        """Current board state.
+
+        Returns:
+            Tuple of (Fabric.js canvas JSON dict, version)
+        """
+        canvas, objects, _, version = self._read(whiteboard_id)
+        canvas['objects'] = list(objects.values())
+        return canvas, version
+
+    def compact(self, whiteboard_id, user_id=None):
+        """Fold the op tail into a new compressed snapshot (deleting the folded ops unless keeping history).
+
+        Returns:
+            Version of the board's latest snapshot
+        """
+        canvas, objects, snapshot_version, version = self._read(whiteboard_id)
+        if version == snapshot_version:
+            return version
+        canvas['objects'] = list(objects.values())
+        encode = lambda: zlib.compress(json.dumps(canvas, separators=(',', ':')).encode())
+        blob = self.executor.run(encode) if self.executor else encode()
+
+        def swap(conn):
+            conn.execute('''
+                INSERT INTO whiteboard_data (whiteboard_id, data_json, version, saved_by, encoding)
+                VALUES (?, ?, ?, COALESCE(?, (SELECT created_by FROM whiteboards WHERE id = ?)), 'zlib')
+            ''', (whiteboard_id, blob, version, user_id, whiteboard_id))
+            if self.keep_history:
+                folded = conn.execute('''
+                    SELECT COUNT(*) FROM whiteboard_ops WHERE whiteboard_id = ? AND id > ? AND id <= ?
+                ''', (whiteboard_id, snapshot_version, version)).fetchone()[0]
+            else:
+                folded = conn.execute('DELETE FROM whiteboard_ops WHERE whiteboard_id = ? AND id <= ?',
+                                      (whiteboard_id, version)).rowcount
+            conn.execute('''
+                DELETE FROM whiteboard_data WHERE whiteboard_id = ? AND id NOT IN (
+                    SELECT id FROM whiteboard_data WHERE whiteboard_id = ? ORDER BY version DESC LIMIT ?
+                )
+            ''', (whiteboard_id, whiteboard_id, self.keep_snapshots))
+            return folded
+
+        folded = self.writer.execute(swap)
+        with self._lock:
+            # Ops appended while compacting stay in the tail
+            self._tail[whiteboard_id] = max(self._tail.get(whiteboard_id, 0) - folded, 0)
+            self.stats['snapshots'] += 1
+            self.stats['ops_folded'] += folded
+            self.stats['snapshot_bytes'] += len(blob)
+        return version
+
+    def _compact_in_background(self, whiteboard_id, user_id):
+        try:
+            self.compact(whiteboard_id, user_id)
+        except Exception as e:
+            print(f"Error compacting whiteboard {whiteboard_id}: {e}")
+        finally:
+            with self._lock:
+                self._compacting.discard(whiteboard_id)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, boards=len(self._tail), compacting=len(self._compacting),
+                        snapshot_every=self.snapshot_every)
+
+whiteboard_log = WhiteboardLog(
+    write_queue,
+    socketio,
+    executor=blocking_pool,
+    snapshot_every=Config.WHITEBOARD_SNAPSHOT_OPS,
+    keep_snapshots=Config.WHITEBOARD_SNAPSHOTS_KEPT,
+    keep_history=Config.WHITEBOARD_KEEP_HISTORY
+)
+
+def object_bounds(obj):
+    """Axis-aligned bounding box (x0, y0, x1, y1) of a Fabric.js object, or None if unknown.
+
+    Rotated objects get a box that covers any rotation about their origin.
+    """
+    try:
+        stroke = float(obj.get('strokeWidth') or 0) if obj.get('stroke') else 0.0
+        width = (float(obj.get('width') or 0) + stroke) * abs(float(obj.get('scaleX', 1)))
+        height = (float(obj.get('height') or 0) + stroke) * abs(float(obj.get('scaleY', 1)))
+        left, top = float(obj['left']), float(obj['top'])
+        angle = float(obj.get('angle') or 0) % 360
+    except (KeyError, TypeError, ValueError):
+        return None
+    if angle:
+        reach = math.hypot(width, height)
+        return (left - reach, top - reach, left + reach, top + reach)
+    x0 = left - {'center': width / 2, 'right': width}.get(obj.get('originX'), 0)
+    y0 = top - {'center': height / 2, 'bottom': height}.get(obj.get('originY'), 0)
+    return (x0, y0, x0 + width, y0 + height)
+
+def boxes_intersect(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+class QuadTree:
+    """Region quadtree over object bounding boxes, for viewport queries.
+
+    Each object is stored in the deepest node whose square fully contains
+    its box; a node splits once it holds more than capacity objects. A
+    query visits only nodes overlapping the viewport, so its cost follows
+    what is visible rather than the size of the board. Objects without a
+    known box (or outside the extent) are returned by every query.
+
+    Results come back in z-order: each id carries the order key it was
+    inserted with.
+
+    Args:
+        extent: Half the side of the square covered, centered on the origin
+        capacity: Objects a node holds before splitting
+        max_depth: Depth below which nodes no longer split
+    """
+
+    def __init__(self, extent=1 << 20, capacity=16, max_depth=16):
+        self.extent = extent
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self.clear()
+
+    def clear(self):
+        self._root = self._node(-self.extent, -self.extent, 2 * self.extent, 0)
+        self._entries = {}   # id -> (box, z, node or None)
+        self._unbounded = set()
+
+    @staticmethod
+    def _node(x, y, size, depth):
+        return {'x': x, 'y': y, 'size': size, 'depth': depth, 'items': {}, 'children': None}
+
+    @staticmethod
+    def _contains(node, box):
+        return (node['x'] <= box[0] and box[2] <= node['x'] + node['size']
+                and node['y'] <= box[1] and box[3] <= node['y'] + node['size'])
+
+    def _child_for(self, node, box):
+        for child in node['children'] or ():
+            if self._contains(child, box):
+                return child
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, object_id):
+        return object_id in self._entries
+
+    def bounds(self, object_id):
+        """Box an object was indexed with (None if unknown or not indexed)"""
+        entry = self._entries.get(object_id)
+        return entry[0] if entry else None
+
+    def insert(self, object_id, box, z=None):
+        """Index an object, or re-index it (keeping its z-order unless z is given)"""
+        if z is None:
+            z = self._entries[object_id][1]
+        self.remove(object_id)
+        if box is None or not self._contains(self._root, box):
+            self._unbounded.add(object_id)
+            self._entries[object_id] = (box, z, None)
+            return
+        node = self._root
+        while True:
+            child = self._child_for(node, box)
+            if child is None:
+                break
+            node = child
+        node['items'][object_id] = box
+        self._entries[object_id] = (box, z, node)
+        if node['children'] is None and len(node['items']) > self.capacity and node['depth'] < self.max_depth:
+            self._split(node)
+
+    def _split(self, node):
+        half = node['size'] / 2
+        node['children'] = [self._node(node['x'] + dx, node['y'] + dy, half, node['depth'] + 1)
+                            for dx in (0, half) for dy in (0, half)]
+        for object_id, box in list(node['items'].items()):
+            child = self._child_for(node, box)
+            if child is not None:
+                del node['items'][object_id]
+                child['items'][object_id] = box
+                self._entries[object_id] = (box, self._entries[object_id][1], child)
+
+    def remove(self, object_id):
+        entry = self._entries.pop(object_id, None)
+        if entry is None:
+            return
+        if entry[2] is None:
+            self._unbounded.discard(object_id)
+        else:
+            entry[2]['items'].pop(object_id, None)
+
+    def query(self, box):
+        """Ids of objects whose boxes intersect box, in z-order"""
+        found = list(self._unbounded)
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            found.extend(object_id for object_id, item in node['items'].items() if boxes_intersect(item, box))
+            for child in node['children'] or ():
+                if boxes_intersect((child['x'], child['y'], child['x'] + child['size'], child['y'] + child['size']), box):
+                    stack.append(child)
+        found.sort(key=lambda object_id: self._entries[object_id][1])
+        return found
+
+class WhiteboardStates:
+    """Authoritative in-memory object set for each active whiteboard.
+
+    Ops are applied here as they pass through the socket handlers, each one
+    getting the next sequence number for its board, and are appended to the
+    op log in the same order. A late joiner gets snapshot() in its
+    join_whiteboard ack and applies only broadcasts with a higher seq, so
+    nothing published between page render and room join is lost or doubled.
+
+    Boards are loaded from the op log on first use. Past max_boards, the
+    least recently used board with nobody in its room is evicted: its last
+    op is waited for and the log is compacted so the next load is a single
+    snapshot read. Until that finishes the board is held as evicting, and a
+    request for it takes that copy back rather than reading a log that may
+    still be missing its queued ops. Sequence numbers start from the log
+    version on load, which only grows, so they never go backwards for a
+    client across an eviction.
+
+    Each board's objects are also indexed in a QuadTree by bounding box.
+    A socket that subscribes a viewport gets snapshots of just the objects
+    inside it, and outside_viewport() tells the handlers which sockets an
+    op does not touch so the broadcast can skip them.
+
+    Args:
+        log: WhiteboardLog used to load boards and persist ops
+        socketio: SocketIO instance used to run evictions in the background
+        in_use: Callable(whiteboard_id) -> bool, True while someone is in the board's room
+        max_boards: Boards kept in memory before idle ones are evicted
+    """
+
+    def __init__(self, log, socketio, in_use, max_boards=64):
+        self.log = log
+        self.socketio = socketio
+        self.in_use = in_use
+        self.max_boards = max_boards
+        self._boards = OrderedDict()  # whiteboard_id -> {'canvas', 'objects', 'index', 'z', 'seq', 'last_write', 'lock'}
+        self._evicting = {}           # whiteboard_id -> board evicted but not yet persisted
+        self._viewers = {}            # whiteboard_id -> {sid: viewport box}
+        self._viewing = {}            # sid -> whiteboard_id
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'ops': 0, 'evictions': 0,
+                      'viewport_queries': 0, 'objects_sent': 0, 'deliveries_skipped': 0}
+
+    def _board(self, whiteboard_id):
+        with self._lock:
+            board = self._boards.get(whiteboard_id)
+            if board is not None:
+                self._boards.move_to_end(whiteboard_id)
+                self.stats['hits'] += 1
+                return board
+            board = self._evicting.pop(whiteboard_id, None)
+            if board is not None:
+                # Its last ops may not be committed yet, so the log can't be read
+                self._boards[whiteboard_id] = board
+                self.stats['hits'] += 1
+                evicted = self._pick_evictions()
+        if board is not None:
+            for old_id, old_board in evicted:
+                self.socketio.start_background_task(self._persist, old_id, old_board)
+            return board
+        canvas, objects, _, version = self.log._read(whiteboard_id)
+        index = QuadTree()
+        for z, (object_id, obj) in enumerate(objects.items()):
+            index.insert(object_id, object_bounds(obj), z)
+        loaded = {'canvas': canvas, 'objects': objects, 'index': index, 'z': len(objects),
+                  'seq': version, 'last_write': None, 'lock': threading.Lock()}
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep the first copy
+            board = self._boards.setdefault(whiteboard_id, loaded)
+            self._boards.move_to_end(whiteboard_id)
+            if board is loaded:
+                self.stats['loads'] += 1
+                evicted = self._pick_evictions()
+            else:
+                evicted = []
+        for old_id, old_board in evicted:
+            self.socketio.start_background_task(self._persist, old_id, old_board)
+        return board
+
+    def _pick_evictions(self):
+        """Remove idle boards beyond max_boards, least recently used first (caller holds the lock)"""
+        evicted = []
+        for whiteboard_id in list(self._boards):
+            if len(self._boards) <= self.max_boards:
+                break
+            if not self.in_use(whiteboard_id):
+                board = self._boards.pop(whiteboard_id)
+                self._evicting[whiteboard_id] = board
+                evicted.append((whiteboard_id, board))
+                self.stats['evictions'] += 1
+        return evicted
+
+    def _persist(self, whiteboard_id, board):
+        last_write = board['last_write']
+        try:
+            if last_write is not None:
+                last_write.result(30)
+            self.log.compact(whiteboard_id)
+        except Exception as e:
+            print(f"Error persisting evicted whiteboard {whiteboard_id}: {e}")
+        finally:
+            with self._lock:
+                # Unless it was taken back and evicted again with newer ops for a later _persist
+                if self._evicting.get(whiteboard_id) is board and board['last_write'] is last_write:
+                    del self._evicting[whiteboard_id]
+
+    def save(self, whiteboard_id, user_id=None):
+        """Wait for the board's logged ops to commit, then snapshot it.
+
+        Returns:
+            Version of the new snapshot
+        """
+        with self._lock:
+            board = self._boards.get(whiteboard_id)
+        if board is not None and board['last_write'] is not None:
+            board['last_write'].result(30)
+        return self.log.compact(whiteboard_id, user_id)
+
+    def apply(self, whiteboard_id, op_type, object_id=None, obj=None, user_id=None):
+        """Apply an op to the live board and append it to the log.
+
+        Returns:
+            Tuple of (the op's sequence number, boxes it touched: the object's
+            before and after, or None if it concerns the whole board)
+        """
+        board = self._board(whiteboard_id)
+        object_id = None if object_id is None else str(object_id)
+        with board['lock']:
+            objects, index = board['objects'], board['index']
+            WhiteboardLog.apply(objects, op_type, object_id, obj)
+            if op_type == 'clear':
+                index.clear()
+                touched = None
+            else:
+                touched = [index.bounds(object_id)] if object_id in index else []
+                current = objects.get(object_id)
+                if current is None:
+                    index.remove(object_id)
+                else:
+                    z = None
+                    if object_id not in index:
+                        z = board['z']
+                        board['z'] += 1
+                    touched.append(object_bounds(current))
+                    index.insert(object_id, touched[-1], z)
+                if None in touched:
+                    touched = None
+            board['seq'] += 1
+            # Appending under the board lock keeps log order equal to seq order
+            board['last_write'] = self.log.append(whiteboard_id, op_type, object_id, obj, user_id)
+            seq = board['seq']
+        with self._lock:
+            self.stats['ops'] += 1
+        return seq, touched
+
+    def snapshot(self, whiteboard_id, bbox=None):
+        """Consistent copy of a board, or of the objects intersecting bbox.
+
+        Returns:
+            Tuple of (Fabric.js canvas JSON dict, seq of the last op included)
+        """
+        board = self._board(whiteboard_id)
+        with board['lock']:
+            objects = board['objects']
+            if bbox is None:
+                visible = list(objects.values())
+            else:
+                visible = [objects[object_id] for object_id in board['index'].query(bbox)]
+            canvas = dict(board['canvas'], objects=visible)
+            seq = board['seq']
+        with self._lock:
+            self.stats['objects_sent'] += len(visible)
+            if bbox is not None:
+                self.stats['viewport_queries'] += 1
+        return canvas, seq
+
+    def count(self, whiteboard_id):
+        """Number of objects on a board"""
+        board = self._board(whiteboard_id)
+        with board['lock']:
+            return len(board['objects'])
+
+    def subscribe(self, sid, whiteboard_id, bbox):
+        """Limit the broadcasts a socket gets for a board to ops touching bbox"""
+        with self._lock:
+            self._unsubscribe(sid)
+            self._viewers.setdefault(whiteboard_id, {})[sid] = bbox
+            self._viewing[sid] = whiteboard_id
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            self._unsubscribe(sid)
+
+    def _unsubscribe(self, sid):
+        """Drop a socket's viewport (caller holds the lock)"""
+        whiteboard_id = self._viewing.pop(sid, None)
+        viewers = self._viewers.get(whiteboard_id)
+        if viewers is not None:
+            viewers.pop(sid, None)
+            if not viewers:
+                del self._viewers[whiteboard_id]
+
+    def outside_viewport(self, whiteboard_id, touched):
+        """Sids subscribed to a board whose viewport misses every box an op touched"""
+        if touched is None:
+            return []
+        with self._lock:
+            skipped = [sid for sid, bbox in self._viewers.get(whiteboard_id, {}).items()
+                       if not any(boxes_intersect(box, bbox) for box in touched)]
+            self.stats['deliveries_skipped'] += len(skipped)
+        return skipped
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, boards=len(self._boards), max_boards=self.max_boards,
+                        viewports=len(self._viewing))
+
+whiteboard_states = WhiteboardStates(
+    whiteboard_log,
+    socketio,
+    in_use=lambda whiteboard_id: presence.count(f'whiteboard_{whiteboard_id}') > 0,
+    max_boards=Config.WHITEBOARD_ACTIVE_BOARDS
+)
+
+class WhiteboardFrames:
+    """Per-room outbound batching for live strokes and remote cursors.
 
-@socketio.on('join_user_room')
-def handle_join_user_room(data):
-    """User joins their personal notification room"""
-    user_id = data.get('user_id')
-    if user_id:
-        room = f'user_{user_id}'
-        join_room(room)
-        print(f"User {user_id} joined personal notification room")
+    whiteboard_draw and whiteboard_cursor events only update the room's
+    pending frame. A background task wakes fps times a second and emits one
+    'whiteboard_frame' to each room with anything pending:
 
-@socketio.on('leave_user_room')
-def handle_leave_user_room(data):
-    """User leaves their personal notification room"""
-    user_id = data.get('user_id')
-    if user_id:
-        room = f'user_{user_id}'
-        leave_room(room)
-        print(f"User {user_id} left personal notification room")
+        strokes  segments of the same stroke from the same client are merged
+                 into one entry; points are quantized to 1/scale px and
+                 delta-encoded as a flat [dx, dy, ...] list (the first pair is
+                 relative to 0, 0), with repeated points dropped
+        cursors  only the latest position per client
 
-# Track note viewers
-note_viewers = {}  # {note_id: [{user_id, username, sid}, ...]}
+    Entries carry the sender's client id so pages can skip their own.
+    Stats compare what re-emitting every event on its own would have cost
+    (one frame and its JSON bytes per event) with the frames actually sent,
+    in total and for the most recently active rooms.
 
-@socketio.on('join_note_room')
-def handle_join_note_room(data):
-    """User joins a note room to view it"""
-    note_id = data.get('note_id')
-    user_id = data.get('user_id')
-    username = data.get('username', 'Anonymous')
-    
-    if note_id:
-        room = f'note_{note_id}'
-        join_room(room)
-        
-        # Add to viewers list
-        if note_id not in note_viewers:
-            note_viewers[note_id] = []
-        
-        # Remove existing entry for this user if any
-        note_viewers[note_id] = [v for v in note_viewers[note_id] if v['user_id'] != user_id]
-        
-        # Add current viewer
-        note_viewers[note_id].append({
-            'user_id': user_id,
-            'username': username,
-            'sid': request.sid
-        })
-        
-        # Broadcast updated viewer list
-        socketio.emit('note_viewers_update', {
-            'viewers': [{'username': v['username']} for v in note_viewers[note_id]]
-        }, room=room)
-        
-        print(f"User {username} joined note {note_id} room. Total viewers: {len(note_viewers[note_id])}")
+    Args:
+        socketio: SocketIO instance used for broadcasting
+        fps: Frames per second flushed to each active room
+        scale: Quantization steps per pixel
+        max_rooms: Rooms whose individual stats are kept
+    """
 
-@socketio.on('leave_note_room')
-def handle_leave_note_room(data):
-    """User leaves a note room"""
-    note_id = data.get('note_id')
-    user_id = data.get('user_id')
-    
-    if note_id:
-        room = f'note_{note_id}'
-        leave_room(room)
-        
-        # Remove from viewers list
-        if note_id in note_viewers:
-            note_viewers[note_id] = [v for v in note_viewers[note_id] if v['user_id'] != user_id]
-            
-            # Broadcast updated viewer list
-            socketio.emit('note_viewers_update', {
-                'viewers': [{'username': v['username']} for v in note_viewers[note_id]]
-            }, room=room)
-            
-            # Clean up empty lists
-            if not note_viewers[note_id]:
-                del note_viewers[note_id]
-        
-        print(f"User {user_id} left note {note_id} room")
+    def __init__(self, socketio, fps=30, scale=2, max_rooms=100):
+        self.socketio = socketio
+        self.interval = 1 / fps
+        self.fps = fps
+        self.scale = scale
+        self.max_rooms = max_rooms
+        self._pending = {}           # room -> {'strokes': OrderedDict, 'cursors': dict}
+        self._rooms = OrderedDict()  # room -> counters, least recently active first
+        self._lock = threading.Lock()
+        self._running = False
+        self.stats = self._counters()
+
+    @staticmethod
+    def _counters():
+        return {'events': 0, 'frames': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    @staticmethod
+    def _size(payload):
+        return len(json.dumps(payload, separators=(',', ':'), default=str))
+
+    def draw(self, room, data):
+        """Queue a stroke segment ({client_id, stroke, color, width, points, end})"""
+        try:
+            points = [(float(x), float(y)) for x, y in data.get('points') or ()]
+        except (TypeError, ValueError):
+            return
+        key = (str(data.get('client_id')), str(data.get('stroke')))
+        nbytes = self._size({'action': 'draw', 'data': data})
+        with self._lock:
+            strokes = self._frame(room)['strokes']
+            stroke = strokes.get(key)
+            if stroke is None:
+                stroke = strokes[key] = {'color': data.get('color'), 'width': data.get('width'),
+                                         'points': [], 'end': False}
+            stroke['points'].extend(points)
+            stroke['end'] = stroke['end'] or bool(data.get('end'))
+            start = self._received(room, nbytes)
+        if start:
+            self.socketio.start_background_task(self._run)
+
+    def cursor(self, room, data):
+        """Queue a cursor position ({client_id, username, x, y}), replacing the client's previous one"""
+        try:
+            x, y = float(data.get('x')), float(data.get('y'))
+        except (TypeError, ValueError):
+            return
+        client_id = str(data.get('client_id'))
+        nbytes = self._size(data)
+        with self._lock:
+            self._frame(room)['cursors'][client_id] = {
+                'client': client_id,
+                'username': data.get('username'),
+                'x': round(x * self.scale) / self.scale,
+                'y': round(y * self.scale) / self.scale,
+            }
+            start = self._received(room, nbytes)
+        if start:
+            self.socketio.start_background_task(self._run)
+
+    def _frame(self, room):
+        """Pending frame for a room (caller holds the lock)"""
+        frame = self._pending.get(room)
+        if frame is None:
+            frame = self._pending[room] = {'strokes': OrderedDict(), 'cursors': {}}
+        return frame
+
+    def _room_stats(self, room):
+        """Counters for a room, marked most recently active (caller holds the lock)"""
+        counters = self._rooms.get(room)
+        if counters is None:
+            counters = self._rooms[room] = self._counters()
+            if len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        self._rooms.move_to_end(room)
+        return counters
+
+    def _received(self, room, nbytes):
+        """Count an incoming event; returns True if the flush task needs starting (caller holds the lock)"""
+        for counters in (self.stats, self._room_stats(room)):
+            counters['events'] += 1
+            counters['bytes_in'] += nbytes
+        start = not self._running
+        self._running = True
+        return start
+
+    def _encode(self, points):
+        """Quantize and delta-encode points into a flat [dx, dy, ...] list"""
+        encoded = []
+        last_x = last_y = 0
+        for x, y in points:
+            qx, qy = round(x * self.scale), round(y * self.scale)
+            if encoded and qx == last_x and qy == last_y:
+                continue
+            encoded += (qx - last_x, qy - last_y)
+            last_x, last_y = qx, qy
+        return encoded
+
+    def _collect(self):
+        """Take the pending frames.
+
+        Returns:
+            Tuple of (list of (room, frame payload), whether to keep ticking)
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            # Stop ticking once a tick finds nothing; the next event restarts it
+            self._running = bool(pending)
+        frames = []
+        for room, frame in pending.items():
+            frames.append((room, {
+                'scale': self.scale,
+                'strokes': [
+                    {'client': client_id, 'stroke': stroke_id, 'color': stroke['color'],
+                     'width': stroke['width'], 'points': self._encode(stroke['points']), 'end': stroke['end']}
+                    for (client_id, stroke_id), stroke in frame['strokes'].items()
+                ],
+                'cursors': list(frame['cursors'].values()),
+            }))
+        return frames, bool(pending)
+
+    def _run(self):
+        running = True
+        while running:
+            self.socketio.sleep(self.interval)
+            frames, running = self._collect()
+            for room, payload in frames:
+                self.socketio.emit('whiteboard_frame', payload, room=room)
+                nbytes = self._size(payload)
+                with self._lock:
+                    for counters in (self.stats, self._room_stats(room)):
+                        counters['frames'] += 1
+                        counters['bytes_out'] += nbytes
+
+    @staticmethod
+    def _savings(counters):
+        return dict(counters, frames_saved=counters['events'] - counters['frames'],
+                    bytes_saved=counters['bytes_in'] - counters['bytes_out'])
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._savings(self.stats), fps=self.fps,
+                        rooms={room: self._savings(counters) for room, counters in self._rooms.items()})
+
+whiteboard_frames = WhiteboardFrames(socketio, fps=Config.WHITEBOARD_FRAME_RATE)
+
+class WhiteboardHistory:
+    """Seekable replay of a board's op history (a timelapse of the board).
+
+    Position n is the board after the first n ops of its history in
+    whiteboard_ops; position 0 is the board before them (its legacy
+    canvas, or the snapshot that older ops were folded into before history
+    was kept). A keyframe of the board is stored every keyframe_every
+    positions, so seek() loads the nearest keyframe at or before the
+    position and applies fewer than keyframe_every ops after it.
+
+    Keyframes are written on demand: each seek or stream first extends the
+    board's keyframes over the ops logged since the last one, so the ops of
+    a board are folded into keyframes once and later seeks stay bounded.
+    Ops still waiting in the write queue are not part of the history yet.
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    """Handle user disconnect - clean up from all note rooms"""
-    sid = request.sid
-    
-    # Remove from all note viewer lists
-    for note_id in list(note_viewers.keys()):
-        original_count = len(note_viewers[note_id])
-        note_viewers[note_id] = [v for v in note_viewers[note_id] if v['sid'] != sid]
-        
-        if len(note_viewers[note_id]) < original_count:
-            # User was viewing this note, broadcast update
-            room = f'note_{note_id}'
-            socketio.emit('note_viewers_update', {
-                'viewers': [{'username': v['username']} for v in note_viewers[note_id]]
-            }, room=room)
-        
-        # Clean up empty lists
-        if not note_viewers[note_id]:
-            del note_viewers[note_id]
+    Args:
+        writer: WriteQueue used to store keyframes
+        executor: BlockingExecutor for keyframe encoding (keeps gevent's loop free)
+        keyframe_every: Ops between keyframes, which bounds the ops applied per seek
+    """
 
-# ============================================
-# WHITEBOARD ROUTES
-# ============================================
+    def __init__(self, writer, executor=None, keyframe_every=100):
+        self.writer = writer
+        self.executor = executor
+        self.keyframe_every = max(keyframe_every, 1)
+        self._lock = threading.Lock()
+        self.stats = {'seeks': 0, 'ops_applied': 0, 'keyframes': 0, 'streams': 0, 'ops_streamed': 0}
+
+    def _encode(self, canvas, objects):
+        encode = lambda: zlib.compress(json.dumps(dict(canvas, objects=list(objects.values())),
+                                                  separators=(',', ':')).encode())
+        return self.executor.run(encode) if self.executor else encode()
+
+    @staticmethod
+    def _tail(conn, whiteboard_id, op_id, limit=-1):
+        return conn.execute('''
+            SELECT id, op_type, object_id, payload, user_id, created_at FROM whiteboard_ops
+            WHERE whiteboard_id = ? AND id > ? ORDER BY id LIMIT ?
+        ''', (whiteboard_id, op_id, limit))
+
+    @staticmethod
+    def _apply(objects, op):
+        WhiteboardLog.apply(objects, op['op_type'], op['object_id'],
+                            json.loads(op['payload']) if op['payload'] else None)
+
+    @staticmethod
+    def _base(conn, whiteboard_id):
+        """Board at position 0: (canvas dict without objects, objects OrderedDict, op_id)"""
+        first = conn.execute('SELECT id FROM whiteboard_ops WHERE whiteboard_id = ? ORDER BY id LIMIT 1',
+                             (whiteboard_id,)).fetchone()
+        snapshot = conn.execute('''
+            SELECT data_json, version, encoding FROM whiteboard_data
+            WHERE whiteboard_id = ? AND version < ? ORDER BY version DESC LIMIT 1
+        ''', (whiteboard_id, first['id'] if first else 2 ** 63 - 1)).fetchone()
+        if snapshot:
+            canvas = WhiteboardLog.decode(snapshot['data_json'], snapshot['encoding'])
+            op_id = snapshot['version']
+        else:
+            board = conn.execute('SELECT canvas_data FROM whiteboards WHERE id = ?', (whiteboard_id,)).fetchone()
+            canvas = json.loads(board['canvas_data'] or '{}') if board else {}
+            op_id = 0
+        return canvas, WhiteboardLog.split_objects(canvas), op_id
+
+    def _extend(self, whiteboard_id):
+        """Store keyframes for ops logged since the board's last keyframe.
+
+        Returns:
+            Length of the board's history in ops
+        """
+        keyframes = []
+        conn = get_db()
+        try:
+            last = conn.execute('''
+                SELECT position, op_id, data FROM whiteboard_keyframes
+                WHERE whiteboard_id = ? ORDER BY position DESC LIMIT 1
+            ''', (whiteboard_id,)).fetchone()
+            if last is None:
+                canvas, objects, op_id = self._base(conn, whiteboard_id)
+                position = 0
+                keyframes.append((0, op_id, self._encode(canvas, objects)))
+            else:
+                position, op_id = last['position'], last['op_id']
+                pending = len(self._tail(conn, whiteboard_id, op_id, self.keyframe_every).fetchall())
+                if pending < self.keyframe_every:
+                    return position + pending
+                canvas = WhiteboardLog.decode(last['data'], 'zlib')
+                objects = WhiteboardLog.split_objects(canvas)
+            for op in self._tail(conn, whiteboard_id, op_id):
+                self._apply(objects, op)
+                position += 1
+                if position % self.keyframe_every == 0:
+                    keyframes.append((position, op['id'], self._encode(canvas, objects)))
+        finally:
+            conn.close()
+
+        def store(conn):
+            conn.executemany('''
+                INSERT OR IGNORE INTO whiteboard_keyframes (whiteboard_id, position, op_id, data)
+                VALUES (?, ?, ?, ?)
+            ''', [(whiteboard_id, *keyframe) for keyframe in keyframes])
+
+        if keyframes:
+            self.writer.execute(store)
+            with self._lock:
+                self.stats['keyframes'] += len(keyframes)
+        return position
+
+    def _keyframe(self, conn, whiteboard_id, position):
+        """Nearest keyframe at or before position: (canvas dict, objects OrderedDict, position, op_id)"""
+        keyframe = conn.execute('''
+            SELECT position, op_id, data FROM whiteboard_keyframes
+            WHERE whiteboard_id = ? AND position <= ? ORDER BY position DESC LIMIT 1
+        ''', (whiteboard_id, position)).fetchone()
+        canvas = WhiteboardLog.decode(keyframe['data'], 'zlib')
+        return canvas, WhiteboardLog.split_objects(canvas), keyframe['position'], keyframe['op_id']
+
+    def _state_at(self, whiteboard_id, position):
+        """Board at a position: (canvas dict, position, history length, id and time of the op at position)"""
+        length = self._extend(whiteboard_id)
+        position = length if position is None else max(0, min(position, length))
+        conn = get_db()
+        try:
+            canvas, objects, keyframe_position, op_id = self._keyframe(conn, whiteboard_id, position)
+            ops = self._tail(conn, whiteboard_id, op_id, position - keyframe_position).fetchall()
+        finally:
+            conn.close()
+        for op in ops:
+            self._apply(objects, op)
+        canvas['objects'] = list(objects.values())
+        with self._lock:
+            self.stats['seeks'] += 1
+            self.stats['ops_applied'] += len(ops)
+        if ops:
+            return canvas, position, length, ops[-1]['id'], ops[-1]['created_at']
+        return canvas, position, length, op_id, None
+
+    def seek(self, whiteboard_id, position=None):
+        """Board after the first position ops of its history (default: all of them).
+
+        Returns:
+            Tuple of (Fabric.js canvas JSON dict, position, history length, time of the op at position)
+        """
+        canvas, position, length, _, at_time = self._state_at(whiteboard_id, position)
+        return canvas, position, length, at_time
+
+    def stream(self, whiteboard_id, start=0, end=None, batch=500):
+        """Generate the history from start to end for continuous playback.
+
+        Yields a 'keyframe' event with the board at start, then one 'op'
+        event per op. Ops are read in batches on short-lived connections, so
+        a slow reader does not hold a pooled connection.
+        """
+        canvas, start, length, op_id, _ = self._state_at(whiteboard_id, start)
+        end = length if end is None else max(start, min(end, length))
+        yield {'type': 'keyframe', 'position': start, 'length': length, 'canvas': canvas}
+        with self._lock:
+            self.stats['streams'] += 1
+
+        position = start
+        while position < end:
+            conn = get_db()
+            try:
+                ops = self._tail(conn, whiteboard_id, op_id, min(batch, end - position)).fetchall()
+            finally:
+                conn.close()
+            if not ops:
+                break
+            for op in ops:
+                position += 1
+                yield {'type': 'op', 'position': position, 'op': op['op_type'], 'object_id': op['object_id'],
+                       'object': json.loads(op['payload']) if op['payload'] else None,
+                       'user_id': op['user_id'], 'time': op['created_at'].isoformat()}
+            op_id = ops[-1]['id']
+            with self._lock:
+                self.stats['ops_streamed'] += len(ops)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, keyframe_every=self.keyframe_every)
+
+whiteboard_history = WhiteboardHistory(
+    write_queue,
+    executor=blocking_pool,
+    keyframe_every=Config.WHITEBOARD_KEYFRAME_OPS
+)
+
+def parse_bbox(value):
+    """Parse a viewport box given as [x0, y0, x1, y1] or "x0,y0,x1,y1".
+
+    Returns:
+        Tuple of (x0, y0, x1, y1) with x0 <= x1 and y0 <= y1, or None if invalid
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    try:
+        x0, y0, x1, y1 = (float(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+    if not all(math.isfinite(v) for v in (x0, y0, x1, y1)):
+        return None
+    return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+def can_access_whiteboard(conn, whiteboard_id, user_id):
+    """Whether a user created or RSVP'd to the whiteboard's session"""
+    return conn.execute('''
+        SELECT 1
+        FROM whiteboards w
+        JOIN sessions s ON w.session_id = s.id
+        LEFT JOIN rsvps r ON s.id = r.session_id
+        WHERE w.id = ? AND (s.creator_id = ? OR r.user_id = ?)
+    ''', (whiteboard_id, user_id, user_id)).fetchone() is not None
 
 @app.route('/whiteboard/<int:session_id>')
 @login_required
@@ -5223,15 +7444,86 @@ def whiteboard(session_id):
     
     conn.close()
     
+    # Objects are not rendered into the page: the join_whiteboard ack sends
+    # the ones inside the browser's viewport
     return render_template('whiteboard.html', 
                          whiteboard=whiteboard_data,
                          session_id=session_id,
                          session_title=session_access['title'])
 
+@app.route('/whiteboard/<int:whiteboard_id>/objects')
+@login_required
+def whiteboard_objects(whiteboard_id):
+    """Objects on a whiteboard, optionally only those intersecting ?bbox=x0,y0,x1,y1"""
+    conn = get_db()
+    allowed = can_access_whiteboard(conn, whiteboard_id, session['user_id'])
+    conn.close()
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    bbox = request.args.get('bbox')
+    if bbox is not None:
+        bbox = parse_bbox(bbox)
+        if bbox is None:
+            return jsonify({'error': 'bbox must be x0,y0,x1,y1'}), 400
+    
+    canvas_data, seq = whiteboard_states.snapshot(whiteboard_id, bbox)
+    return jsonify({
+        'objects': canvas_data['objects'],
+        'seq': seq,
+        'total': whiteboard_states.count(whiteboard_id)
+    })
+
+@app.route('/whiteboard/<int:whiteboard_id>/replay')
+@login_required
+def whiteboard_replay(whiteboard_id):
+    """The board as it was after ?at=<position> ops of its history (default: now)"""
+    conn = get_db()
+    allowed = can_access_whiteboard(conn, whiteboard_id, session['user_id'])
+    conn.close()
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
+    if not Config.WHITEBOARD_KEEP_HISTORY:
+        return jsonify({'error': 'Whiteboard history is not kept (WHITEBOARD_KEEP_HISTORY)'}), 404
+    
+    canvas_data, position, length, at_time = whiteboard_history.seek(whiteboard_id, request.args.get('at', type=int))
+    return jsonify({
+        'canvas': canvas_data,
+        'position': position,
+        'length': length,
+        'time': at_time.isoformat() if at_time else None
+    })
+
+@app.route('/whiteboard/<int:whiteboard_id>/replay/stream')
+@login_required
+def whiteboard_replay_stream(whiteboard_id):
+    """Stream the board's history as NDJSON for continuous playback.
+
+    The first line is the board at ?from= (default 0), then one line per op
+    up to ?to= (default: the end of the history at request time).
+    """
+    conn = get_db()
+    allowed = can_access_whiteboard(conn, whiteboard_id, session['user_id'])
+    conn.close()
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
+    if not Config.WHITEBOARD_KEEP_HISTORY:
+        return jsonify({'error': 'Whiteboard history is not kept (WHITEBOARD_KEEP_HISTORY)'}), 404
+    
+    events = whiteboard_history.stream(whiteboard_id, request.args.get('from', 0, type=int),
+                                       request.args.get('to', type=int))
+    lines = (json.dumps(event, separators=(',', ':')) + '\n' for event in events)
+    return Response(lines, mimetype='application/x-ndjson')
+
 @app.route('/whiteboard/<int:whiteboard_id>/save', methods=['POST'])
 @login_required
 def save_whiteboard(whiteboard_id):
-    """Save whiteboard canvas data"""
+    """Snapshot the whiteboard now.
+
+    Edits are already persisted as they happen through the op log; saving
+    folds the logged ops into a compressed snapshot instead of rewriting the
+    whole canvas sent by the browser.
+    """
     conn = get_db()
     
     # Verify access
@@ -5247,17 +7539,11 @@ def save_whiteboard(whiteboard_id):
         conn.close()
         return jsonify({'error': 'Access denied'}), 403
     
-    canvas_data = request.json.get('canvas_data', '{}')
-    
-    conn.execute('''
-        UPDATE whiteboards 
-        SET canvas_data = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (canvas_data, whiteboard_id))
-    conn.commit()
     conn.close()
     
-    return jsonify({'success': True})
+    version = whiteboard_states.save(whiteboard_id, session['user_id'])
+    
+    return jsonify({'success': True, 'version': version})
 
 @app.route('/whiteboard/<int:whiteboard_id>/export/<format>')
 @login_required
@@ -5289,12 +7575,27 @@ def export_whiteboard(whiteboard_id, format):
 
 @socketio.on('join_whiteboard')
 def handle_join_whiteboard(data):
-    """Join whiteboard room for real-time collaboration"""
+    """Join whiteboard room for real-time collaboration.
+
+    Returns (as the ack) the board's current objects and seq; broadcasts
+    with a seq at or below it are already included. With a 'bbox' the
+    socket is subscribed to that viewport (see whiteboard_viewport) and the
+    ack only holds the objects inside it.
+    """
     whiteboard_id = data.get('whiteboard_id')
     username = data.get('username', 'Anonymous')
+    user_id = session.get('user_id')
+    
+    conn = get_db()
+    allowed = user_id is not None and can_access_whiteboard(conn, whiteboard_id, user_id)
+    conn.close()
+    if not allowed:
+        return
     
     room = f'whiteboard_{whiteboard_id}'
     join_room(room)
+    # Being in the roster is what lets this socket's edits into the op log
+    presence.join(request.sid, room, user_id, username)
     
     emit('user_joined_whiteboard', {
         'username': username,
@@ -5302,69 +7603,123 @@ def handle_join_whiteboard(data):
     }, room=room, include_self=False)
     
     print(f"User {username} joined whiteboard {whiteboard_id}")
+    
+    # Snapshot after join_room, so every later op reaches this socket with a higher seq
+    bbox = parse_bbox(data.get('bbox'))
+    if bbox is not None:
+        whiteboard_states.subscribe(request.sid, whiteboard_id, bbox)
+    canvas_data, seq = whiteboard_states.snapshot(whiteboard_id, bbox)
+    return {'canvas': canvas_data, 'seq': seq}
+
+@socketio.on('whiteboard_viewport')
+def handle_whiteboard_viewport(data):
+    """Subscribe this socket to the part of the board it shows.
+
+    Returns (as the ack) the objects intersecting the viewport and the seq
+    they reflect; from then on this socket only gets ops touching it.
+    """
+    whiteboard_id = data.get('whiteboard_id')
+    bbox = parse_bbox(data.get('bbox'))
+    if whiteboard_editor(whiteboard_id) is None or bbox is None:
+        return
+    
+    whiteboard_states.subscribe(request.sid, whiteboard_id, bbox)
+    canvas_data, seq = whiteboard_states.snapshot(whiteboard_id, bbox)
+    return {'canvas': canvas_data, 'seq': seq}
+
+def whiteboard_skip_sids(whiteboard_id, touched):
+    """Sids an op's broadcast should skip: the sender and viewports it doesn't touch"""
+    return [request.sid] + whiteboard_states.outside_viewport(whiteboard_id, touched)
+
+def whiteboard_editor(whiteboard_id):
+    """user_id of the current socket if it joined the whiteboard, else None"""
+    if presence.in_room(request.sid, f'whiteboard_{whiteboard_id}'):
+        return session.get('user_id')
+    return None
 
 @socketio.on('whiteboard_draw')
 def handle_whiteboard_draw(data):
-    """Broadcast drawing action to all users in whiteboard"""
+    """Queue a live stroke segment for the room's next whiteboard_frame"""
     whiteboard_id = data.get('whiteboard_id')
-    room = f'whiteboard_{whiteboard_id}'
+    if whiteboard_editor(whiteboard_id) is None:
+        return
     
-    emit('whiteboard_action', {
-        'action': 'draw',
-        'data': data
-    }, room=room, include_self=False)
+    whiteboard_frames.draw(f'whiteboard_{whiteboard_id}', data)
 
 @socketio.on('whiteboard_object_added')
 def handle_object_added(data):
-    """Broadcast new object (shape, text, etc.) to all users"""
+    """Broadcast new object (shape, text, etc.) to all users and log it"""
     whiteboard_id = data.get('whiteboard_id')
+    user_id = whiteboard_editor(whiteboard_id)
+    obj = data.get('object')
+    if user_id is None or not isinstance(obj, dict):
+        return
     room = f'whiteboard_{whiteboard_id}'
     
+    seq, touched = whiteboard_states.apply(whiteboard_id, 'add', obj.get('id'), obj, user_id)
     emit('whiteboard_action', {
         'action': 'object_added',
-        'data': data
-    }, room=room, include_self=False)
+        'data': data,
+        'seq': seq
+    }, room=room, skip_sid=whiteboard_skip_sids(whiteboard_id, touched))
 
 @socketio.on('whiteboard_object_modified')
 def handle_object_modified(data):
-    """Broadcast object modifications to all users"""
+    """Broadcast object modifications to all users and log them"""
     whiteboard_id = data.get('whiteboard_id')
+    user_id = whiteboard_editor(whiteboard_id)
+    properties = data.get('properties')
+    if user_id is None or not isinstance(properties, dict):
+        return
     room = f'whiteboard_{whiteboard_id}'
     
+    seq, touched = whiteboard_states.apply(whiteboard_id, 'modify', data.get('objectId'), properties, user_id)
     emit('whiteboard_action', {
         'action': 'object_modified',
-        'data': data
-    }, room=room, include_self=False)
+        'data': data,
+        'seq': seq
+    }, room=room, skip_sid=whiteboard_skip_sids(whiteboard_id, touched))
 
 @socketio.on('whiteboard_object_removed')
 def handle_object_removed(data):
-    """Broadcast object removal to all users"""
+    """Broadcast object removal to all users and log it"""
     whiteboard_id = data.get('whiteboard_id')
+    user_id = whiteboard_editor(whiteboard_id)
+    if user_id is None:
+        return
     room = f'whiteboard_{whiteboard_id}'
     
+    seq, touched = whiteboard_states.apply(whiteboard_id, 'remove', data.get('objectId'), user_id=user_id)
     emit('whiteboard_action', {
         'action': 'object_removed',
-        'data': data
-    }, room=room, include_self=False)
+        'data': data,
+        'seq': seq
+    }, room=room, skip_sid=whiteboard_skip_sids(whiteboard_id, touched))
 
 @socketio.on('whiteboard_clear')
 def handle_whiteboard_clear(data):
-    """Broadcast canvas clear to all users"""
+    """Broadcast canvas clear to all users and log it"""
     whiteboard_id = data.get('whiteboard_id')
+    user_id = whiteboard_editor(whiteboard_id)
+    if user_id is None:
+        return
     room = f'whiteboard_{whiteboard_id}'
     
+    seq, touched = whiteboard_states.apply(whiteboard_id, 'clear', user_id=user_id)
     emit('whiteboard_action', {
         'action': 'clear',
-        'data': data
-    }, room=room, include_self=False)
+        'data': data,
+        'seq': seq
+    }, room=room, skip_sid=whiteboard_skip_sids(whiteboard_id, touched))
 
 @socketio.on('whiteboard_cursor')
 def handle_cursor_movement(data):
-    """Broadcast cursor position to other users"""
+    """Queue a cursor position for the room's next whiteboard_frame"""
     whiteboard_id = data.get('whiteboard_id')
-    room = f'whiteboard_{whiteboard_id}'
+    if whiteboard_editor(whiteboard_id) is None:
+        return
     
-    emit('cursor_moved', data, room=room, include_self=False)
+    whiteboard_frames.cursor(f'whiteboard_{whiteboard_id}', data)
 
 @socketio.on('leave_whiteboard')
 def handle_leave_whiteboard(data):
@@ -5374,11 +7729,10 @@ def handle_leave_whiteboard(data):
     
     room = f'whiteboard_{whiteboard_id}'
     leave_room(room)
+    whiteboard_states.unsubscribe(request.sid)
     
-    emit('user_left_whiteboard', {
-        'username': username,
-        'message': f'{username} left the whiteboard'
-    }, room=room)
+    if presence.leave(request.sid, room) is not None:
+        announce_departure(room, session.get('user_id'), username)
 
 # ============================================
 # POMODORO TIMER ROUTES
@@ -5393,18 +7747,12 @@ def start_pomodoro():
     timer_type = data.get('type', 'work')  # 'work', 'short_break', 'long_break'
     duration = data.get('duration', 25)
     
-    conn = get_db()
-    
     # Insert new pomodoro session
-    cursor = conn.execute('''
+    pomodoro_id = write_queue.execute('''
         INSERT INTO pomodoro_sessions (user_id, session_id, duration_minutes, type)
         VALUES (?, ?, ?, ?)
     ''', (session['user_id'], session_id, duration, timer_type))
     
-    pomodoro_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
     # Broadcast to session if it's a group timer
     if session_id:
         socketio.emit('pomodoro_started', {
@@ -5432,38 +7780,41 @@ def complete_pomodoro(pomodoro_id):
         SELECT * FROM pomodoro_sessions WHERE id = ? AND user_id = ?
     ''', (pomodoro_id, session['user_id'])).fetchone()
     
+    conn.close()
+    
     if not pomodoro:
-        conn.close()
         return jsonify({'success': False, 'message': 'Pomodoro not found'}), 404
     
-    # Update completion
-    conn.execute('''
-        UPDATE pomodoro_sessions
-        SET is_completed = 1, completed_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (pomodoro_id,))
-    
-    # Update focus statistics
-    today = datetime.now().date()
+    user_id = session['user_id']
     
-    if pomodoro['type'] == 'work':
-        conn.execute('''
-            INSERT INTO focus_statistics (user_id, date, total_focus_minutes, pomodoros_completed)
-            VALUES (?, ?, ?, 1)
-            ON CONFLICT(user_id, date) DO UPDATE SET
-                total_focus_minutes = total_focus_minutes + ?,
-                pomodoros_completed = pomodoros_completed + 1
-        ''', (session['user_id'], today, pomodoro['duration_minutes'], pomodoro['duration_minutes']))
-    else:
-        conn.execute('''
-            INSERT INTO focus_statistics (user_id, date, total_breaks_minutes)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id, date) DO UPDATE SET
-                total_breaks_minutes = total_breaks_minutes + ?
-        ''', (session['user_id'], today, pomodoro['duration_minutes'], pomodoro['duration_minutes']))
+    def record_completion(write_conn):
+        # Update completion
+        write_conn.execute('''
+            UPDATE pomodoro_sessions
+            SET is_completed = 1, completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (pomodoro_id,))
+        
+        # Update focus statistics
+        today = datetime.now().date()
+        
+        if pomodoro['type'] == 'work':
+            write_conn.execute('''
+                INSERT INTO focus_statistics (user_id, date, total_focus_minutes, pomodoros_completed)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT(user_id, date) DO UPDATE SET
+                    total_focus_minutes = total_focus_minutes + ?,
+                    pomodoros_completed = pomodoros_completed + 1
+            ''', (user_id, today, pomodoro['duration_minutes'], pomodoro['duration_minutes']))
+        else:
+            write_conn.execute('''
+                INSERT INTO focus_statistics (user_id, date, total_breaks_minutes)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id, date) DO UPDATE SET
+                    total_breaks_minutes = total_breaks_minutes + ?
+            ''', (user_id, today, pomodoro['duration_minutes'], pomodoro['duration_minutes']))
     
-    conn.commit()
-    conn.close()
+    write_queue.execute(record_completion)
     
     return jsonify({
         'success': True,
@@ -5807,6 +8158,8 @@ def handle_join_call(data):
     
     room = f'call_{call_session_id}'
     join_room(room)
+    # The call roster maps user_id -> sids so signaling can go to one peer
+    presence.join(request.sid, room, user_id, username)
     
     # Notify others that a new user joined
     emit('user_joined_call', {
@@ -5817,44 +8170,55 @@ def handle_join_call(data):
     
     print(f"User {username} (ID: {user_id}) joined call {call_session_id}")
 
+def signal_peer(event, payload, call_session_id, target_user_id):
+    """Deliver a signaling message to one peer of a call.
+
+    Offers, answers and ICE candidates are only meaningful to the peer they
+    were created for, so they go to that user's sids rather than the whole
+    call room. Falls back to the room when the sender names no target (pages
+    loaded before targeting) or when the target may be connected to another
+    worker; peers ignore signaling from connections they don't have.
+    """
+    room = f'call_{call_session_id}'
+    sids = presence.sids(room, target_user_id) if target_user_id is not None else []
+    if sids:
+        emit(event, payload, to=sids)
+    elif target_user_id is None or workers.enabled:
+        emit(event, payload, room=room, skip_sid=request.sid)
+    else:
+        print(f"Dropping {event} for user {target_user_id}: not in call {call_session_id}")
+
 @socketio.on('webrtc_offer')
 def handle_webrtc_offer(data):
     """Forward WebRTC offer to target peer"""
-    target_user_id = data.get('target_user_id')
-    offer = data.get('offer')
-    sender_user_id = data.get('sender_user_id')
-    call_session_id = data.get('call_session_id')
-    
-    # Emit to specific user in the call room
-    emit('webrtc_offer', {
-        'offer': offer,
-        'sender_user_id': sender_user_id
-    }, room=f'call_{call_session_id}', skip_sid=request.sid)
+    signal_peer('webrtc_offer', {
+        'offer': data.get('offer'),
+        'sender_user_id': data.get('sender_user_id')
+    }, data.get('call_session_id'), data.get('target_user_id'))
 
 @socketio.on('webrtc_answer')
 def handle_webrtc_answer(data):
     """Forward WebRTC answer to target peer"""
-    target_user_id = data.get('target_user_id')
-    answer = data.get('answer')
-    sender_user_id = data.get('sender_user_id')
-    call_session_id = data.get('call_session_id')
-    
-    emit('webrtc_answer', {
-        'answer': answer,
-        'sender_user_id': sender_user_id
-    }, room=f'call_{call_session_id}', skip_sid=request.sid)
+    signal_peer('webrtc_answer', {
+        'answer': data.get('answer'),
+        'sender_user_id': data.get('sender_user_id')
+    }, data.get('call_session_id'), data.get('target_user_id'))
 
 @socketio.on('webrtc_ice_candidate')
 def handle_ice_candidate(data):
-    """Forward ICE candidate to target peer"""
-    candidate = data.get('candidate')
-    sender_user_id = data.get('sender_user_id')
-    call_session_id = data.get('call_session_id')
+    """Forward ICE candidates to target peer.
+
+    Clients batch trickled candidates per peer and send them as a
+    'candidates' list; a single 'candidate' is still accepted.
+    """
+    candidates = data.get('candidates')
+    if candidates is None:
+        candidates = [data.get('candidate')]
     
-    emit('webrtc_ice_candidate', {
-        'candidate': candidate,
-        'sender_user_id': sender_user_id
-    }, room=f'call_{call_session_id}', skip_sid=request.sid)
+    signal_peer('webrtc_ice_candidate', {
+        'candidates': candidates,
+        'sender_user_id': data.get('sender_user_id')
+    }, data.get('call_session_id'), data.get('target_user_id'))
 
 @socketio.on('toggle_audio')
 def handle_toggle_audio(data):
@@ -5912,91 +8276,214 @@ def handle_leave_call_socket(data):
     room = f'call_{call_session_id}'
     leave_room(room)
     
-    emit('user_left_call', {
-        'user_id': user_id,
-        'username': username,
-        'message': f'{username} left the call'
-    }, room=room)
+    # Another tab of the same user may still be in the call
+    if presence.leave(request.sid, room) is not None:
+        announce_departure(room, user_id, username)
     
     print(f"User {username} left call {call_session_id}")
 
 # ============================================
-# WHITEBOARD SOCKET.IO HANDLERS
+# PRESENCE TRACKING
 # ============================================
 
-@socketio.on('join_whiteboard')
-def handle_join_whiteboard(data):
-    """User joins a whiteboard room"""
-    session_id = data.get('session_id')
-    user_id = data.get('user_id')
-    username = data.get('username', 'Anonymous')
-    
-    room = f'whiteboard_{session_id}'
-    join_room(room)
-    
-    emit('user_joined_whiteboard', {
-        'user_id': user_id,
-        'username': username
-    }, room=room, include_self=False)
-    
-    print(f"User {username} joined whiteboard for session {session_id}")
+class PresenceRegistry:
+    """Who is connected to which room, indexed both ways.
 
-@socketio.on('leave_whiteboard')
-def handle_leave_whiteboard(data):
-    """User leaves whiteboard room"""
-    session_id = data.get('session_id')
-    user_id = data.get('user_id')
-    username = data.get('username', 'Anonymous')
-    
-    room = f'whiteboard_{session_id}'
-    leave_room(room)
-    
-    emit('user_left_whiteboard', {
-        'user_id': user_id,
-        'username': username
-    }, room=room)
-    
-    print(f"User {username} left whiteboard for session {session_id}")
+    Keeps a reverse index sid -> (user, rooms) next to per-room rosters, so
+    dropping a disconnected socket costs O(rooms that socket was in) rather
+    than a walk over every online user. A user can be in a room from several
+    tabs; they count as present until their last sid leaves.
 
-@socketio.on('whiteboard_draw')
-def handle_whiteboard_draw(data):
-    """Broadcast drawing actions to other users in real-time"""
-    session_id = data.get('session_id')
-    draw_data = data.get('draw_data')
-    user_id = data.get('user_id')
-    
-    room = f'whiteboard_{session_id}'
-    
-    # Broadcast to others in the room
-    emit('whiteboard_draw', {
-        'user_id': user_id,
-        'draw_data': draw_data
-    }, room=room, skip_sid=request.sid)
+    Every presence event refreshes the sid's heartbeat. Sids that have been
+    silent for longer than ttl seconds (a missed disconnect, a client that
+    went to sleep) are expired by a background sweep and reported through
+    on_departure like a regular leave.
 
-@socketio.on('whiteboard_cursor')
-def handle_whiteboard_cursor(data):
-    """Broadcast cursor position to other users"""
-    session_id = data.get('session_id')
-    user_id = data.get('user_id')
-    username = data.get('username', 'Anonymous')
-    x = data.get('x')
-    y = data.get('y')
-    
-    room = f'whiteboard_{session_id}'
-    
-    emit('whiteboard_cursor', {
-        'user_id': user_id,
-        'username': username,
-        'x': x,
-        'y': y
-    }, room=room, skip_sid=request.sid)
+    Rosters only cover sockets connected to this process.
 
-# ============================================
-# PRESENCE TRACKING
-# ============================================
+    Args:
+        socketio: SocketIO instance used to run the sweep task
+        on_departure: Callable(room, user_id, name) called when a user's last sid leaves a room by expiry
+        ttl: Seconds without a heartbeat before a sid is expired
+    """
+
+    def __init__(self, socketio, on_departure, ttl=90):
+        self.socketio = socketio
+        self.on_departure = on_departure
+        self.ttl = ttl
+        self._sids = {}     # sid -> {'user_id', 'name', 'rooms': set, 'last_seen'}
+        self._rosters = {}  # room -> {user_id: {'name', 'sids': set}}
+        self._lock = threading.Lock()
+        self._sweeping = False
+        self.stats = {'joins': 0, 'leaves': 0, 'disconnects': 0, 'expired': 0}
+
+    def touch(self, sid):
+        """Record a heartbeat for a sid"""
+        with self._lock:
+            entry = self._sids.get(sid)
+            if entry is not None:
+                entry['last_seen'] = time.monotonic()
+
+    def join(self, sid, room, user_id, name=None):
+        """Add a sid to a room's roster.
+
+        Returns:
+            True if the user was not present in the room before
+        """
+        with self._lock:
+            entry = self._sids.setdefault(sid, {'user_id': user_id, 'name': name, 'rooms': set()})
+            entry['last_seen'] = time.monotonic()
+            entry['rooms'].add(room)
+            roster = self._rosters.setdefault(room, {})
+            member = roster.get(user_id)
+            first = member is None
+            if first:
+                member = roster[user_id] = {'name': name, 'sids': set()}
+            member['sids'].add(sid)
+            self.stats['joins'] += 1
+            start = not self._sweeping
+            self._sweeping = True
+        if start:
+            self.socketio.start_background_task(self._sweep)
+        return first
+
+    def _remove(self, sid, entry, room):
+        """Take a sid out of one room; returns the roster member if that was the user's last sid there"""
+        entry['rooms'].discard(room)
+        roster = self._rosters.get(room)
+        member = roster.get(entry['user_id']) if roster else None
+        if member is None or sid not in member['sids']:
+            return None
+        member['sids'].discard(sid)
+        if member['sids']:
+            return None
+        del roster[entry['user_id']]
+        if not roster:
+            del self._rosters[room]
+        return member
+
+    def leave(self, sid, room):
+        """Remove a sid from a room.
+
+        Returns:
+            The user_id if the user has no other sid left in the room, else None
+        """
+        with self._lock:
+            entry = self._sids.get(sid)
+            if entry is None:
+                return None
+            entry['last_seen'] = time.monotonic()
+            gone = self._remove(sid, entry, room)
+            if not entry['rooms']:
+                del self._sids[sid]
+            self.stats['leaves'] += 1
+            return entry['user_id'] if gone else None
+
+    def drop(self, sid):
+        """Remove a sid from every room it was in (on disconnect).
+
+        Returns:
+            List of (room, user_id, name) for users that left a room entirely
+        """
+        with self._lock:
+            entry = self._sids.pop(sid, None)
+            if entry is None:
+                return []
+            departures = []
+            for room in list(entry['rooms']):
+                member = self._remove(sid, entry, room)
+                if member is not None:
+                    departures.append((room, entry['user_id'], member['name']))
+            self.stats['disconnects'] += 1
+            return departures
+
+    def roster(self, room):
+        """Users present in a room as a list of {'user_id', 'name'}"""
+        with self._lock:
+            return [{'user_id': user_id, 'name': member['name']}
+                    for user_id, member in self._rosters.get(room, {}).items()]
+
+    def count(self, room):
+        with self._lock:
+            return len(self._rosters.get(room, {}))
+
+    def is_present(self, room, user_id):
+        with self._lock:
+            return user_id in self._rosters.get(room, {})
+
+    def in_room(self, sid, room):
+        with self._lock:
+            entry = self._sids.get(sid)
+            return entry is not None and room in entry['rooms']
+
+    def sids(self, room, user_id):
+        """Sids through which a user is present in a room (one per tab)"""
+        with self._lock:
+            member = self._rosters.get(room, {}).get(user_id)
+            return list(member['sids']) if member else []
+
+    def expire(self):
+        """Drop sids whose heartbeat is older than ttl.
+
+        Returns:
+            List of (room, user_id, name) departures caused by the expiry
+        """
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            stale = [sid for sid, entry in self._sids.items() if entry['last_seen'] < cutoff]
+        departures = []
+        for sid in stale:
+            departures.extend(self.drop(sid))
+        self.stats['expired'] += len(stale)
+        return departures
+
+    def _sweep(self):
+        running = True
+        while running:
+            self.socketio.sleep(self.ttl / 3)
+            for room, user_id, name in self.expire():
+                try:
+                    self.on_departure(room, user_id, name)
+                except Exception as e:
+                    print(f"Error announcing expired presence: {e}")
+            with self._lock:
+                # Stop sweeping once nobody is tracked; the next join() restarts it
+                self._sweeping = running = bool(self._sids)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, sids=len(self._sids), rooms=len(self._rosters), ttl=self.ttl)
+
+def broadcast_note_viewers(room):
+    """Send a note room its current viewer list"""
+    socketio.emit('note_viewers_update', {
+        'viewers': [{'username': viewer['name']} for viewer in presence.roster(room)]
+    }, room=room)
+
+def announce_departure(room, user_id, name=None):
+    """Tell a room that a user has left it (after disconnect, leave or expiry)"""
+    if room.startswith('call_'):
+        username = name or 'Anonymous'
+        socketio.emit('user_left_call', {
+            'user_id': user_id,
+            'username': username,
+            'message': f'{username} left the call'
+        }, room=room)
+    elif room.startswith('whiteboard_'):
+        username = name or 'Anonymous'
+        socketio.emit('user_left_whiteboard', {
+            'username': username,
+            'message': f'{username} left the whiteboard'
+        }, room=room)
+    elif room.startswith('note_'):
+        broadcast_note_viewers(room)
+    elif room.startswith('session_'):
+        socketio.emit('user_status_changed', {
+            'user_id': user_id,
+            'status': 'offline'
+        }, room=room)
 
-# Store online users: {user_id: {session_id: socket_id}}
-online_users = {}
+presence = PresenceRegistry(socketio, on_departure=announce_departure, ttl=Config.PRESENCE_TTL)
 
 @socketio.on('user_online')
 def handle_user_online(data):
@@ -6005,15 +8492,13 @@ def handle_user_online(data):
     session_id = data.get('session_id', 'global')
     
     if user_id:
-        if user_id not in online_users:
-            online_users[user_id] = {}
-        online_users[user_id][session_id] = request.sid
-        
-        # Broadcast to all users in the session
-        emit('user_status_changed', {
-            'user_id': user_id,
-            'status': 'online'
-        }, room=f'session_{session_id}', skip_sid=request.sid)
+        room = f'session_{session_id}'
+        if presence.join(request.sid, room, user_id):
+            # Broadcast to all users in the session
+            emit('user_status_changed', {
+                'user_id': user_id,
+                'status': 'online'
+            }, room=room, skip_sid=request.sid)
 
 @socketio.on('user_offline')
 def handle_user_offline(data):
@@ -6021,18 +8506,10 @@ def handle_user_offline(data):
     user_id = data.get('user_id')
     session_id = data.get('session_id', 'global')
     
-    if user_id and user_id in online_users:
-        if session_id in online_users[user_id]:
-            del online_users[user_id][session_id]
-        
-        if not online_users[user_id]:
-            del online_users[user_id]
-        
-        # Broadcast to all users in the session
-        emit('user_status_changed', {
-            'user_id': user_id,
-            'status': 'offline'
-        }, room=f'session_{session_id}')
+    if user_id:
+        room = f'session_{session_id}'
+        if presence.leave(request.sid, room) is not None:
+            announce_departure(room, user_id)
 
 @socketio.on('check_user_status')
 def handle_check_user_status(data):
@@ -6040,30 +8517,22 @@ def handle_check_user_status(data):
     user_id = data.get('user_id')
     session_id = data.get('session_id', 'global')
     
-    is_online = user_id in online_users and session_id in online_users.get(user_id, {})
-    
     emit('user_status_response', {
         'user_id': user_id,
-        'is_online': is_online
+        'is_online': presence.is_present(f'session_{session_id}', user_id)
     })
 
+@socketio.on('presence_heartbeat')
+def handle_presence_heartbeat():
+    """Keep this socket's presence entries from expiring"""
+    presence.touch(request.sid)
+
 @socketio.on('disconnect')
 def handle_disconnect():
-    """Clean up when user disconnects"""
-    # Find and remove user from online_users
-    for user_id in list(online_users.keys()):
-        for session_id in list(online_users[user_id].keys()):
-            if online_users[user_id][session_id] == request.sid:
-                del online_users[user_id][session_id]
-                
-                # Broadcast offline status
-                socketio.emit('user_status_changed', {
-                    'user_id': user_id,
-                    'status': 'offline'
-                }, room=f'session_{session_id}')
-        
-        if not online_users[user_id]:
-            del online_users[user_id]
+    """Clean up presence (session rooms, note viewers, calls and whiteboards) when a socket disconnects"""
+    for room, user_id, name in presence.drop(request.sid):
+        announce_departure(room, user_id, name)
+    whiteboard_states.unsubscribe(request.sid)
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for StudyFlow
+
+Runs against a throwaway copy of sessions.db so the real database is never
+touched: app is imported from a scratch directory, so the migrations it runs
+at import time apply to a copy as well. Usage:
+
+    python benchmark.py db_pool [iterations]
+    python benchmark.py write_queue [messages_per_thread] [threads]
+    python benchmark.py polling [iterations]
+    python benchmark.py sockets [clients] [broadcasts]
+    python benchmark.py serializer [iterations]
+
+The sockets benchmark starts real servers (serve_async.py) and needs the
+websocket-client package for the benchmark's Socket.IO clients.
+"""
+
+import atexit
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DATABASE = 'sessions.db'
+
+def import_app():
+    """Import app with its database pointed at a migrated scratch copy.
+
+    app migrates the relative sessions.db as it is imported, so the import
+    runs from a temp dir holding a copy. Later make_scratch_database() calls
+    copy that migrated database instead of the real one.
+
+    Returns:
+        The app module
+    """
+    global DATABASE
+    if 'app' not in sys.modules:
+        scratch_dir = tempfile.mkdtemp(prefix='studyflow_bench_')
+        template = os.path.join(scratch_dir, 'sessions.db')
+        shutil.copy(DATABASE, template)
+        atexit.register(shutil.rmtree, scratch_dir, True)
+        cwd = os.getcwd()
+        os.chdir(scratch_dir)
+        try:
+            import app
+        finally:
+            os.chdir(cwd)
+        app.DATABASE = app.db_pool.database = DATABASE = template
+    return sys.modules['app']
+
+def make_scratch_database():
+    """Copy the database into a temp dir and seed it with benchmark data.
+
+    Returns:
+        Tuple of (database path, user_id, session_id)
+    """
+    scratch_dir = tempfile.mkdtemp(prefix='studyflow_bench_')
+    path = os.path.join(scratch_dir, 'sessions.db')
+    shutil.copy(DATABASE, path)
+
+    conn = sqlite3.connect(path)
+    cursor = conn.execute(
+        'INSERT INTO users (username, email, password_hash, full_name) VALUES (?, ?, ?, ?)',
+        ('bench_user', 'bench@example.com', 'x', 'Bench User')
+    )
+    user_id = cursor.lastrowid
+    cursor = conn.execute(
+        '''INSERT INTO sessions (title, session_type, subject, session_date, max_participants, creator_id)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        ('Benchmark Session', 'remote', 'General', '2030-01-01T10:00', 50, user_id)
+    )
+    session_id = cursor.lastrowid
+    conn.execute('INSERT INTO rsvps (session_id, user_id) VALUES (?, ?)', (session_id, user_id))
+    conn.executemany(
+        'INSERT INTO messages (session_id, user_id, message_text) VALUES (?, ?, ?)',
+        [(session_id, user_id, f'Message {i}') for i in range(200)]
+    )
+    conn.executemany(
+        'INSERT INTO notifications (user_id, type, title, message) VALUES (?, ?, ?, ?)',
+        [(user_id, 'reminder', f'Notification {i}', 'Body') for i in range(500)]
+    )
+    conn.commit()
+    conn.close()
+    return path, user_id, session_id
+
+def time_requests(client, url, iterations, headers=None, expected_status=200):
+    """Issue GET requests and return per-request latencies in milliseconds"""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == expected_status, f'{url} returned {response.status_code}'
+    return latencies
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:<10} mean {statistics.mean(latencies):7.2f} ms   "
+          f"median {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+
+def bench_db_pool(iterations=300):
+    """Compare pooled vs unpooled latency on the detail page and unread count"""
+    studyflow = import_app()
+
+    path, user_id, session_id = make_scratch_database()
+    studyflow.db_pool.database = path
+    studyflow.app.config['SESSION_COOKIE_SECURE'] = False
+    client = studyflow.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = 'bench_user'
+        sess['full_name'] = 'Bench User'
+
+    pool_size = studyflow.db_pool.max_idle or 8
+    urls = [f'/session/{session_id}', '/notifications/unread-count']
+
+    print(f"Connection pool benchmark ({iterations} requests per endpoint)")
+    try:
+        for url in urls:
+            print(f"\nGET {url}")
+            for label, max_idle in (('unpooled', 0), ('pooled', pool_size)):
+                studyflow.db_pool.close_all()
+                studyflow.db_pool.max_idle = max_idle
+                time_requests(client, url, 10)  # Warm up Jinja and the OS file cache
+                report(label, time_requests(client, url, iterations))
+    finally:
+        studyflow.db_pool.close_all()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    print(f"\nPool stats: {studyflow.db_pool.get_stats()}")
+
+def bench_write_queue(messages_per_thread=200, threads=8):
+    """Compare chat insert throughput: one commit per message vs group commit"""
+    studyflow = import_app()
+
+    path, user_id, session_id = make_scratch_database()
+    studyflow.db_pool.database = path
+    insert_sql = 'INSERT INTO messages (session_id, user_id, message_text) VALUES (?, ?, ?)'
+
+    def commit_each():
+        for i in range(messages_per_thread):
+            conn = studyflow.get_db()
+            conn.execute(insert_sql, (session_id, user_id, f'direct {i}'))
+            conn.commit()
+            conn.close()
+
+    def group_commit():
+        for i in range(messages_per_thread):
+            studyflow.write_queue.execute(insert_sql, (session_id, user_id, f'queued {i}'))
+
+    total = messages_per_thread * threads
+    print(f"Chat write throughput ({threads} threads x {messages_per_thread} messages)")
+    try:
+        for label, worker in (('per-commit', commit_each), ('group', group_commit)):
+            errors = []
+
+            def run():
+                try:
+                    worker()
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+
+            pool = [threading.Thread(target=run) for _ in range(threads)]
+            start = time.perf_counter()
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<10} {total / elapsed:9.0f} msg/s   {elapsed:6.2f} s   errors: {len(errors)}")
+    finally:
+        studyflow.write_queue.close()
+        studyflow.db_pool.close_all()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    print(f"\nWrite queue metrics: {studyflow.write_queue.get_metrics()}")
+
+def bench_polling(iterations=500):
+    """Compare idle polling: full responses vs 304s served from the ETag cache"""
+    studyflow = import_app()
+
+    path, user_id, session_id = make_scratch_database()
+    studyflow.db_pool.database = path
+    studyflow.app.config['SESSION_COOKIE_SECURE'] = False
+    client = studyflow.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = 'bench_user'
+        sess['full_name'] = 'Bench User'
+
+    urls = [f'/session/{session_id}/messages?last_id=0', '/notifications', '/notifications/unread-count']
+
+    print(f"Idle polling benchmark ({iterations} requests per endpoint)")
+    try:
+        for url in urls:
+            print(f"\nGET {url}")
+            report('full', time_requests(client, url, iterations))
+            etag = client.get(url).headers['ETag']
+            report('304', time_requests(client, url, iterations, {'If-None-Match': etag}, 304))
+    finally:
+        studyflow.db_pool.close_all()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    print(f"\nConditional GET stats: {studyflow.change_versions.get_stats()}")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def server_resources(pid):
+    """Resident memory (MB) and OS thread count of a server process, from /proc"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return None, None
+    return int(status['VmRSS'].split()[0]) / 1024, int(status['Threads'])
+
+def wait_for_server(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + '/offline', timeout=1)
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def measure_sockets(url, cookie, session_id, clients, broadcasts):
+    """Connect clients to a session room and time send_message fan-out to all of them.
+
+    Returns:
+        Tuple of (open clients, connect seconds, complete broadcasts, latencies in ms)
+    """
+    import socketio
+
+    arrivals = {}
+    lock = threading.Lock()
+
+    def on_message(msg):
+        with lock:
+            arrivals.setdefault(msg['message_text'], []).append(time.perf_counter())
+
+    def connect(_):
+        client = socketio.Client(reconnection=False)
+        client.on('new_message', on_message)
+        try:
+            client.connect(url, transports=['websocket'], wait_timeout=30)
+            client.emit('join_session', {'session_id': session_id})
+            return client
+        except Exception:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        connected = [c for c in pool.map(connect, range(clients)) if c is not None]
+    connect_seconds = time.perf_counter() - start
+
+    sender = socketio.Client(reconnection=False)
+    sender.connect(url, headers={'Cookie': f'session={cookie}'}, transports=['websocket'], wait_timeout=30)
+    time.sleep(1)  # Let the room joins land
+
+    latencies = []
+    complete = 0
+    for i in range(broadcasts):
+        text = f'fan-out {i} {time.time()}'
+        sent = time.perf_counter()
+        sender.call('send_message', {'session_id': session_id, 'message_text': text}, timeout=30)
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            with lock:
+                received = list(arrivals.get(text, []))
+            if len(received) >= len(connected):
+                complete += 1
+                break
+            time.sleep(0.001)
+        if received:
+            latencies.append((max(received) - sent) * 1000)
+
+    return connected + [sender], connect_seconds, complete, latencies
+
+def bench_sockets(clients=200, broadcasts=20):
+    """Compare concurrent socket capacity: threading server vs gevent (serve_async.py)"""
+    studyflow = import_app()
+
+    path, user_id, session_id = make_scratch_database()
+    scratch_dir = os.path.dirname(path)
+    cookie = studyflow.app.session_interface.get_signing_serializer(studyflow.app).dumps(
+        {'user_id': user_id, 'username': 'bench_user', 'full_name': 'Bench User'}
+    )
+    serve = os.path.abspath('serve_async.py')
+
+    print(f"Socket capacity benchmark ({clients} clients, {broadcasts} broadcasts per server)")
+    try:
+        for mode in ('threading', 'gevent'):
+            port = free_port()
+            url = f'http://127.0.0.1:{port}'
+            # The server runs in the scratch dir, so its relative sessions.db is the scratch copy
+            server = subprocess.Popen(
+                [sys.executable, serve, '--port', str(port), '--async-mode', mode],
+                cwd=scratch_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            open_clients = []
+            try:
+                if not wait_for_server(url):
+                    print(f"\n{mode}: server did not start")
+                    continue
+                idle_rss, idle_threads = server_resources(server.pid)
+                open_clients, connect_seconds, complete, latencies = measure_sockets(
+                    url, cookie, session_id, clients, broadcasts
+                )
+                rss, threads = server_resources(server.pid)
+            finally:
+                # Stop the server first: the dev server never answers the websocket close handshake
+                server.terminate()
+                server.wait()
+                for client in open_clients:
+                    client.disconnect()
+
+            print(f"\n{mode}")
+            print(f"  connected  {len(open_clients) - 1}/{clients} clients in {connect_seconds:.2f} s")
+            print(f"  server     {rss:.0f} MB RSS ({rss - idle_rss:+.0f} MB), "
+                  f"{threads} OS threads ({threads - idle_threads:+d})")
+            print(f"  fan-out    {complete}/{broadcasts} broadcasts reached every client")
+            if latencies:
+                report('latency', latencies)
+    finally:
+        studyflow.db_pool.close_all()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+def sample_events():
+    """Typical Socket.IO events as (label, event, payload), shaped like the browser sends them"""
+    import math
+    import random
+
+    rng = random.Random(42)
+
+    def fabric_path(points):
+        # Fabric.js Path.toObject(): a few dozen properties plus the quadratic path commands
+        x, y = rng.uniform(0, 1200), rng.uniform(0, 800)
+        commands = [['M', round(x, 3), round(y, 3)]]
+        for i in range(points):
+            angle = i / 12
+            commands.append(['Q', round(x + 40 * math.cos(angle), 3), round(y + 40 * math.sin(angle), 3),
+                             round(x + i * 1.7, 3), round(y + i * 0.9, 3)])
+        return {
+            'type': 'path', 'version': '5.3.0', 'originX': 'left', 'originY': 'top',
+            'left': round(x, 3), 'top': round(y, 3), 'width': 341.5, 'height': 180.25,
+            'fill': None, 'stroke': '#4f46e5', 'strokeWidth': 3, 'strokeDashArray': None,
+            'strokeLineCap': 'round', 'strokeDashOffset': 0, 'strokeLineJoin': 'round',
+            'strokeUniform': False, 'strokeMiterLimit': 10, 'scaleX': 1, 'scaleY': 1, 'angle': 0,
+            'flipX': False, 'flipY': False, 'opacity': 1, 'shadow': None, 'visible': True,
+            'backgroundColor': '', 'fillRule': 'nonzero', 'paintFirst': 'fill',
+            'globalCompositeOperation': 'source-over', 'skewX': 0, 'skewY': 0,
+            'path': commands, 'id': 'obj_1718000000000_k3j2h1'
+        }
+
+    message = {
+        'id': 18234, 'session_id': 12, 'user_id': 7, 'message_text': 'Has anyone finished problem set 4? Question 3b is confusing me.',
+        'created_at': '2026-10-18 14:02:11', 'parent_message_id': None, 'username': 'alex',
+        'full_name': 'Alex Kim', 'avatar_url': None, 'reactions': [], 'reply_count': 0
+    }
+    return [
+        ('cursor', 'whiteboard_cursor', {'whiteboard_id': 3, 'username': 'alex', 'x': 512.4375, 'y': 301.8125}),
+        ('chat', 'new_message', message),
+        ('stroke-40', 'whiteboard_object_added', {'whiteboard_id': 3, 'object': fabric_path(40)}),
+        ('stroke-400', 'whiteboard_object_added', {'whiteboard_id': 3, 'object': fabric_path(400)}),
+        ('modified', 'whiteboard_object_modified', {'whiteboard_id': 3, 'objectId': 'obj_1718000000000_k3j2h1',
+                                                     'properties': fabric_path(120)}),
+    ]
+
+def bench_serializer(iterations=2000):
+    """Compare Socket.IO packet size and encode/decode time: JSON text vs msgspec MessagePack"""
+    from socketio import packet
+    from socketio_msgpack import MsgspecPacket
+
+    print(f"Socket.IO serializer benchmark ({iterations} packets per event)")
+    print(f"\n  {'event':<11}{'format':<9}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for label, event, payload in sample_events():
+        for name, packet_class in (('json', packet.Packet), ('msgpack', MsgspecPacket)):
+            pkt = packet_class(packet.EVENT, data=[event, payload], namespace='/')
+            start = time.perf_counter()
+            for _ in range(iterations):
+                encoded = pkt.encode()
+            encode_us = (time.perf_counter() - start) / iterations * 1e6
+            start = time.perf_counter()
+            for _ in range(iterations):
+                decoded = packet_class(encoded_packet=encoded)
+            decode_us = (time.perf_counter() - start) / iterations * 1e6
+            assert decoded.data == [event, payload]
+            size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+            print(f"  {label:<11}{name:<9}{size:>8}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+BENCHMARKS = {
+    'db_pool': bench_db_pool,
+    'write_queue': bench_write_queue,
+    'polling': bench_polling,
+    'sockets': bench_sockets,
+    'serializer': bench_serializer,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py <{'|'.join(BENCHMARKS)}> [args]")
+        sys.exit(1)
+    args = [int(arg) for arg in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
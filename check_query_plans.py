@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN QUERY PLAN regression guard for StudyFlow's hot queries
+
+Copies the database into memory, applies the hot-path migrations and
+runs EXPLAIN QUERY PLAN over every registered query. Exits with status 1 if
+any of them falls back to a full table SCAN, so it can gate CI.
+
+Usage:
+    python check_query_plans.py [database]
+
+When a hot query is added or changed in app.py, register it in HOT_QUERIES.
+"""
+
+import re
+import sqlite3
+import sys
+
+DATABASE = 'sessions.db'
+MIGRATIONS = [
+    'migrations/add_hot_path_indexes.sql',
+    'migrations/add_reaction_counts.sql',
+    'migrations/add_rsvp_capacity.sql',
+    'migrations/add_user_search.sql',
+    'migrations/add_sessions_search.sql',
+    'migrations/add_message_idempotency.sql',
+    'migrations/add_whiteboard_ops.sql',
+    'migrations/add_whiteboard_keyframes.sql',
+]
+
+# (name, sql, params) for every query on a request hot path
+HOT_QUERIES = [
+    # index()
+    ('index.sessions', '''
+        SELECT s.*, u.full_name as creator_name,
+               (s.creator_id = ? OR EXISTS (
+                   SELECT 1 FROM rsvps r WHERE r.session_id = s.id AND r.user_id = ?
+               )) as user_is_participant
+        FROM sessions s
+        LEFT JOIN users u ON s.creator_id = u.id
+        WHERE 1=1
+        ORDER BY s.created_at DESC LIMIT ? OFFSET ?
+    ''', (1, 1, 25, 0)),
+    ('index.sessions_search', '''
+        SELECT s.*, u.full_name as creator_name
+        FROM sessions s
+        LEFT JOIN users u ON s.creator_id = u.id
+        WHERE 1=1 AND s.id IN (SELECT rowid FROM sessions_fts WHERE sessions_fts MATCH ?)
+        ORDER BY s.created_at DESC LIMIT ? OFFSET ?
+    ''', ('title : ("calc"*)', 25, 0)),
+    ('index.invitations', '''
+        SELECT i.*, s.title as session_title, u.full_name as inviter_name
+        FROM invitations i
+        JOIN sessions s ON i.session_id = s.id
+        JOIN users u ON i.inviter_id = u.id
+        WHERE i.invitee_id = ? AND i.status = 'pending'
+    ''', (1,)),
+    ('index.reminders', '''
+        SELECT r.id, r.session_id, r.reminder_text, r.created_at,
+               s.title as session_title, u.full_name as sender_name
+        FROM reminders r
+        JOIN sessions s ON r.session_id = s.id
+        JOIN users u ON r.sent_by = u.id
+        WHERE r.session_id IN (
+            SELECT session_id FROM rsvps WHERE user_id = ?
+        )
+        AND r.id NOT IN (
+            SELECT reminder_id FROM dismissed_reminders WHERE user_id = ?
+        )
+        ORDER BY r.created_at DESC
+        LIMIT 10
+    ''', (1, 1)),
+
+    # detail()
+    ('detail.rsvps', '''
+        SELECT r.*, u.full_name, u.username
+        FROM rsvps r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.session_id = ?
+    ''', (1,)),
+    ('detail.timeline_messages', '''
+        SELECT m.*, u.full_name, u.username
+        FROM messages m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.session_id = ? AND (m.created_at, m.id) < (?, ?)
+        ORDER BY m.created_at DESC, m.id DESC
+        LIMIT 51
+    ''', (1, '2030-01-01 00:00:00', 1)),
+    ('detail.reactions', '''
+        SELECT message_id, emoji, count, user_ids
+        FROM message_reaction_counts
+        WHERE message_id IN (SELECT value FROM json_each(?))
+        ORDER BY message_id, emoji
+    ''', ('[1, 2]',)),
+    ('detail.timeline_files', '''
+        SELECT f.*, u.full_name, u.username
+        FROM files f
+        JOIN users u ON f.user_id = u.id
+        WHERE f.session_id = ? AND f.file_context = 'chat' AND (f.uploaded_at, f.id) < (?, ?)
+        ORDER BY f.uploaded_at DESC, f.id DESC
+        LIMIT 51
+    ''', (1, '2030-01-01 00:00:00', 1)),
+    ('detail.study_files', '''
+        SELECT f.*, u.full_name, u.username
+        FROM files f
+        JOIN users u ON f.user_id = u.id
+        WHERE f.session_id = ? AND (f.file_context IS NULL OR f.file_context = 'study_material')
+        ORDER BY f.uploaded_at DESC
+    ''', (1,)),
+    ('detail.invited', 'SELECT invitee_id FROM invitations WHERE session_id = ?', (1,)),
+    ('detail.recordings', '''
+        SELECT r.*, u.full_name, u.username
+        FROM session_recordings r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.session_id = ?
+        ORDER BY r.created_at DESC
+    ''', (1,)),
+
+    # Messaging
+    ('get_messages', '''
+        SELECT m.*, u.full_name, u.username
+        FROM messages m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.session_id = ? AND m.id > ?
+        ORDER BY m.created_at ASC
+    ''', (1, 0)),
+    ('send_message.retry', 'SELECT id FROM messages WHERE user_id = ? AND client_msg_id = ?', (1, 'x')),
+    ('react.existing', '''
+        SELECT id FROM message_reactions
+        WHERE message_id = ? AND user_id = ? AND emoji = ?
+    ''', (1, 1, 'x')),
+    ('send_reminder.participants', 'SELECT user_id FROM rsvps WHERE session_id = ? AND user_id != ?', (1, 1)),
+
+    # Notifications
+    ('notifications.list', '''
+        SELECT * FROM notifications
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT 50
+    ''', (1,)),
+    ('notifications.unread_count', 'SELECT COUNT(*) as count FROM notifications WHERE user_id = ? AND is_read = 0', (1,)),
+    ('notifications.mark_all_read', 'UPDATE notifications SET is_read = 1 WHERE user_id = ?', (1,)),
+
+    # Files
+    ('get_files', '''
+        SELECT f.*, u.full_name, u.username
+        FROM files f
+        JOIN users u ON f.user_id = u.id
+        WHERE f.session_id = ? AND f.id > ? AND (f.file_context IS NULL OR f.file_context = 'study_material')
+        ORDER BY f.uploaded_at ASC
+    ''', (1, 0)),
+
+    # Search (FTS tables come from migrate_search.py)
+    ('search.messages', '''
+        SELECT m.*, s.title as session_title, u.full_name as author_name
+        FROM messages_fts
+        JOIN messages m ON messages_fts.rowid = m.id
+        JOIN sessions s ON m.session_id = s.id
+        JOIN users u ON m.user_id = u.id
+        WHERE messages_fts MATCH ?
+        AND (s.creator_id = ? OR m.session_id IN (
+            SELECT session_id FROM rsvps WHERE user_id = ?
+        ))
+        ORDER BY rank
+        LIMIT 10
+    ''', ('x', 1, 1)),
+
+    # Invite typeahead
+    ('users.search', '''
+        SELECT u.id, u.username, u.full_name
+        FROM users_fts
+        JOIN users u ON u.id = users_fts.rowid
+        WHERE users_fts MATCH ? AND u.id != ?
+        AND NOT EXISTS (SELECT 1 FROM rsvps r WHERE r.session_id = ? AND r.user_id = u.id)
+        AND NOT EXISTS (SELECT 1 FROM invitations i WHERE i.session_id = ? AND i.invitee_id = u.id)
+        ORDER BY rank
+        LIMIT 10
+    ''', ('"al"*', 1, 1, 1)),
+
+    # Flashcards
+    ('flashcards.cards', 'SELECT * FROM flashcards WHERE deck_id = ? ORDER BY id', (1,)),
+    ('flashcards.due', '''
+        SELECT f.*, p.easiness_factor, p.interval, p.repetitions, p.next_review_date
+        FROM flashcards f
+        LEFT JOIN flashcard_progress p ON f.id = p.flashcard_id AND p.user_id = ?
+        WHERE f.deck_id = ?
+        AND (p.next_review_date IS NULL OR p.next_review_date <= datetime('now'))
+        ORDER BY p.next_review_date ASC
+    ''', (1, 1)),
+    ('flashcards.progress', 'SELECT * FROM flashcard_progress WHERE flashcard_id = ? AND user_id = ?', (1, 1)),
+
+    # Profiles and notes
+    ('profile.sessions', 'SELECT * FROM sessions WHERE creator_id = ? ORDER BY created_at DESC LIMIT 5', (1,)),
+    ('profile.notes', 'SELECT * FROM notes WHERE user_id = ? AND is_public = 1 ORDER BY created_at DESC LIMIT 5', (1,)),
+    ('view_note.comments', '''
+        SELECT c.*, u.full_name, u.username
+        FROM note_comments c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.note_id = ?
+        ORDER BY c.created_at ASC
+    ''', (1,)),
+    ('view_note.files', '''
+        SELECT nf.*, u.full_name
+        FROM note_files nf
+        JOIN users u ON nf.user_id = u.id
+        WHERE nf.note_id = ?
+        ORDER BY nf.uploaded_at DESC
+    ''', (1,)),
+    ('theme', 'SELECT theme FROM user_settings WHERE user_id = ?', (1,)),
+
+    # Calls
+    ('call.active', '''
+        SELECT * FROM call_sessions
+        WHERE session_id = ? AND ended_at IS NULL
+        ORDER BY started_at DESC LIMIT 1
+    ''', (1,)),
+    ('call.participant', '''
+        SELECT id FROM call_participants
+        WHERE call_session_id = ? AND user_id = ? AND left_at IS NULL
+    ''', (1, 1)),
+    ('call.history', '''
+        SELECT cs.*, u.full_name as started_by_name,
+               (SELECT COUNT(*) FROM call_participants WHERE call_session_id = cs.id) as participant_count
+        FROM call_sessions cs
+        JOIN users u ON cs.started_by = u.id
+        WHERE cs.session_id = ?
+        ORDER BY cs.started_at DESC
+    ''', (1,)),
+
+    # Whiteboards
+    ('whiteboard.snapshot', '''
+        SELECT data_json, version, encoding FROM whiteboard_data
+        WHERE whiteboard_id = ? ORDER BY version DESC LIMIT 1
+    ''', (1,)),
+    ('whiteboard.ops_tail', '''
+        SELECT id, op_type, object_id, payload FROM whiteboard_ops
+        WHERE whiteboard_id = ? AND id > ? ORDER BY id
+    ''', (1, 0)),
+    ('whiteboard.replay_keyframe', '''
+        SELECT position, op_id, data FROM whiteboard_keyframes
+        WHERE whiteboard_id = ? AND position <= ? ORDER BY position DESC LIMIT 1
+    ''', (1, 500)),
+    ('whiteboard.replay_tail', '''
+        SELECT id, op_type, object_id, payload, user_id, created_at FROM whiteboard_ops
+        WHERE whiteboard_id = ? AND id > ? ORDER BY id LIMIT ?
+    ''', (1, 0, 200)),
+
+    # Background reminder job
+    ('reminder_job.upcoming', 'SELECT * FROM sessions WHERE session_date > ?', ('2025-01-01',)),
+]
+
+# A bare "SCAN <table>" (optionally "AS alias") is a full table scan.
+# Index scans ("SCAN t USING INDEX ...") and virtual tables are fine.
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+def load_database(path):
+    """Copy the database into memory and apply the hot-path migrations.
+
+    Planner statistics are dropped so plans reflect the default assumption of
+    large tables rather than whatever happens to be in a small dev database.
+    """
+    source = sqlite3.connect(path)
+    conn = sqlite3.connect(':memory:')
+    source.backup(conn)
+    source.close()
+    conn.execute('DROP TABLE IF EXISTS sqlite_stat1')
+    conn.execute('DROP TABLE IF EXISTS sqlite_stat4')
+
+    for migration in MIGRATIONS:
+        statement = ''
+        with open(migration, 'r') as f:
+            for line in f:
+                if not statement and line.lstrip().startswith('--'):
+                    continue
+                statement += line
+                if sqlite3.complete_statement(statement):
+                    try:
+                        conn.execute(statement)
+                    except sqlite3.OperationalError:
+                        pass  # Optional feature table not present in this database
+                    statement = ''
+    return conn
+
+def full_scans(conn, sql, params):
+    """Return the full-table SCAN steps in a query's plan"""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    return [row[3] for row in plan if FULL_SCAN.match(row[3])]
+
+def check(path=DATABASE):
+    conn = load_database(path)
+    failures = 0
+    skipped = 0
+
+    for name, sql, params in HOT_QUERIES:
+        try:
+            scans = full_scans(conn, sql, params)
+        except sqlite3.OperationalError as e:
+            print(f"⚠ {name}: skipped ({e})")
+            skipped += 1
+            continue
+
+        if scans:
+            print(f"✗ {name}: {', '.join(scans)}")
+            failures += 1
+        else:
+            print(f"✓ {name}")
+
+    conn.close()
+    checked = len(HOT_QUERIES) - skipped
+    print(f"\n{checked - failures}/{checked} hot queries use indexes ({skipped} skipped)")
+    return failures == 0
+
+if __name__ == '__main__':
+    sys.exit(0 if check(*sys.argv[1:2]) else 1)
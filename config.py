@@ -13,4 +13,59 @@ class Config:
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or None
     AI_MODEL = os.environ.get('AI_MODEL') or 'gpt-4o-mini'  # Cost-effective model
     AI_MAX_TOKENS = int(os.environ.get('AI_MAX_TOKENS', '1000'))
-    AI_ENABLED = os.environ.get('AI_ENABLED', 'False').lower() == 'true'
\ No newline at end of file
+    AI_ENABLED = os.environ.get('AI_ENABLED', 'False').lower() == 'true'
+    
+    # SQLite Connection Pool Configuration
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))  # Idle connections kept for reuse
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))  # 256MB
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '16384'))  # 16MB page cache per connection
+    DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', '256'))  # Prepared statements per connection
+    
+    # Group-commit write queue: batches small writes into a single transaction
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', '64'))
+    WRITE_QUEUE_MAX_DELAY_MS = float(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', '0'))  # 0 = commit whatever has queued up
+    
+    # Chat timeline: messages and chat files rendered per page (older pages load on scroll)
+    CHAT_PAGE_SIZE = int(os.environ.get('CHAT_PAGE_SIZE', '50'))
+    
+    # Dashboard: sessions listed per page
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '24'))
+    
+    # Socket.IO replay: recent events kept per room so reconnecting clients get only what they missed
+    SOCKET_REPLAY_BUFFER = int(os.environ.get('SOCKET_REPLAY_BUFFER', '256'))
+    
+    # Typing indicators: seconds between consolidated broadcasts, and before a silent typist expires
+    TYPING_BROADCAST_INTERVAL = float(os.environ.get('TYPING_BROADCAST_INTERVAL', '0.5'))
+    TYPING_TIMEOUT = float(os.environ.get('TYPING_TIMEOUT', '5'))
+    
+    # Reactions: changes to one message within this window (ms) are broadcast as a single update
+    REACTION_COALESCE_MS = int(os.environ.get('REACTION_COALESCE_MS', '100'))
+    
+    # Presence: seconds without a heartbeat before a socket is dropped from rosters (pages heartbeat every 30 s)
+    PRESENCE_TTL = float(os.environ.get('PRESENCE_TTL', '90'))
+    
+    # Whiteboards: ops logged after the latest snapshot before compaction folds them into a new one
+    WHITEBOARD_SNAPSHOT_OPS = int(os.environ.get('WHITEBOARD_SNAPSHOT_OPS', '200'))
+    WHITEBOARD_SNAPSHOTS_KEPT = int(os.environ.get('WHITEBOARD_SNAPSHOTS_KEPT', '3'))
+    # Keep folded ops so boards can be replayed; replay stores a keyframe every WHITEBOARD_KEYFRAME_OPS ops
+    WHITEBOARD_KEEP_HISTORY = os.environ.get('WHITEBOARD_KEEP_HISTORY', 'True').lower() == 'true'
+    WHITEBOARD_KEYFRAME_OPS = int(os.environ.get('WHITEBOARD_KEYFRAME_OPS', '100'))
+    # Boards held in memory; past this, idle ones are evicted least recently used first
+    WHITEBOARD_ACTIVE_BOARDS = int(os.environ.get('WHITEBOARD_ACTIVE_BOARDS', '64'))
+    # Live strokes and cursors are batched into this many frames per second per board
+    WHITEBOARD_FRAME_RATE = int(os.environ.get('WHITEBOARD_FRAME_RATE', '30'))
+    
+    # Socket.IO message queue for running several workers (redis://..., sqlite:///socketio_queue.db, ...)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'studyflow')
+    
+    # Socket.IO packet encoding: 'json' (text frames) or 'msgpack' (binary frames via msgspec)
+    SOCKETIO_SERIALIZER = os.environ.get('SOCKETIO_SERIALIZER', 'json')
+    # Count payload bytes in /api/metrics/socketio (serializes every event a second time)
+    SOCKETIO_METRICS_BYTES = os.environ.get('SOCKETIO_METRICS_BYTES', 'False').lower() == 'true'
+    
+    # Server concurrency: 'threading' (python app.py) or 'gevent' (python serve_async.py)
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+    # Native threads for blocking SQLite / AI / translation calls under gevent
+    BLOCKING_POOL_SIZE = int(os.environ.get('BLOCKING_POOL_SIZE', '16'))
@@ -10,17 +10,8 @@ def migrate():
     c = conn.cursor()
     
     try:
-        # Create FTS5 virtual table for sessions
-        c.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
-                title,
-                subject,
-                location,
-                content='sessions',
-                content_rowid='id'
-            )
-        ''')
-        print("✓ Created sessions_fts table")
+        # sessions_fts is created and kept in sync at app startup
+        # (migrations/add_sessions_search.sql)
         
         # Create FTS5 virtual table for messages
         c.execute('''
@@ -54,12 +45,6 @@ def migrate():
         print("✓ Created files_fts table")
         
         # Populate FTS tables with existing data
-        c.execute('''
-            INSERT INTO sessions_fts(rowid, title, subject, location)
-            SELECT id, title, subject, COALESCE(location, '') FROM sessions
-        ''')
-        print("✓ Populated sessions_fts")
-        
         c.execute('''
             INSERT INTO messages_fts(rowid, message_text)
             SELECT id, message_text FROM messages
@@ -80,29 +65,6 @@ def migrate():
         
         # Create triggers to keep FTS tables in sync
         
-        # Sessions triggers
-        c.execute('''
-            CREATE TRIGGER IF NOT EXISTS sessions_ai AFTER INSERT ON sessions BEGIN
-                INSERT INTO sessions_fts(rowid, title, subject, location)
-                VALUES (new.id, new.title, new.subject, COALESCE(new.location, ''));
-            END
-        ''')
-        
-        c.execute('''
-            CREATE TRIGGER IF NOT EXISTS sessions_ad AFTER DELETE ON sessions BEGIN
-                DELETE FROM sessions_fts WHERE rowid = old.id;
-            END
-        ''')
-        
-        c.execute('''
-            CREATE TRIGGER IF NOT EXISTS sessions_au AFTER UPDATE ON sessions BEGIN
-                DELETE FROM sessions_fts WHERE rowid = old.id;
-                INSERT INTO sessions_fts(rowid, title, subject, location)
-                VALUES (new.id, new.title, new.subject, COALESCE(new.location, ''));
-            END
-        ''')
-        print("✓ Created sessions triggers")
-        
         # Messages triggers
         c.execute('''
             CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
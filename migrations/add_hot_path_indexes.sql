@@ -0,0 +1,52 @@
+-- Migration: Add Hot Path Indexes
+-- Date: 2026-10-18
+-- Description: Covering and partial indexes for the most frequent queries in app.py
+-- (chat timeline, reactions, RSVPs, notifications, invitations, reminders, notes, calls).
+-- Verified by check_query_plans.py, which fails if a registered query falls back to a full SCAN.
+
+-- Chat timeline: detail() and get_messages() filter by session and order by time
+CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages(session_id, created_at, id);
+
+-- Thread parents: only replies carry a parent, so keep the index partial
+CREATE INDEX IF NOT EXISTS idx_messages_parent ON messages(parent_message_id) WHERE parent_message_id IS NOT NULL;
+
+-- Reactions: covering index for the per-message GROUP BY emoji aggregation
+CREATE INDEX IF NOT EXISTS idx_message_reactions_message_emoji ON message_reactions(message_id, emoji, user_id);
+
+-- RSVPs: (session_id, user_id) is served by the UNIQUE constraint; per-user lookups need their own index
+CREATE INDEX IF NOT EXISTS idx_rsvps_user_session ON rsvps(user_id, session_id);
+
+-- Notifications: recent list per user, plus a small partial index for the unread badge
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications(user_id, created_at) WHERE is_read = 0;
+
+-- Invitations: pending invitations on the dashboard and invitation responses
+CREATE INDEX IF NOT EXISTS idx_invitations_invitee_status ON invitations(invitee_id, status);
+
+-- Reminders for RSVP'd sessions and per-user dismissals
+CREATE INDEX IF NOT EXISTS idx_reminders_session_created ON reminders(session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_dismissed_reminders_user ON dismissed_reminders(user_id, reminder_id);
+
+-- Files: chat files and study materials per session, ordered by upload time
+CREATE INDEX IF NOT EXISTS idx_files_session_context ON files(session_id, file_context, uploaded_at);
+
+-- Sessions: dashboard ordering, profile pages and the reminder scheduler
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_creator_created ON sessions(creator_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_session_date ON sessions(session_date);
+
+-- Notes, comments and attachments
+CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_note_comments_note_created ON note_comments(note_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_note_files_note_uploaded ON note_files(note_id, uploaded_at);
+
+-- Recordings per session
+CREATE INDEX IF NOT EXISTS idx_session_recordings_session_created ON session_recordings(session_id, created_at);
+
+-- Flashcards (flashcard_progress is created by migrate_flashcards.py and may not exist yet)
+CREATE INDEX IF NOT EXISTS idx_flashcards_deck ON flashcards(deck_id);
+CREATE INDEX IF NOT EXISTS idx_flashcard_progress_next_review ON flashcard_progress(user_id, next_review_date);
+
+-- Calls: active call lookup and participant checks
+CREATE INDEX IF NOT EXISTS idx_call_sessions_session_started ON call_sessions(session_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_call_participants_call_user ON call_participants(call_session_id, user_id);
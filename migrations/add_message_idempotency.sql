@@ -0,0 +1,8 @@
+-- Migration: Add Message Idempotency Keys
+-- Date: 2026-10-18
+-- Description: Client-generated keys on chat messages so a retried send (socket reconnect,
+-- double submit) maps to the message that was already stored instead of a duplicate.
+
+ALTER TABLE messages ADD COLUMN client_msg_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_user_client_msg ON messages(user_id, client_msg_id) WHERE client_msg_id IS NOT NULL;
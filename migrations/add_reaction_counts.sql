@@ -0,0 +1,46 @@
+-- Migration: Add Materialized Reaction Counts
+-- Date: 2026-10-18
+-- Description: Per-(message, emoji) reaction counts kept in sync by triggers on message_reactions,
+-- so chat reads are a single primary-key lookup instead of a COUNT/GROUP_CONCAT aggregation.
+
+-- One row per emoji on a message; user_ids is a JSON array in reaction order
+CREATE TABLE IF NOT EXISTS message_reaction_counts (
+    message_id INTEGER NOT NULL,
+    emoji TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    user_ids TEXT NOT NULL DEFAULT '[]',
+    PRIMARY KEY (message_id, emoji),
+    FOREIGN KEY (message_id) REFERENCES messages(id)
+) WITHOUT ROWID;
+
+-- Backfill from existing reactions, only while the counts table is still empty. The guard row
+-- drives the join, so once the triggers below have populated it message_reactions isn't read at all.
+INSERT OR IGNORE INTO message_reaction_counts (message_id, emoji, count, user_ids)
+SELECT message_id, emoji, COUNT(*), json_group_array(user_id)
+FROM (
+    SELECT r.message_id, r.emoji, r.user_id
+    FROM (SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM message_reaction_counts)) AS fresh
+    CROSS JOIN message_reactions r
+    ORDER BY r.id
+)
+GROUP BY message_id, emoji;
+
+CREATE TRIGGER IF NOT EXISTS message_reactions_count_insert AFTER INSERT ON message_reactions BEGIN
+    INSERT INTO message_reaction_counts (message_id, emoji, count, user_ids)
+    VALUES (new.message_id, new.emoji, 1, json_array(new.user_id))
+    ON CONFLICT (message_id, emoji) DO UPDATE SET
+        count = count + 1,
+        user_ids = json_insert(user_ids, '$[#]', new.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS message_reactions_count_delete AFTER DELETE ON message_reactions BEGIN
+    UPDATE message_reaction_counts SET
+        count = count - 1,
+        user_ids = (
+            SELECT json_group_array(value) FROM json_each(message_reaction_counts.user_ids)
+            WHERE value != old.user_id
+        )
+    WHERE message_id = old.message_id AND emoji = old.emoji;
+    DELETE FROM message_reaction_counts
+    WHERE message_id = old.message_id AND emoji = old.emoji AND count <= 0;
+END;
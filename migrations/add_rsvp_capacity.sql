@@ -0,0 +1,33 @@
+-- Migration: Add RSVP Capacity Counters and Waitlist
+-- Date: 2026-10-18
+-- Description: Denormalized sessions.rsvp_count maintained by triggers on rsvps, so capacity
+-- checks are O(1) and an RSVP can be a single conditional INSERT. Adds a FIFO waitlist that
+-- is promoted from when a participant cancels.
+
+-- Participant counter (skipped if the column already exists). When this adds the column,
+-- apply_sql_migrations() backfills it from rsvps once; the triggers below keep it current after that.
+ALTER TABLE sessions ADD COLUMN rsvp_count INTEGER NOT NULL DEFAULT 0;
+
+-- FIFO waitlist: position is the order of id within a session
+CREATE TABLE IF NOT EXISTS session_waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES sessions(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE(session_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_waitlist_session ON session_waitlist(session_id, id);
+
+-- Keep rsvp_count in the same transaction as every RSVP insert/delete, and drop the
+-- waitlist entry of anyone who gets a seat (RSVP, promotion or accepted invitation)
+CREATE TRIGGER IF NOT EXISTS rsvps_count_insert AFTER INSERT ON rsvps BEGIN
+    UPDATE sessions SET rsvp_count = rsvp_count + 1 WHERE id = new.session_id;
+    DELETE FROM session_waitlist WHERE session_id = new.session_id AND user_id = new.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rsvps_count_delete AFTER DELETE ON rsvps BEGIN
+    UPDATE sessions SET rsvp_count = rsvp_count - 1 WHERE id = old.session_id;
+END;
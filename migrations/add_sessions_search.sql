@@ -0,0 +1,41 @@
+-- Migration: Add Sessions Search Index
+-- Date: 2026-10-18
+-- Description: Make sure sessions_fts (first introduced by migrate_search.py) exists and stays in
+-- sync, so the dashboard title filter can use it instead of LIKE '%q%'.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+    title,
+    subject,
+    location,
+    content='sessions',
+    content_rowid='id'
+);
+
+-- Rebuild if the index is out of sync, or if it was maintained by the original migrate_search.py
+-- triggers, which removed rows with DELETE instead of the external-content 'delete' command
+INSERT INTO sessions_fts(sessions_fts)
+SELECT 'rebuild'
+WHERE (SELECT COUNT(*) FROM sessions_fts_docsize) != (SELECT COUNT(*) FROM sessions)
+   OR EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'sessions_au');
+
+DROP TRIGGER IF EXISTS sessions_ai;
+DROP TRIGGER IF EXISTS sessions_ad;
+DROP TRIGGER IF EXISTS sessions_au;
+
+CREATE TRIGGER IF NOT EXISTS sessions_fts_ai AFTER INSERT ON sessions BEGIN
+    INSERT INTO sessions_fts(rowid, title, subject, location)
+    VALUES (new.id, new.title, new.subject, new.location);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sessions_fts_ad AFTER DELETE ON sessions BEGIN
+    INSERT INTO sessions_fts(sessions_fts, rowid, title, subject, location)
+    VALUES ('delete', old.id, old.title, old.subject, old.location);
+END;
+
+-- Only reindex when searchable columns change (not on rsvp_count or reminder_sent updates)
+CREATE TRIGGER IF NOT EXISTS sessions_fts_au AFTER UPDATE OF title, subject, location ON sessions BEGIN
+    INSERT INTO sessions_fts(sessions_fts, rowid, title, subject, location)
+    VALUES ('delete', old.id, old.title, old.subject, old.location);
+    INSERT INTO sessions_fts(rowid, title, subject, location)
+    VALUES (new.id, new.title, new.subject, new.location);
+END;
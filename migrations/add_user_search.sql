@@ -0,0 +1,36 @@
+-- Migration: Add User Search Index
+-- Date: 2026-10-18
+-- Description: FTS5 prefix index over username and full name for the invite typeahead
+-- (/api/users/search), so session pages no longer load the whole users table.
+
+-- External-content index on users; prefix indexes make short typeahead prefixes cheap
+CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+    username,
+    full_name,
+    content='users',
+    content_rowid='id',
+    prefix='1 2 3',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- Build the index for existing users (skipped once it is in sync)
+INSERT INTO users_fts(users_fts)
+SELECT 'rebuild'
+WHERE (SELECT COUNT(*) FROM users_fts_docsize) != (SELECT COUNT(*) FROM users);
+
+CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+    INSERT INTO users_fts(rowid, username, full_name)
+    VALUES (new.id, new.username, COALESCE(new.full_name, ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+    INSERT INTO users_fts(users_fts, rowid, username, full_name)
+    VALUES ('delete', old.id, old.username, COALESCE(old.full_name, ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username, full_name ON users BEGIN
+    INSERT INTO users_fts(users_fts, rowid, username, full_name)
+    VALUES ('delete', old.id, old.username, COALESCE(old.full_name, ''));
+    INSERT INTO users_fts(rowid, username, full_name)
+    VALUES (new.id, new.username, COALESCE(new.full_name, ''));
+END;
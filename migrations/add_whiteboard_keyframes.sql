@@ -0,0 +1,18 @@
+-- Migration: Add Whiteboard Replay Keyframes
+-- Date: 2026-10-18
+-- Description: Seek index for replaying a board's op history. A keyframe is the board
+-- after its first `position` logged ops (position 0 is the board before the history
+-- starts); replaying to any position loads the keyframe at or before it and applies
+-- the ops after op_id, so a seek reads at most one keyframe interval of ops.
+
+CREATE TABLE IF NOT EXISTS whiteboard_keyframes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    whiteboard_id INTEGER NOT NULL,
+    position INTEGER NOT NULL, -- Ops of the board's history folded in
+    op_id INTEGER NOT NULL, -- whiteboard_ops.id of the last op folded in (0 for none)
+    data BLOB NOT NULL, -- zlib-compressed Fabric.js canvas JSON
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (whiteboard_id) REFERENCES whiteboards(id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_whiteboard_keyframes_position ON whiteboard_keyframes(whiteboard_id, position);
@@ -0,0 +1,22 @@
+-- Migration: Add Whiteboard Operation Log
+-- Date: 2026-10-18
+-- Description: Append-only log of whiteboard edits (object added/modified/removed, clear).
+-- A board is its latest whiteboard_data snapshot plus the ops after that snapshot's version;
+-- compaction folds old ops into a new zlib-compressed snapshot. The folded ops are kept as the
+-- board's replay history, and only deleted when WHITEBOARD_KEEP_HISTORY is off.
+
+CREATE TABLE IF NOT EXISTS whiteboard_ops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, -- Global op order; snapshot versions refer to it
+    whiteboard_id INTEGER NOT NULL,
+    op_type TEXT NOT NULL, -- add, modify, remove or clear
+    object_id TEXT,
+    payload TEXT, -- Fabric.js object JSON for add and modify
+    user_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (whiteboard_id) REFERENCES whiteboards(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_whiteboard_ops_board ON whiteboard_ops(whiteboard_id, id);
+
+-- 'json' for plain canvas JSON, 'zlib' for compressed snapshots written by compaction
+ALTER TABLE whiteboard_data ADD COLUMN encoding TEXT DEFAULT 'json';
@@ -19,6 +19,7 @@ CREATE TABLE IF NOT EXISTS sessions (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     session_date DATETIME,
     max_participants INTEGER DEFAULT 10,
+    rsvp_count INTEGER NOT NULL DEFAULT 0,
     reminder_sent INTEGER DEFAULT 0,
     creator_id INTEGER NOT NULL,
     FOREIGN KEY (creator_id) REFERENCES users(id)
@@ -53,6 +54,7 @@ CREATE TABLE IF NOT EXISTS messages (
     user_id INTEGER NOT NULL,
     message_text TEXT NOT NULL,
     parent_message_id INTEGER,
+    client_msg_id TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (session_id) REFERENCES sessions(id),
     FOREIGN KEY (user_id) REFERENCES users(id),
@@ -292,14 +294,38 @@ CREATE TABLE IF NOT EXISTS whiteboard_data (
     version INTEGER DEFAULT 1,
     saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     saved_by INTEGER NOT NULL,
+    encoding TEXT DEFAULT 'json',
     FOREIGN KEY (whiteboard_id) REFERENCES whiteboards(id) ON DELETE CASCADE,
     FOREIGN KEY (saved_by) REFERENCES users(id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS whiteboard_ops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    whiteboard_id INTEGER NOT NULL,
+    op_type TEXT NOT NULL,
+    object_id TEXT,
+    payload TEXT,
+    user_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (whiteboard_id) REFERENCES whiteboards(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS whiteboard_keyframes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    whiteboard_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    op_id INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (whiteboard_id) REFERENCES whiteboards(id) ON DELETE CASCADE
+);
+
 -- Whiteboard indexes
 CREATE INDEX IF NOT EXISTS idx_whiteboards_session ON whiteboards(session_id);
 CREATE INDEX IF NOT EXISTS idx_whiteboard_data_whiteboard ON whiteboard_data(whiteboard_id);
 CREATE INDEX IF NOT EXISTS idx_whiteboard_data_version ON whiteboard_data(whiteboard_id, version DESC);
+CREATE INDEX IF NOT EXISTS idx_whiteboard_ops_board ON whiteboard_ops(whiteboard_id, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_whiteboard_keyframes_position ON whiteboard_keyframes(whiteboard_id, position);
 
 -- Pomodoro timer tables
 CREATE TABLE IF NOT EXISTS pomodoro_sessions (
@@ -670,3 +696,78 @@ CREATE TABLE IF NOT EXISTS oauth_tokens (
 
 CREATE INDEX IF NOT EXISTS idx_users_oauth ON users(oauth_provider, oauth_id);
 CREATE INDEX IF NOT EXISTS idx_oauth_tokens_user ON oauth_tokens(user_id);
+
+-- Hot path indexes (see migrations/add_hot_path_indexes.sql and check_query_plans.py)
+CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages(session_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_parent ON messages(parent_message_id) WHERE parent_message_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_user_client_msg ON messages(user_id, client_msg_id) WHERE client_msg_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_message_reactions_message_emoji ON message_reactions(message_id, emoji, user_id);
+CREATE INDEX IF NOT EXISTS idx_rsvps_user_session ON rsvps(user_id, session_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications(user_id, created_at) WHERE is_read = 0;
+CREATE INDEX IF NOT EXISTS idx_invitations_invitee_status ON invitations(invitee_id, status);
+CREATE INDEX IF NOT EXISTS idx_reminders_session_created ON reminders(session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_dismissed_reminders_user ON dismissed_reminders(user_id, reminder_id);
+CREATE INDEX IF NOT EXISTS idx_files_session_context ON files(session_id, file_context, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_creator_created ON sessions(creator_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_session_date ON sessions(session_date);
+CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_note_comments_note_created ON note_comments(note_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_note_files_note_uploaded ON note_files(note_id, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_session_recordings_session_created ON session_recordings(session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_flashcards_deck ON flashcards(deck_id);
+CREATE INDEX IF NOT EXISTS idx_call_sessions_session_started ON call_sessions(session_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_call_participants_call_user ON call_participants(call_session_id, user_id);
+
+-- Materialized reaction counts (see migrations/add_reaction_counts.sql)
+CREATE TABLE IF NOT EXISTS message_reaction_counts (
+    message_id INTEGER NOT NULL,
+    emoji TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    user_ids TEXT NOT NULL DEFAULT '[]',
+    PRIMARY KEY (message_id, emoji),
+    FOREIGN KEY (message_id) REFERENCES messages(id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS message_reactions_count_insert AFTER INSERT ON message_reactions BEGIN
+    INSERT INTO message_reaction_counts (message_id, emoji, count, user_ids)
+    VALUES (new.message_id, new.emoji, 1, json_array(new.user_id))
+    ON CONFLICT (message_id, emoji) DO UPDATE SET
+        count = count + 1,
+        user_ids = json_insert(user_ids, '$[#]', new.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS message_reactions_count_delete AFTER DELETE ON message_reactions BEGIN
+    UPDATE message_reaction_counts SET
+        count = count - 1,
+        user_ids = (
+            SELECT json_group_array(value) FROM json_each(message_reaction_counts.user_ids)
+            WHERE value != old.user_id
+        )
+    WHERE message_id = old.message_id AND emoji = old.emoji;
+    DELETE FROM message_reaction_counts
+    WHERE message_id = old.message_id AND emoji = old.emoji AND count <= 0;
+END;
+
+-- RSVP capacity counter and waitlist (see migrations/add_rsvp_capacity.sql)
+CREATE TABLE IF NOT EXISTS session_waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES sessions(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE(session_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_waitlist_session ON session_waitlist(session_id, id);
+
+CREATE TRIGGER IF NOT EXISTS rsvps_count_insert AFTER INSERT ON rsvps BEGIN
+    UPDATE sessions SET rsvp_count = rsvp_count + 1 WHERE id = new.session_id;
+    DELETE FROM session_waitlist WHERE session_id = new.session_id AND user_id = new.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rsvps_count_delete AFTER DELETE ON rsvps BEGIN
+    UPDATE sessions SET rsvp_count = rsvp_count - 1 WHERE id = old.session_id;
+END;
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Run StudyFlow on gevent instead of the threading development server
+
+Every socket and HTTP request runs as a greenlet, so idle Socket.IO
+connections cost a few KB instead of an OS thread and room fan-out runs on
+the event loop. Blocking work that would stall the loop (group commits,
+OpenAI, translation, language detection) goes through app.blocking_pool, a
+bounded native thread pool sized by BLOCKING_POOL_SIZE.
+
+Usage:
+    python serve_async.py [--host HOST] [--port PORT] [--async-mode gevent|threading]
+
+--async-mode threading runs the regular server with the same options, which
+is what the sockets benchmark compares against.
+"""
+
+import argparse
+import os
+
+parser = argparse.ArgumentParser(description='Run the StudyFlow server')
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--port', type=int, default=5000)
+parser.add_argument('--async-mode', choices=['gevent', 'threading'], default='gevent')
+args = parser.parse_args()
+
+if args.async_mode == 'gevent':
+    # Must run before anything imports socket, ssl or threading. Non-aggressive
+    # patching keeps select.epoll, which optional httpx backends (trio) need
+    # at import time.
+    from gevent import monkey
+    monkey.patch_all(aggressive=False)
+
+os.environ['SOCKETIO_ASYNC_MODE'] = args.async_mode
+
+from app import app, socketio  # noqa: E402
+
+if __name__ == '__main__':
+    print(f"Serving StudyFlow on http://{args.host}:{args.port} ({args.async_mode})")
+    socketio.run(app, host=args.host, port=args.port, allow_unsafe_werkzeug=True, log_output=False)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Per-event instrumentation for the Socket.IO layer
+
+SocketMetrics.instrument() wraps a flask_socketio.SocketIO instance so that
+every handler registered with @socketio.on and every socketio.emit (including
+flask_socketio.emit() inside handlers, which goes through it) is recorded:
+
+    inbound   count, rate, payload bytes, handler latency histogram, errors
+    outbound  count, rate, payload bytes, room fan-out (recipients per emit)
+
+Payload bytes are only counted with count_bytes=True: measuring them
+serializes every payload a second time, which the whiteboard and chat hot
+paths shouldn't pay for in production. Everything else is always recorded.
+
+Registering a second handler for the same event replaces the first one in
+python-socketio, so instrument() also flags duplicate registrations.
+
+Fan-out counts clients connected to this process; with a message queue each
+worker reports its own share of a broadcast.
+
+Usage (dump a running server's metrics):
+    python socketio_metrics.py [base_url]
+
+The dump signs a session cookie with the app's secret key, so run it from
+the app directory with the same environment as the server.
+"""
+
+import inspect
+import json
+import sys
+import threading
+import time
+import urllib.request
+from functools import wraps
+
+# Upper bounds (ms) of the handler latency histogram buckets
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+# Rates are events per second over windows of this many seconds
+RATE_WINDOW = 10
+
+def payload_size(args):
+    """Approximate wire size in bytes of an event's arguments"""
+    size = 0
+    for arg in args:
+        if isinstance(arg, (bytes, bytearray)):
+            size += len(arg)
+        elif isinstance(arg, str):
+            size += len(arg.encode())
+        else:
+            try:
+                size += len(json.dumps(arg, separators=(',', ':'), default=str))
+            except (TypeError, ValueError):
+                pass
+    return size
+
+class _EventStats:
+    """Counters for one event name in one direction"""
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.recipients = 0
+        self.max_recipients = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._rate = None
+
+    def add(self, nbytes):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self._rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        self.count += 1
+        self.bytes += nbytes
+
+    def rate(self):
+        elapsed = time.monotonic() - self._window_start
+        # A window that has run its length (or gone quiet) is already a fair
+        # sample; before the first window completes, use what there is so far
+        if elapsed >= RATE_WINDOW or self._rate is None:
+            return self._window_count / elapsed if elapsed > 0 else 0.0
+        return self._rate
+
+    def observe_latency(self, ms):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.latency_buckets[i] += 1
+                break
+        self.latency_total += ms
+        self.latency_max = max(self.latency_max, ms)
+
+    def latency_percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        observed = sum(self.latency_buckets)
+        if not observed:
+            return None
+        threshold = observed * fraction
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.latency_buckets):
+            cumulative += n
+            if cumulative >= threshold:
+                return bound if bound != float('inf') else round(self.latency_max, 3)
+
+    def snapshot(self, inbound, count_bytes=True):
+        stats = {
+            'count': self.count,
+            'rate_per_s': round(self.rate(), 2),
+            # None when byte counting is off
+            'bytes': self.bytes if count_bytes else None,
+            'avg_bytes': (round(self.bytes / self.count, 1) if self.count else 0) if count_bytes else None,
+        }
+        if inbound:
+            observed = sum(self.latency_buckets)
+            stats['errors'] = self.errors
+            stats['latency_ms'] = {
+                'avg': round(self.latency_total / observed, 3) if observed else None,
+                'p50': self.latency_percentile(0.5),
+                'p95': self.latency_percentile(0.95),
+                'p99': self.latency_percentile(0.99),
+                'max': round(self.latency_max, 3) if observed else None,
+                # [upper bound, count] pairs in bucket order
+                'histogram': [
+                    ['+Inf' if bound == float('inf') else bound, n]
+                    for bound, n in zip(LATENCY_BUCKETS_MS, self.latency_buckets)
+                ],
+            }
+        else:
+            stats['recipients'] = {
+                'total': self.recipients,
+                'avg': round(self.recipients / self.count, 1) if self.count else 0,
+                'max': self.max_recipients,
+            }
+        return stats
+
+def _accepts(handler, nargs):
+    """Whether handler can be called with nargs positional arguments"""
+    try:
+        inspect.signature(handler).bind(*([None] * nargs))
+        return True
+    except TypeError:
+        return False
+    except ValueError:
+        return True
+
+class SocketMetrics:
+    """Collects per-event Socket.IO metrics for one SocketIO instance.
+
+    Call instrument(socketio) before any @socketio.on registration.
+
+    Args:
+        count_bytes: Also measure payload sizes (one extra serialization per event)
+    """
+
+    def __init__(self, count_bytes=False):
+        self.count_bytes = count_bytes
+        self._inbound = {}
+        self._outbound = {}
+        self._registered = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.duplicates = []
+
+    def instrument(self, socketio_app):
+        """Wrap socketio_app.on and socketio_app.emit to record metrics"""
+        self.socketio = socketio_app
+        register = socketio_app.on
+        emit = socketio_app.emit
+
+        def on(message, namespace=None):
+            decorator = register(message, namespace)
+
+            def wrap(handler):
+                self._check_duplicate(message, namespace or '/', handler)
+                decorator(self._timed(message, handler))
+                return handler
+            return wrap
+
+        @wraps(emit)
+        def instrumented_emit(event, *args, **kwargs):
+            self._record_emit(event, args, kwargs)
+            return emit(event, *args, **kwargs)
+
+        socketio_app.on = on
+        socketio_app.emit = instrumented_emit
+        return socketio_app
+
+    def _check_duplicate(self, message, namespace, handler):
+        location = f"{handler.__qualname__} (line {handler.__code__.co_firstlineno})"
+        key = (namespace, message)
+        previous = self._registered.get(key)
+        self._registered[key] = location
+        if previous:
+            self.duplicates.append({'event': message, 'namespace': namespace,
+                                    'replaced': previous, 'by': location})
+            print(f"⚠️  Socket.IO handler for '{message}' registered twice: {location} replaces {previous}")
+
+    def _timed(self, message, handler):
+        arities = {}
+
+        @wraps(handler)
+        def timed_handler(*args):
+            # flask-socketio retries connect/disconnect handlers with fewer
+            # arguments on TypeError; let those probes through unrecorded
+            fits = arities.get(len(args))
+            if fits is None:
+                fits = arities[len(args)] = _accepts(handler, len(args))
+            if not fits:
+                return handler(*args)
+            nbytes = payload_size(args) if self.count_bytes else 0
+            start = time.perf_counter()
+            try:
+                return handler(*args)
+            except Exception:
+                with self._lock:
+                    self._stats(self._inbound, message).errors += 1
+                raise
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    stats = self._stats(self._inbound, message)
+                    stats.add(nbytes)
+                    stats.observe_latency(elapsed)
+        return timed_handler
+
+    def _record_emit(self, event, args, kwargs):
+        nbytes = payload_size(args) if self.count_bytes else 0
+        recipients = self._fan_out(kwargs)
+        with self._lock:
+            stats = self._stats(self._outbound, event)
+            stats.add(nbytes)
+            stats.recipients += recipients
+            stats.max_recipients = max(stats.max_recipients, recipients)
+
+    def _fan_out(self, kwargs):
+        """Number of locally connected clients an emit is delivered to"""
+        rooms = self.socketio.server.manager.rooms.get(kwargs.get('namespace') or '/', {})
+        to = kwargs.get('to') or kwargs.get('room')
+        if isinstance(to, (list, tuple, set)):
+            count = sum(len(rooms.get(room, ())) for room in to)
+        else:
+            # room None holds every connected client; a sid is a room of its own
+            count = len(rooms.get(to, ()))
+        skip = kwargs.get('skip_sid')
+        if skip:
+            count -= len(skip) if isinstance(skip, (list, tuple, set)) else 1
+        return max(count, 0)
+
+    @staticmethod
+    def _stats(table, event):
+        stats = table.get(event)
+        if stats is None:
+            stats = table[event] = _EventStats()
+        return stats
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'uptime_s': round(time.time() - self.started),
+                'count_bytes': self.count_bytes,
+                'inbound': {event: s.snapshot(True, self.count_bytes) for event, s in sorted(self._inbound.items())},
+                'outbound': {event: s.snapshot(False, self.count_bytes) for event, s in sorted(self._outbound.items())},
+                'duplicate_handlers': list(self.duplicates),
+            }
+
+def format_stats(metrics):
+    """Render /api/metrics/socketio output as text tables"""
+    socket_stats = metrics['socketio']
+    lines = [f"Socket.IO metrics (uptime {socket_stats['uptime_s']} s)", '',
+             f"{'inbound event':<28}{'count':>9}{'/s':>9}{'avg B':>9}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'errors':>8}"]
+    for event, s in socket_stats['inbound'].items():
+        latency = s['latency_ms']
+        lines.append(f"{event:<28}{s['count']:>9}{s['rate_per_s']:>9}{s['avg_bytes'] or '-':>9}"
+                     f"{latency['p50'] or '-':>9}{latency['p95'] or '-':>9}{latency['max'] or '-':>9}{s['errors']:>8}")
+    lines += ['', f"{'outbound event':<28}{'count':>9}{'/s':>9}{'avg B':>9}{'avg to':>9}{'max to':>9}"]
+    for event, s in socket_stats['outbound'].items():
+        lines.append(f"{event:<28}{s['count']:>9}{s['rate_per_s']:>9}{s['avg_bytes'] or '-':>9}"
+                     f"{s['recipients']['avg']:>9}{s['recipients']['max']:>9}")
+    if socket_stats['duplicate_handlers']:
+        lines += ['', 'Duplicate handlers (the later registration wins):']
+        for dup in socket_stats['duplicate_handlers']:
+            lines.append(f"  {dup['event']}: {dup['by']} replaces {dup['replaced']}")
+    for name in ('session_events', 'typing', 'presence', 'whiteboard_frames'):
+        if name in metrics:
+            lines += ['', f"{name}: {metrics[name]}"]
+    return '\n'.join(lines)
+
+def main(base_url='http://127.0.0.1:5000'):
+    from app import app
+
+    cookie = app.session_interface.get_signing_serializer(app).dumps({'user_id': 0})
+    request = urllib.request.Request(base_url.rstrip('/') + '/api/metrics/socketio',
+                                     headers={'Cookie': f'session={cookie}'})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        print(format_stats(json.loads(response.read())))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
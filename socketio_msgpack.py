@@ -0,0 +1,61 @@
+"""
+MessagePack packet serializer for Socket.IO, encoded with msgspec
+
+With SOCKETIO_SERIALIZER=msgpack every Socket.IO packet is sent as one
+binary MessagePack frame instead of a JSON text frame. The win is CPU: the
+default packet class walks every payload looking for binary attachments
+before json.dumps, which dominates for Fabric.js path objects, while msgspec
+encodes them 10-40x faster. Sizes stay about the same, since coordinates
+are 9-byte floats in MessagePack and short decimals in JSON (python
+benchmark.py serializer compares the two).
+
+The wire format is python-socketio's MsgPackPacket ({type, data, nsp, id}
+as a map), which is what socket.io-msgpack-parser speaks; base.html loads
+the matching browser parser (static/js/socketio-msgpack.js). Server and
+clients must agree, so switching serializers needs a page reload.
+
+Binary mode is websocket-only. python-engineio encodes a room broadcast once
+and caches the result on the shared packet, so a binary frame cached for a
+websocket client is then handed as-is to long-polling clients, which need
+base64 text, and their poll fails.
+"""
+
+import msgspec
+from socketio import packet
+
+def _fallback(obj):
+    # Types msgspec can't encode natively are sent as their string form
+    return str(obj)
+
+class MsgspecPacket(packet.Packet):
+    """Socket.IO packet encoded as a single MessagePack message"""
+    uses_binary_events = False
+    encoder = msgspec.msgpack.Encoder(enc_hook=_fallback)
+    decoder = msgspec.msgpack.Decoder()
+
+    def encode(self):
+        """Encode the packet for transmission."""
+        return self.encoder.encode(self._to_dict())
+
+    def decode(self, encoded_packet):
+        """Decode a transmitted packet."""
+        decoded = self.decoder.decode(encoded_packet)
+        self.packet_type = decoded['type']
+        self.data = decoded.get('data')
+        self.id = decoded.get('id')
+        self.namespace = decoded['nsp']
+
+def socketio_serializer_options(serializer):
+    """Build the SocketIO() keyword arguments for SOCKETIO_SERIALIZER.
+
+    Args:
+        serializer: 'json' (the Socket.IO default) or 'msgpack'
+
+    Returns:
+        Dict of keyword arguments for flask_socketio.SocketIO
+    """
+    if serializer == 'msgpack':
+        return {'serializer': MsgspecPacket, 'transports': ['websocket']}
+    if serializer != 'json':
+        raise ValueError(f'Unknown SOCKETIO_SERIALIZER: {serializer}')
+    return {}
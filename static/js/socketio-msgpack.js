@@ -0,0 +1,66 @@
+/**
+ * MessagePack parser for the Socket.IO client
+ *
+ * Loaded by base.html when the server runs with SOCKETIO_SERIALIZER=msgpack
+ * (see socketio_msgpack.py). Each packet is encoded whole as a MessagePack
+ * map {type, data, nsp, id}, the socket.io-msgpack-parser layout, and every
+ * io() call on the page picks the parser up without changes. The server only
+ * accepts websockets in this mode, so long-polling is skipped.
+ */
+(function() {
+    const PacketType = { CONNECT: 0, DISCONNECT: 1, EVENT: 2, ACK: 3, CONNECT_ERROR: 4 };
+
+    class Encoder {
+        encode(packet) {
+            return [MessagePack.encode(packet)];
+        }
+    }
+
+    class Decoder {
+        constructor() {
+            this.listeners = {};
+        }
+
+        on(event, fn) {
+            (this.listeners[event] = this.listeners[event] || []).push(fn);
+            return this;
+        }
+
+        off(event, fn) {
+            if (!event) {
+                this.listeners = {};
+            } else if (!fn) {
+                delete this.listeners[event];
+            } else if (this.listeners[event]) {
+                this.listeners[event] = this.listeners[event].filter(listener => listener !== fn);
+            }
+            return this;
+        }
+
+        emit(event, payload) {
+            (this.listeners[event] || []).slice().forEach(fn => fn(payload));
+            return this;
+        }
+
+        add(chunk) {
+            if (typeof chunk === 'string') {
+                throw new Error('Expected a binary MessagePack packet');
+            }
+            const packet = MessagePack.decode(chunk instanceof ArrayBuffer ? new Uint8Array(chunk) : chunk);
+            this.emit('decoded', packet);
+        }
+
+        destroy() {}
+    }
+
+    const parser = { protocol: 5, PacketType: PacketType, Encoder: Encoder, Decoder: Decoder };
+    const baseIo = window.io;
+
+    window.io = Object.assign(function(uri, opts) {
+        if (typeof uri === 'object') {
+            opts = uri;
+            uri = undefined;
+        }
+        return baseIo(uri, Object.assign({ parser: parser, transports: ['websocket'] }, opts));
+    }, baseIo);
+})();
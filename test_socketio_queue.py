@@ -0,0 +1,148 @@
+"""
+Cross-worker Socket.IO delivery test
+
+Spawns several worker processes that share a Socket.IO message queue,
+connects a client to each of them and checks that a room broadcast sent from
+any worker reaches the room's clients on every worker (and nobody else), and
+that WorkerChannel notifications reach the other workers.
+
+Usage:
+    python test_socketio_queue.py [queue_url] [workers]
+
+Defaults to a throwaway SQLite queue and 3 workers. Pass a redis:// URL to
+check a Redis-backed deployment.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from socketio_queue import WorkerChannel, socketio_queue_options
+
+CHANNEL = 'studyflow-test'
+TIMEOUT = 10
+
+def run_worker(port, url):
+    """Serve a minimal Flask-SocketIO app on the shared queue"""
+    import logging
+    from flask import Flask, jsonify, request
+    from flask_socketio import SocketIO, join_room
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading', **socketio_queue_options(url, channel=CHANNEL))
+    workers = WorkerChannel(socketio)
+    notified = []
+    workers.on('ping', notified.append)
+
+    @socketio.on('join')
+    def handle_join(data):
+        join_room(data['room'])
+        return True
+
+    @app.route('/emit', methods=['POST'])
+    def emit_to_room():
+        # Plain socketio.emit, as create_notification / post_message do
+        socketio.emit('news', request.json['data'], room=request.json['room'])
+        workers.publish('ping', request.json['data'])
+        return jsonify({'success': True})
+
+    @app.route('/notified')
+    def get_notified():
+        return jsonify(notified)
+
+    socketio.run(app, host='127.0.0.1', port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def http(port, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=TIMEOUT) as response:
+        return json.loads(response.read())
+
+def wait_for(condition, timeout=TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def main(url=None, worker_count=3):
+    import socketio
+
+    scratch_dir = None
+    if not url:
+        scratch_dir = tempfile.mkdtemp(prefix='studyflow_queue_')
+        url = 'sqlite:///' + os.path.join(scratch_dir, 'socketio_queue.db')
+    ports = [free_port() for _ in range(worker_count)]
+    processes = [subprocess.Popen([sys.executable, __file__, '--worker', str(port), url]) for port in ports]
+    clients = []
+    failures = 0
+
+    def check(ok, label):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    try:
+        def workers_up():
+            try:
+                return all(http(port, '/notified') == [] for port in ports)
+            except OSError:
+                return False
+        check(wait_for(workers_up), f"{worker_count} workers started on {url}")
+
+        # One client in the room on every worker, plus one outside the room on the first
+        received = {}
+        for i, port in enumerate(ports + ports[:1]):
+            room = 'session_1' if i < worker_count else 'session_2'
+            client = socketio.Client()
+            received[i] = []
+            client.on('news', lambda data, i=i: received[i].append(data))
+            client.connect(f'http://127.0.0.1:{port}', transports=['polling'], wait_timeout=TIMEOUT)
+            client.call('join', {'room': room}, timeout=TIMEOUT)
+            clients.append(client)
+
+        for sender, port in enumerate(ports):
+            message = f'from worker {sender}'
+            http(port, '/emit', {'room': 'session_1', 'data': message})
+            delivered = wait_for(lambda: all(message in received[i] for i in range(worker_count)))
+            check(delivered, f"room broadcast from worker {sender} reached all {worker_count} workers")
+            check(message not in received[worker_count], f"broadcast from worker {sender} stayed out of other rooms")
+
+            notified = lambda: all(message in http(p, '/notified') for p in ports if p != port)
+            check(wait_for(notified), f"worker notification from worker {sender} reached the other workers")
+            check(message not in http(port, '/notified'), f"worker {sender} did not notify itself")
+    finally:
+        for client in clients:
+            client.disconnect()
+        for process in processes:
+            process.terminate()
+            process.wait()
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    print("\n" + "=" * 50)
+    print("✅ Cross-worker delivery works." if not failures else f"❌ {failures} check(s) failed.")
+    print("=" * 50)
+    return failures == 0
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(int(sys.argv[2]), sys.argv[3])
+    else:
+        args = sys.argv[1:]
+        ok = main(args[0] if args else None, int(args[1]) if len(args) > 1 else 3)
+        sys.exit(0 if ok else 1)